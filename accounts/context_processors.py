@@ -1,8 +1,8 @@
-from .utils import get_currency_symbol
+from .utils import get_currency_symbol, get_profile
 
 def currency_context(request):
     if request.user.is_authenticated:
-        profile = getattr(request.user, "profile", None)
+        profile = get_profile(request.user)
         return {
             "currency": get_currency_symbol(profile)
         }
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.utils import SESSION_PURGE_BATCH_SIZE, purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired sessions from the database in batches (safe to run while serving)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SESSION_PURGE_BATCH_SIZE,
+            help=f'Rows per DELETE (default {SESSION_PURGE_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        purged = purge_expired_sessions(max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired sessions.'))
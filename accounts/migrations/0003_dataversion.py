@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_remove_profile_monthly_budget_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.PositiveBigIntegerField()),
+                ('scope', models.CharField(max_length=20)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner', 'scope'), name='dataversion_owner_scope_uniq')],
+            },
+        ),
+    ]
@@ -20,6 +20,22 @@ class Profile(models.Model):
 
     def __str__(self):
         return self.full_name or self.user.username
-    
 
 
+class DataVersion(models.Model):
+    """
+    A kharcha.cache data-version counter: one row per (user, scope), owner 0
+    for the global ones. Rows are created on the first bump; a missing row
+    reads as version 0.
+    """
+    owner = models.PositiveBigIntegerField()
+    scope = models.CharField(max_length=20)
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "scope"], name="dataversion_owner_scope_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.owner} v{self.version}"
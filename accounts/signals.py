@@ -1,7 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Profile
+from .models import DataVersion, Profile
 
 
 @receiver(post_save, sender=User)
@@ -17,3 +17,10 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
     except Profile.DoesNotExist:
         Profile.objects.create(user=instance)
+
+
+@receiver(post_delete, sender=User)
+def delete_data_versions(sender, instance, **kwargs):
+    # The user's kharcha.cache counters (not a ForeignKey: they are bumped
+    # while the user's rows are being cascade-deleted)
+    DataVersion.objects.filter(owner=instance.pk).delete()
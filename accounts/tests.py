@@ -1,3 +1,38 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from kharcha.cache import CATEGORIES, EXPENSES, bump, cached_value, data_version
+from .models import DataVersion
+
+
+class DataVersionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("versions")
+
+    def test_bump_moves_the_counters_in_the_database(self):
+        before = data_version(self.user.pk, EXPENSES)
+        bump(self.user.pk, EXPENSES)
+        bump(self.user.pk, EXPENSES)
+        self.assertEqual(DataVersion.objects.get(owner=self.user.pk, scope=EXPENSES).version, 2)
+        self.assertNotEqual(data_version(self.user.pk, EXPENSES), before)
+
+    def test_cached_value_is_recomputed_after_a_bump(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cached_value("test:value", self.user.pk, (EXPENSES,), compute), 1)
+        self.assertEqual(cached_value("test:value", self.user.pk, (EXPENSES,), compute), 1)
+        bump(self.user.pk, EXPENSES)
+        self.assertEqual(cached_value("test:value", self.user.pk, (EXPENSES,), compute), 2)
+        # A global bump reaches every user
+        bump(None, EXPENSES)
+        self.assertEqual(cached_value("test:value", self.user.pk, (EXPENSES,), compute), 3)
+
+    def test_deleting_the_user_drops_their_counters(self):
+        user_id = self.user.pk
+        bump(user_id, EXPENSES, CATEGORIES)
+        self.user.delete()
+        self.assertFalse(DataVersion.objects.filter(owner=user_id).exists())
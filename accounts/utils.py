@@ -1,3 +1,9 @@
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from kharcha.identity import remember
+
+
 CURRENCY_SYMBOLS = {
     "INR": "₹",
     "USD": "$",
@@ -8,3 +14,32 @@ def get_currency_symbol(profile):
     if not profile:
         return "₹"
     return CURRENCY_SYMBOLS.get(profile.default_currency, "₹")
+
+
+def get_profile(user):
+    """The user's Profile, shared by the view, forms and context processor of a request."""
+    return remember(("profile", user.pk), lambda: getattr(user, "profile", None))
+
+
+# Expired session rows deleted per statement
+SESSION_PURGE_BATCH_SIZE = 1000
+
+
+def purge_expired_sessions(batch_size=SESSION_PURGE_BATCH_SIZE) -> int:
+    """
+    Delete expired django_session rows a batch at a time: keys are read off
+    the expire_date index, then deleted by primary key, so a large backlog
+    never becomes one long-running DELETE. Returns the number removed.
+    """
+    cutoff = timezone.now()
+    purged = 0
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=cutoff)
+            .order_by("expire_date")
+            .values_list("session_key", flat=True)[:batch_size]
+        )
+        if keys:
+            purged += Session.objects.filter(session_key__in=keys).delete()[0]
+        if len(keys) < batch_size:
+            return purged
@@ -12,8 +12,9 @@ from datetime import timedelta
 from django.db.models import Q
 import secrets
 from .forms import ProfileForm  
-from expenses.models import Expense
-from income.models import Income
+from expenses.models import ExpenseMonthlyRollup
+from income.models import IncomeMonthlyRollup
+from .utils import get_profile, purge_expired_sessions
 from django.db.models import Sum
 from decimal import Decimal
 from django.utils.timezone import now
@@ -84,24 +85,25 @@ def logout_view(request):
 
 @login_required
 def profile_view(request):
-    profile = request.user.profile
+    profile = get_profile(request.user)
 
     is_guest = request.session.get('is_guest_session', False)
 
     today = now().date()
     month_start = today.replace(day=1)
 
+    # Read from the monthly rollups instead of scanning raw rows
     total_expense = (
-        Expense.objects
-        .filter(user=request.user, date__gte=month_start)
-        .aggregate(total=Sum("amount"))["total"]
+        ExpenseMonthlyRollup.objects
+        .filter(user=request.user, month__gte=month_start)
+        .aggregate(amount=Sum("total"))["amount"]
         or Decimal("0.00")
     )
 
     total_income = (
-        Income.objects
-        .filter(user=request.user, date__gte=month_start)
-        .aggregate(total=Sum("amount"))["total"]
+        IncomeMonthlyRollup.objects
+        .filter(user=request.user, month__gte=month_start)
+        .aggregate(amount=Sum("total"))["amount"]
         or Decimal("0.00")
     )
 
@@ -179,6 +181,8 @@ def cleanup_guests(request):
         msg = f'Successfully cleaned up {count} abandoned guest accounts.'
     else:
         msg = 'No abandoned guest accounts found.'
-    
+
+    # Same daily run: drop expired session rows (guests never log out)
+    msg += f' Purged {purge_expired_sessions()} expired sessions.'
 
     return HttpResponse(msg)
\ No newline at end of file
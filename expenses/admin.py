@@ -1,18 +1,25 @@
 
 from django.contrib import admin
-from .models import Category, Expense  
+
+from kharcha.admin import CategoryFilter, LargeTableAdmin, UserFilter
+from .models import Category, Expense
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'user')
-    list_filter = ('user',)
+    list_filter = (UserFilter,)
+    list_select_related = ('user',)
     search_fields = ('name',)
+    autocomplete_fields = ('user',)
 
 
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
+class ExpenseAdmin(LargeTableAdmin):
     list_display = ('user', 'category', 'amount', 'date', 'is_borrowed', 'borrowed_from', 'created_at')
-    list_filter = ('user', 'category', 'date', 'is_borrowed', 'borrowed_from')
+    # borrowed_from / category as text boxes: listing their values means
+    # a DISTINCT scan / the whole category table on every page
+    list_filter = (UserFilter, CategoryFilter, 'date', 'is_borrowed')
+    list_select_related = ('user', 'category')
     search_fields = ('description', 'borrowed_from')
-
+    autocomplete_fields = ('user', 'category')
@@ -0,0 +1,101 @@
+from typing import Optional
+
+from django.db.models import Q
+
+from kharcha import identity
+from kharcha.cache import CATEGORIES
+from .models import Category, normalize_name
+
+
+def _category_key(name) -> str:
+    return normalize_name(name).lower()
+
+
+# -------------------------------------------------
+# Directory
+# -------------------------------------------------
+
+class CategoryDirectory:
+    """
+    A user's categories (global + custom), loaded with one query and then
+    shared by the whole request (one small query: cheaper than a cache
+    round trip), until a Category is saved or deleted.
+
+    Instances handed out are built with Category.from_db(), so they behave
+    like rows read from the DB without touching it.
+    """
+
+    def __init__(self, rows):
+        # rows: (id, name, user_id) ordered by name
+        self.rows = rows
+        self._by_id = {}
+        self._by_name = {}
+        self._global_by_name = {}
+        for pk, name, user_id in rows:
+            category = Category.from_db("default", ["id", "name", "user_id"], [pk, name, user_id])
+            self._by_id[pk] = category
+            key = _category_key(name)
+            if user_id is None:
+                self._global_by_name.setdefault(key, category)
+            # Same precedence as the old lookups: the user's own category first
+            if user_id is not None or key not in self._by_name:
+                self._by_name[key] = category
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def choices(self) -> list:
+        return [(pk, name) for pk, name, _ in self.rows]
+
+    def get(self, pk) -> Optional[Category]:
+        try:
+            return self._by_id.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def find(self, name, include_custom=True) -> Optional[Category]:
+        """Case-insensitive lookup by name ("food", "FOOD" -> Food)."""
+        if not name or not name.strip():
+            return None
+        names = self._by_name if include_custom else self._global_by_name
+        return names.get(_category_key(name))
+
+    def by_name(self) -> dict:
+        return dict(self._by_name)
+
+
+def category_directory(user) -> CategoryDirectory:
+    # Forgotten on a CATEGORIES bump: the user's own changes and global ones
+    rows = identity.remember(
+        ("categories", user.pk),
+        lambda: list(
+            Category.objects
+            .filter(Q(user=user) | Q(user__isnull=True))
+            .order_by("name")
+            .values_list("id", "name", "user_id")
+        ),
+        user.pk, CATEGORIES,
+    )
+    return CategoryDirectory(rows)
+
+
+def get_or_create_category(user, raw_name, directory: Optional[CategoryDirectory] = None) -> Optional[Category]:
+    """The user's / global category with this name, or a new custom one."""
+    if not raw_name or not raw_name.strip():
+        return None
+    if directory is None:
+        directory = category_directory(user)
+    category = directory.find(raw_name)
+    if category is None:
+        category = Category.objects.create(name=raw_name.strip().title(), user=user)
+    return category
+
+
+def miscellaneous_category(user, directory: Optional[CategoryDirectory] = None) -> Category:
+    """Fallback for expenses saved without a category."""
+    if directory is None:
+        directory = category_directory(user)
+    category = directory.find("Miscellaneous", include_custom=False)
+    if category is None:
+        category, _ = Category.objects.get_or_create(name="Miscellaneous", user=None)
+    return category
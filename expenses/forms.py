@@ -2,9 +2,36 @@ from django import forms
 from .models import Expense, Category
 from django.db.models import Q
 from django.db import models
+from .categories import category_directory
 from .models import Expense, Category
 
 
+class CategoryChoiceField(forms.ModelChoiceField):
+    """
+    Category select fed from the user's cached CategoryDirectory, so
+    rendering the dropdown and validating the choice run no queries.
+    Without a directory it behaves like a plain ModelChoiceField.
+    """
+
+    directory = None
+
+    def use_directory(self, directory):
+        self.directory = directory
+        self.choices = [("", self.empty_label), *directory.choices()]
+
+    def to_python(self, value):
+        if self.directory is None or value in self.empty_values:
+            return super().to_python(value)
+        category = self.directory.get(value)
+        if category is None:
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+        return category
+
+
 class ExpenseForm(forms.ModelForm):
     class Meta:
         model = Expense
@@ -17,6 +44,9 @@ class ExpenseForm(forms.ModelForm):
             "borrowed_from",
             "paid_for",
         ]
+        field_classes = {
+            "category": CategoryChoiceField,
+        }
         widgets = {
             "date": forms.DateInput(
                 attrs={"type": "date", "class": "form-control"}
@@ -42,10 +72,20 @@ class ExpenseForm(forms.ModelForm):
                 attrs={"class": "form-select"}
             ),
             "borrowed_from": forms.TextInput(
-                attrs={"class": "form-control", "id": "borrowedFromInput"}
+                attrs={
+                    "class": "form-control",
+                    "id": "borrowedFromInput",
+                    "autocomplete": "off",
+                    "data-person-autocomplete": "1",
+                }
             ),
             "paid_for": forms.TextInput(
-                attrs={"class": "form-control", "id": "paidForInput"}
+                attrs={
+                    "class": "form-control",
+                    "id": "paidForInput",
+                    "autocomplete": "off",
+                    "data-person-autocomplete": "1",
+                }
             ),
         }
 
@@ -59,10 +99,18 @@ class ExpenseForm(forms.ModelForm):
                     models.Q(user__isnull=True) | models.Q(user=self.user)
                 ).order_by("name")
             )
+            self.fields["category"].use_directory(category_directory(self.user))
 
         if not self.instance.pk:
             self.fields["payment_type"].initial = "cash"
 
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        if getattr(self.fields.get("category"), "directory", None) is not None:
+            # Already resolved from the directory; skip the model's FK existence query
+            exclude.add("category")
+        return exclude
+
     def clean_amount(self):
         amount = self.cleaned_data.get("amount")
         if amount is not None and amount <= 0:
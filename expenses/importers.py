@@ -0,0 +1,191 @@
+import csv
+from itertools import islice
+
+from django.db import transaction
+
+from .categories import category_directory
+from .forms import ExpenseForm
+from .models import Category, Expense, normalize_name
+from .utils import rebuild_expense_rollups
+from kharcha.cache import EXPENSES, LEDGER, bump
+from people.balances import refresh_person_summaries
+from people.counterparties import rebuild_counterparties
+from people.models import PersonLedgerEntry
+from people.utils import LedgerBatch
+from search.utils import rebuild_search_index
+
+
+# Rows validated + inserted per round trip
+IMPORT_BATCH_SIZE = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.ledger_entries = 0
+        self.errors = []  # (line number, message)
+
+
+# -------------------------------------------------
+# CSV reading helpers (shared with income imports)
+# -------------------------------------------------
+
+def _header_key(name) -> str:
+    return (name or "").strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def read_rows(lines):
+    """
+    Yield (line number, row) from an open CSV file, one row at a time.
+    Headers are matched loosely: "Paid For", "paid_for" and "paid-for" are the same column.
+    """
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames:
+        return
+    reader.fieldnames = [_header_key(name) for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, {key: (value or "").strip() for key, value in row.items() if key}
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def choice_value(raw, choices, default):
+    """Accept the stored value or its label ("Net Banking" -> "netbanking")."""
+    if not raw:
+        return default
+    lowered = raw.lower()
+    for value, label in choices:
+        if lowered in (value, label.lower()):
+            return value
+    return raw  # let the form reject it
+
+
+def form_errors(form) -> str:
+    return "; ".join(f"{field}: {' '.join(errors)}" for field, errors in form.errors.items())
+
+
+# -------------------------------------------------
+# Expenses
+# -------------------------------------------------
+
+def rebind(form, data, instance):
+    """
+    Point an already-built form at the next row. Constructing a ModelForm
+    deep-copies every field and widget, which dominated import time, so
+    one form per import is validated over and over instead.
+    """
+    form.data = data
+    form.instance = instance
+    form._errors = None
+    return form
+
+
+def _expense_form() -> ExpenseForm:
+    # No user: categories are matched by name for the whole batch
+    # (_assign_categories), not looked up per row, so the field is dropped
+    form = ExpenseForm({})
+    del form.fields["category"]
+    return form
+
+
+def _expense_data(row) -> dict:
+    borrowed_from = row.get("borrowed_from", "")
+    paid_for = row.get("paid_for", "")
+    return {
+        "date": row.get("date", ""),
+        "amount": row.get("amount", "").replace(",", ""),
+        "description": row.get("description", ""),
+        "payment_type": choice_value(row.get("payment_type"), Expense.PAYMENT_TYPE_CHOICES, "cash"),
+        "borrowed_from": borrowed_from,
+        "paid_for": paid_for,
+        "source_kind": "borrowed" if borrowed_from else "own",
+        "beneficiary_kind": "other" if paid_for else "me",
+    }
+
+
+def _assign_categories(user, expenses, names, categories: dict):
+    """
+    Same rules as add_expense: the user's own category wins over a global
+    one of the same name, unknown names become new user categories and a
+    blank name falls back to Miscellaneous.
+    """
+    names = [normalize_name(name) or "Miscellaneous" for name in names]
+
+    missing = {}
+    for name in names:
+        if name.lower() not in categories:
+            missing.setdefault(name.lower(), name)
+
+    for category in Category.objects.bulk_create(
+        Category(user=user, name=name)
+        for key, name in missing.items()
+        if key != "miscellaneous"
+    ):
+        categories[category.name.lower()] = category
+
+    if "miscellaneous" in missing:
+        categories["miscellaneous"], _ = Category.objects.get_or_create(name="Miscellaneous", user=None)
+
+    for expense, name in zip(expenses, names):
+        expense.category = categories[name.lower()]
+
+
+def import_expenses(user, lines, batch_size=IMPORT_BATCH_SIZE, dry_run=False) -> ImportResult:
+    """
+    Import expenses from CSV (Date, Amount, Category, Description,
+    Payment Type, Borrowed From, Paid For; the expense download is a
+    valid input).
+
+    Rows are validated with ExpenseForm and inserted with bulk_create,
+    batch by batch, so memory stays flat however long the file is.
+    bulk_create skips the post_save signals, so ledger rows are built
+    per batch by LedgerBatch, and rollups, the counterparty directory,
+    person balances and search documents are rebuilt once at the end. Invalid rows are reported and skipped.
+    """
+    result = ImportResult()
+
+    categories = category_directory(user).by_name()
+
+    form = _expense_form()
+
+    with transaction.atomic():
+        ledger = LedgerBatch(user)
+
+        for batch in batched(read_rows(lines), batch_size):
+            expenses, category_names = [], []
+            for line_no, row in batch:
+                rebind(form, _expense_data(row), Expense())
+                if not form.is_valid():
+                    result.errors.append((line_no, form_errors(form)))
+                    continue
+
+                expense = form.save(commit=False)
+                expense.user = user
+                expense.is_borrowed = bool(form.cleaned_data["borrowed_from"])
+                expense.is_for_others = bool(form.cleaned_data["paid_for"])
+                expense.normalize_people()
+                expenses.append(expense)
+                category_names.append(row.get("category", ""))
+
+            result.created += len(expenses)
+            if dry_run or not expenses:
+                continue
+
+            _assign_categories(user, expenses, category_names, categories)
+            ledger.link(expenses)
+            Expense.objects.bulk_create(expenses)
+            entries = PersonLedgerEntry.objects.bulk_create(ledger.expense_entries(expenses))
+            result.ledger_entries += len(entries)
+
+        if result.created and not dry_run:
+            rebuild_expense_rollups(user.pk)
+            rebuild_counterparties(user.pk)
+            bump(user.pk, EXPENSES, LEDGER)
+            refresh_person_summaries(ledger.touched)
+            rebuild_search_index(user.pk)
+
+    return result
@@ -0,0 +1,187 @@
+import random
+import re
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from expenses.models import Expense, ExpenseMonthlyRollup
+from expenses.views import month_start_end
+from income.models import Income
+from people.balances import refresh_person_summaries
+from people.models import Person, PersonLedgerEntry
+from people.utils import name_prefix_q
+
+User = get_user_model()
+
+
+# What an index-backed plan looks like per backend
+INDEX_PLAN = {
+    "sqlite": re.compile(r"USING (COVERING )?INDEX (\w+)"),
+    "postgresql": re.compile(r"(Index Only Scan|Index Scan|Bitmap Index Scan) (?:Backward )?(?:using|on) (\w+)"),
+}
+
+# Index name Django derives for the plain ForeignKey index (same on every backend)
+EXPENSE_PAID_FOR_PERSON_IDX = "expenses_expense_paid_for_person_id_4028202b"
+# SQLite keeps the (user, name_key) constraint inline in the table, as an autoindex
+PERSON_NAME_KEY_IDX = ("person_user_name_key_uniq", "sqlite_autoindex_people_person_1")
+
+# Tables _seed() fills; their statistics are refreshed before EXPLAIN
+SEEDED_TABLES = [
+    User._meta.db_table, Person._meta.db_table, Expense._meta.db_table,
+    Income._meta.db_table, PersonLedgerEntry._meta.db_table,
+]
+
+BATCH_SIZE = 5000
+# Below this the planner's statistics describe a toy table and its choices
+# flip with the row count (on SQLite 20,000 rows picks the plain person_id
+# index for "person balance"); 100,000 to 1,000,000 give the plans checked here
+MIN_ROWS = 100_000
+USERS = 200
+PEOPLE_PER_USER = 20
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway dataset, EXPLAIN the hot list/summary/balance queries '
+        'and fail unless each one is answered by the index meant for it. Works on SQLite and PostgreSQL '
+        '(point DATABASE_URL at a local PostgreSQL to check it).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=1_000_000,
+            help=f'Expense rows to seed (default 1,000,000; at least {MIN_ROWS:,}: smaller seeds give other plans)',
+        )
+
+    def handle(self, *args, **options):
+        pattern = INDEX_PLAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Unsupported database backend: {connection.vendor}')
+        if options['rows'] < MIN_ROWS:
+            raise CommandError(
+                f'--rows must be at least {MIN_ROWS:,}: plans for smaller seeds differ and are not a valid check.'
+            )
+
+        results = []
+        try:
+            with transaction.atomic():
+                user, person = self._seed(options['rows'])
+                for name, qs, expected in self._queries(user, person):
+                    plan = qs.explain()
+                    match = pattern.search(plan)
+                    results.append((name, match.group(2) if match else None, expected, plan))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        failed = False
+        for name, index, expected, plan in results:
+            if index in expected:
+                self.stdout.write(self.style.SUCCESS(f'{name:<22} index: {index}'))
+            else:
+                failed = True
+                self.stdout.write(self.style.ERROR(
+                    f'{name:<22} index: {index or "none"} (expected {" or ".join(expected)})'
+                ))
+                self.stdout.write(plan)
+
+        if failed:
+            raise CommandError('Some queries are not using their index.')
+
+    def _queries(self, user, person):
+        start, end = month_start_end(date.today().year, date.today().month)
+        expenses = Expense.objects.filter(user=user, date__gte=start, date__lte=end)
+        incomes = Income.objects.filter(user=user, date__range=(start, end))
+        ledger = PersonLedgerEntry.objects.filter(person=person, archived=False)
+
+        # (name, queryset, index names that may answer it)
+        return [
+            ('expense list', expenses.order_by('-date', '-created_at')[:25], ('expense_user_date_idx',)),
+            ('expense summary', expenses.order_by().values('user_id').annotate(total=Sum('amount'), n=Count('id')),
+             ('expense_user_date_idx',)),
+            ('expense rollup', ExpenseMonthlyRollup.objects.filter(user=user, month__gte=start).values('user_id').annotate(t=Sum('total')),
+             ('expense_rollup_user_month',)),
+            ('income list', incomes.order_by('-date', '-created_at')[:20], ('income_user_date_idx',)),
+            ('income summary', incomes.order_by().values('user_id').annotate(total=Sum('amount'), n=Count('id')),
+             ('income_user_date_idx',)),
+            ('ledger page', ledger.order_by('-effective_date', '-created_at')[:10], ('ledger_person_date_idx',)),
+            # Both partial indexes hold exactly the person's active rows
+            ('person balance', ledger.order_by().values('person_id').annotate(total=Sum('amount')),
+             ('ledger_person_date_idx', 'ledger_person_active_idx')),
+            ('as-of tail', ledger.filter(effective_date__gt=start, effective_date__lte=end).order_by().values('person_id').annotate(total=Sum('amount')),
+             ('ledger_person_date_idx',)),
+            ('expenses with person', Expense.objects.filter(paid_for_person=person).order_by(), (EXPENSE_PAID_FOR_PERSON_IDX,)),
+            ('person by name', Person.objects.filter(user=user, name_key=person.name_key), PERSON_NAME_KEY_IDX),
+            ('people list', Person.objects.filter(
+                user=user, tracking_preference=Person.TRACK, archived=False, active_entry_count__gt=0,
+            ).order_by('-last_activity_at', 'name', 'id')[:26], ('person_active_list_idx',)),
+            ('people search', Person.objects.filter(name_prefix_q('person 1'), user=user), PERSON_NAME_KEY_IDX),
+        ]
+
+    def _seed(self, rows):
+        """Bulk insert (no signals) rows spread over many users and ~3 years."""
+        self.stdout.write(f'Seeding {rows:,} expenses ...')
+        tag = uuid.uuid4().hex[:6]
+        users = User.objects.bulk_create(
+            User(username=f'explain_{tag}_{i}') for i in range(USERS)
+        )
+        people = Person.objects.bulk_create(
+            Person(user=u, name=f'Person {i}', name_key=f'person {i}', tracking_preference=Person.TRACK) for u in users for i in range(PEOPLE_PER_USER)
+        )
+        today = date.today()
+        rng = random.Random(42)
+
+        def pick_day():
+            return today - timedelta(days=rng.randrange(3 * 365))
+
+        def batches(make, total):
+            for offset in range(0, total, BATCH_SIZE):
+                yield [make() for _ in range(min(BATCH_SIZE, total - offset))]
+
+        def expense():
+            # Every tenth one paid for somebody
+            paid_for = rng.choice(people) if rng.random() < 0.1 else None
+            return Expense(
+                user=paid_for.user if paid_for else rng.choice(users),
+                amount=Decimal(rng.randrange(1, 5000)), date=pick_day(),
+                is_for_others=paid_for is not None, paid_for=paid_for.name if paid_for else '',
+                paid_for_person=paid_for,
+            )
+
+        for batch in batches(expense, rows):
+            Expense.objects.bulk_create(batch)
+
+        for batch in batches(lambda: Income(
+            user=rng.choice(users), amount=Decimal(rng.randrange(1, 50000)), date=pick_day(),
+        ), rows // 4):
+            Income.objects.bulk_create(batch)
+
+        def ledger_row():
+            p = rng.choice(people)
+            return PersonLedgerEntry(
+                user_id=p.user_id, person=p, amount=Decimal(rng.randrange(-500, 500)),
+                archived=rng.random() < 0.1, effective_date=pick_day(),
+            )
+
+        for batch in batches(ledger_row, rows // 2):
+            PersonLedgerEntry.objects.bulk_create(batch)
+        refresh_person_summaries(p.pk for p in people)
+
+        # Fresh statistics, so the planner judges the seeded volume (PostgreSQL
+        # sees the uncommitted rows of its own transaction; autovacuum would not)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE ' + ', '.join(connection.ops.quote_name(t) for t in SEEDED_TABLES))
+            else:
+                cursor.execute('ANALYZE')
+
+        return users[0], people[0]
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.importers import IMPORT_BATCH_SIZE, import_expenses
+from income.importers import import_incomes
+
+User = get_user_model()
+
+# How many bad rows to print before summarising the rest
+MAX_ERRORS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = 'Bulk import a CSV of expenses or incomes (e.g. a bank statement) for one user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help='CSV file; the Download CSV format is accepted as-is')
+        parser.add_argument('--kind', choices=['expenses', 'income'], default='expenses')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if not user:
+            raise CommandError(f"No user named '{options['username']}'")
+
+        importer = import_expenses if options['kind'] == 'expenses' else import_incomes
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as lines:
+                result = importer(
+                    user, lines,
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for line_no, message in result.errors[:MAX_ERRORS_SHOWN]:
+            self.stderr.write(f'line {line_no}: {message}')
+        if len(result.errors) > MAX_ERRORS_SHOWN:
+            self.stderr.write(f'... and {len(result.errors) - MAX_ERRORS_SHOWN} more invalid rows')
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.created} {options['kind']} rows "
+            f"({result.ledger_entries} ledger entries, {len(result.errors)} skipped)."
+        ))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.utils import rebuild_expense_rollups
+from income.utils import rebuild_income_rollups
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly expense/income rollup tables from raw rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild rollups for this username')
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"No user named '{options['user']}'")
+            user_id = user.pk
+
+        expense_rows = rebuild_expense_rollups(user_id)
+        income_rows = rebuild_income_rollups(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {expense_rows} expense and {income_rows} income rollup rows.'
+        ))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Expense = apps.get_model("expenses", "Expense")
+    ExpenseMonthlyRollup = apps.get_model("expenses", "ExpenseMonthlyRollup")
+
+    rows = (
+        Expense.objects
+        .annotate(month=TruncMonth("date"))
+        .values("user_id", "month", "category_id", "payment_type", "is_borrowed", "is_for_others")
+        .annotate(total=Sum("amount"), entry_count=Count("id"))
+        .order_by()
+    )
+    ExpenseMonthlyRollup.objects.bulk_create(
+        (ExpenseMonthlyRollup(**row) for row in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0011_remove_expense_created_from_people'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('payment_type', models.CharField(max_length=20)),
+                ('is_borrowed', models.BooleanField(default=False)),
+                ('is_for_others', models.BooleanField(default=False)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('entry_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='expenses.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='expense_rollup_user_month')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
+from django.apps import apps
 from django.db import models
 from django.contrib.auth.models import User
 
+from kharcha import identity
+from kharcha.cache import LEDGER, PEOPLE
+
 
 def normalize_name(value: str) -> str:
    
@@ -10,6 +14,78 @@ def normalize_name(value: str) -> str:
     return " ".join(p.capitalize() for p in parts)
 
 
+def name_key(value: str) -> str:
+    """Case/spacing-insensitive form of a person name, for indexed lookups (Person.name_key)."""
+    return normalize_name(value).casefold()
+
+
+# What the post_save ledger sync should do for one save(); a view sets
+# `instance.ledger_intent` before saving instead of calling the ledger
+# helpers itself, so each write applies the ledger exactly once.
+LEDGER_AUTO = "auto"    # only if LEDGER_FIELDS changed, tracking rules apply
+LEDGER_APPLY = "apply"  # explicit consent: (re)apply now, force_apply=True
+
+
+class LoadedValuesMixin:
+    """
+    Remember the field values last read from the DB on `_loaded_values`,
+    so signals can diff a save against what is actually stored.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None:
+            attnames = [f.attname for f in self._meta.concrete_fields]
+        else:
+            attnames = [self._meta.get_field(name).attname for name in fields]
+        loaded = getattr(self, "_loaded_values", None) or {}
+        loaded.update({name: getattr(self, name) for name in attnames if name in self.__dict__})
+        self._loaded_values = loaded
+
+
+class PersonLinksMixin:
+    """
+    Keep the Person foreign keys in step with the free-text names they
+    mirror: PERSON_LINKS = ((name field, FK field), ...). save() runs
+    link_people(); an FK that is set keeps its value without a query
+    unless its name changed since loading. Bulk paths link in memory
+    instead (people.utils.LedgerBatch.link).
+    """
+
+    PERSON_LINKS = ()
+
+    def link_people(self, update_fields=None):
+        """Returns update_fields plus the FKs of the names in it (None stays None)."""
+        links = [
+            (name_field, fk_field) for name_field, fk_field in self.PERSON_LINKS
+            if update_fields is None or name_field in update_fields
+        ]
+        loaded = getattr(self, "_loaded_values", None) or {}
+        for name_field, fk_field in links:
+            name, attname = getattr(self, name_field), f"{fk_field}_id"
+            if not name:
+                setattr(self, attname, None)
+            elif getattr(self, attname) is None or loaded.get(name_field, name) != name:
+                Person = apps.get_model("people", "Person")
+                key = name_key(name)
+                # Shared with people.utils.get_person_by_name for the request
+                setattr(self, fk_field, identity.remember(
+                    ("person", self.user_id, key),
+                    lambda: Person.objects.filter(user_id=self.user_id, name_key=key).first(),
+                    self.user_id, PEOPLE, LEDGER,
+                ))
+
+        if update_fields is None or not links:
+            return update_fields
+        return {*update_fields, *(fk_field for _, fk_field in links)}
+
+
 class Category(models.Model):
     name = models.CharField(max_length=50)
     # null user = global default category (Food, Rent, Miscellaneous, etc.)
@@ -32,7 +108,7 @@ class Category(models.Model):
         return self.name
 
 
-class Expense(models.Model):
+class Expense(LoadedValuesMixin, PersonLinksMixin, models.Model):
     PAYMENT_TYPE_CHOICES = [
         ("cash", "Cash"),
         ("upi", "UPI"),
@@ -64,19 +140,52 @@ class Expense(models.Model):
     is_for_others = models.BooleanField(default=False)
     paid_for = models.CharField(max_length=100, blank=True)
 
+    # The Person rows behind borrowed_from / paid_for (None when nobody by
+    # that name exists); filters and the ledger join on these
+    borrowed_from_person = models.ForeignKey(
+        "people.Person", on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="borrowed_expenses",
+    )
+    paid_for_person = models.ForeignKey(
+        "people.Person", on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="paid_for_expenses",
+    )
+    PERSON_LINKS = (("borrowed_from", "borrowed_from_person"), ("paid_for", "paid_for_person"))
+
    
 
 
+    # Fields that decide which monthly rollup bucket an expense lands in
+    ROLLUP_FIELDS = ("date", "amount", "category_id", "payment_type", "is_borrowed", "is_for_others")
+    # Fields the person ledger rows are derived from (amount, note, date)
+    LEDGER_FIELDS = (
+        "date", "amount", "description", "category_id",
+        "is_borrowed", "borrowed_from", "is_for_others", "paid_for",
+        "borrowed_from_person_id", "paid_for_person_id",
+    )
+    ledger_intent = LEDGER_AUTO
+
     class Meta:
         # Default ordering: latest expenses first
         ordering = ["-date", "-created_at"]
+        indexes = [
+            # Every list / summary query: user + date range, newest first
+            models.Index(fields=["user", "-date", "-created_at"], name="expense_user_date_idx"),
+        ]
 
     def save(self, *args, **kwargs):
+        self.normalize_people()
+        kwargs["update_fields"] = self.link_people(kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
+    def normalize_people(self):
         """
         Central place for cleaning / normalizing:
         - normalize lender & paid_for names (RAVI/ravi -> Ravi)
         - keep borrowed_from empty if not borrowed
         - keep paid_for empty if not for others
+
+        save() runs this; bulk_create() skips save(), so bulk paths call it directly.
         """
         # Normalize names
         if self.borrowed_from:
@@ -93,7 +202,34 @@ class Expense(models.Model):
         if not self.is_for_others:
             self.paid_for = ""
 
-        super().save(*args, **kwargs)
-
     def __str__(self):
         return f"{self.user.username} - {self.amount} on {self.date}"
+
+
+class ExpenseMonthlyRollup(models.Model):
+    """
+    Pre-aggregated expense totals per user and month.
+
+    One row per (month, category, payment_type, is_borrowed, is_for_others)
+    bucket. Rows are adjusted incrementally by expenses.signals, so reads
+    always SUM over the matching rows (duplicate buckets are harmless).
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="expense_rollups")
+    # Always the first day of the month
+    month = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    payment_type = models.CharField(max_length=20)
+    is_borrowed = models.BooleanField(default=False)
+    is_for_others = models.BooleanField(default=False)
+
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    entry_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "month"], name="expense_rollup_user_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m}: {self.total} ({self.entry_count})"
@@ -1,13 +1,15 @@
 from decimal import Decimal
 import logging
 
-from django.db import transaction
+from django.db import DEFAULT_DB_ALIAS
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from .models import Expense
-from people.models import PersonLedgerEntry
-from people.utils import apply_expense_to_person_ledger  # Ledger rebuild helper
+from .models import LEDGER_APPLY, LEDGER_AUTO, Category, Expense
+from .utils import remember_values, sync_expense_rollup, values_changed
+from kharcha.cache import CATEGORIES, EXPENSES, bump
+from people.counterparties import sync_expense_counterparties
+from people.ledger_queue import queue_ledger_sync  # Deferred ledger rebuild
 
 logger = logging.getLogger(__name__)
 ZERO = Decimal("0.00")
@@ -16,62 +18,67 @@ ZERO = Decimal("0.00")
 @receiver(post_save, sender=Expense)
 def rebuild_expense_person_ledger(sender, instance: Expense, created, **kwargs):
     """
-    Idempotently rebuild PersonLedgerEntry records linked to an Expense.
+    Idempotently sync PersonLedgerEntry records linked to an Expense.
 
     Behavior:
-    - Remove all existing PersonLedgerEntry rows associated with this expense
-      (covers edit/update scenarios).
-    - Delegate ledger creation to the helper, which determines:
+    - Skip entirely when no ledger-relevant field (Expense.LEDGER_FIELDS) changed.
+    - Queue the expense; on commit LedgerBatch updates the existing rows in place and determines:
         * Which Person entries should be created (borrowed_from / paid_for logic)
         * Whether entries should be created based on the person's tracking preference
-    - This signal must NOT force-apply ASK persons. Explicit user actions
-      (via banners/views) are responsible for that behavior.
+    - This signal must NOT force-apply ASK persons on its own. Explicit user
+      actions (via banners/views) say so with ledger_intent = LEDGER_APPLY.
     """
 
     # Defensive check: an Expense should always have an associated user
-    user = getattr(instance, "user", None)
-    if not user:
+    # (by id: loading the User here would cost a query)
+    if not instance.user_id:
         logger.warning(
             "Expense saved without an associated user. Expense id=%s",
             getattr(instance, "pk", "<unknown>"),
         )
         return
 
-    # Defensive conversion to Decimal to avoid unexpected type issues
-    try:
-        amount = Decimal(instance.amount or ZERO)
-    except Exception:
-        amount = ZERO
+    # Only the LEDGER_FIELDS feed the ledger rows; e.g. a payment_type
+    # edit leaves them untouched (no ledger queries at all)
+    force_apply = instance.ledger_intent == LEDGER_APPLY
+    instance.ledger_intent = LEDGER_AUTO  # one save, one application
+    ledger_changed = created or force_apply or values_changed(instance, Expense.LEDGER_FIELDS)
 
-    try:
-        with transaction.atomic():
-            # Remove existing ledger rows for this expense (edit/update case)
-            PersonLedgerEntry.objects.filter(expense=instance).delete()
+    # Keep the monthly summary rollup and the dropdown directory in step
+    sync_expense_rollup(instance, created=created)
+    sync_expense_counterparties(instance, created=created)
+    remember_values(instance)
+    bump(instance.user_id, EXPENSES)
 
-            # Delegate ledger entry creation to the helper.
-            # force_apply is intentionally False to respect tracking preferences.
-            apply_expense_to_person_ledger(user, instance, force_apply=False)
+    if not ledger_changed:
+        return
+    if created and not (instance.is_borrowed and instance.borrowed_from) and not (instance.is_for_others and instance.paid_for):
+        return  # nobody to apply it to, and no rows yet
 
-    except Exception as exc:
-        # Log and re-raise to ensure failures are visible during development
-        logger.exception(
-            "Failed to rebuild PersonLedgerEntry records for Expense id=%s",
-            instance.pk,
-        )
-        raise
+    # Queued: the rows are brought in line (in place, see LedgerBatch) once
+    # the transaction commits, however often the expense is saved in it.
+    # force_apply only with explicit consent (ledger_intent); otherwise
+    # tracking preferences / repayment checks are respected.
+    queue_ledger_sync(instance, force_apply=force_apply, using=kwargs.get("using") or DEFAULT_DB_ALIAS)
 
 
 @receiver(post_delete, sender=Expense)
 def cleanup_expense_person_ledger(sender, instance: Expense, **kwargs):
     """
-    Remove all PersonLedgerEntry records associated with an Expense
-    when the Expense is deleted.
+    Keep the rollup / directory in step when an Expense is deleted. Its
+    PersonLedgerEntry rows go with it through the FK CASCADE, whose
+    post_delete updates the people's summaries (once per row).
     """
-    try:
-        PersonLedgerEntry.objects.filter(expense=instance).delete()
-    except Exception:
-        logger.exception(
-            "Failed to clean up PersonLedgerEntry records for deleted Expense id=%s",
-            getattr(instance, "pk", "<unknown>"),
-        )
-        raise
+    # Rollup / directory rows go away with the user, so only adjust them for direct deletes
+    origin = kwargs.get("origin")
+    if isinstance(origin, Expense) or getattr(origin, "model", None) is Expense:
+        sync_expense_rollup(instance, deleted=True)
+        sync_expense_counterparties(instance, deleted=True)
+        bump(instance.user_id, EXPENSES)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_directory(sender, instance: Category, **kwargs):
+    """A global category changes every user's directory, a custom one only its owner's."""
+    bump(instance.user_id, CATEGORIES)
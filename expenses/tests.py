@@ -1,3 +1,102 @@
-from django.test import TestCase
+import re
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from kharcha.cache import SCOPES, bump
+from people.models import Person, PersonLedgerEntry
+from .models import Category, Expense
+
+
+LEDGER_WRITE = re.compile(r'^(INSERT INTO|UPDATE|DELETE FROM) "people_personledgerentry"')
+
+# Query counts depend on these: pin the defaults (database cache, cached_db
+# sessions) whatever the environment picks
+QUERY_COUNT_SETTINGS = dict(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "kharcha_cache"}},
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+)
+
+
+def ledger_writes(queries) -> int:
+    return sum(1 for query in queries if LEDGER_WRITE.match(query["sql"]))
+
+
+class PageQueriesMixin:
+    def assertPageQueries(self, url, cold, warm):
+        with self.assertNumQueries(cold):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # Repeat view: a raw-row summary comes from the cache; rollup reads are not cached
+        with self.assertNumQueries(warm):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(**QUERY_COUNT_SETTINGS)
+class ExpenseListQueryTests(PageQueriesMixin, TestCase):
+    """SQL round trips per my-expenses page (session-less, user and profile included)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("pages")
+        category, _ = Category.objects.get_or_create(name="Miscellaneous", user=None)
+        today = timezone.localdate()
+        with cls.captureOnCommitCallbacks(execute=True):
+            for i in range(60):
+                Expense.objects.create(
+                    user=cls.user, category=category, amount=Decimal("10.00") + i,
+                    date=today.replace(day=1) + timedelta(days=i % today.day),
+                    is_borrowed=(i % 5 == 0), borrowed_from="Ravi" if i % 5 == 0 else "",
+                )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_first_page(self):
+        self.assertPageQueries("/my-expenses/", 7, 7)
+
+    def test_second_page(self):
+        self.assertPageQueries("/my-expenses/?page=2", 7, 7)
+
+    def test_custom_range(self):
+        today = timezone.localdate()
+        self.assertPageQueries(f"/my-expenses/?from_date={today - timedelta(days=7)}&to_date={today}", 14, 8)
+
+    def test_cursor_paging(self):
+        self.assertPageQueries("/my-expenses/?paging=cursor", 7, 7)
+
+
+@override_settings(**QUERY_COUNT_SETTINGS)
+class AddExpenseQueryTests(TestCase):
+    """SQL round trips of the add form's POST, including the on-commit ledger work."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("writes")
+        cls.category, _ = Category.objects.get_or_create(name="Miscellaneous", user=None)
+        cls.person = Person.objects.create(user=cls.user, name="Ravi", tracking_preference=Person.TRACK)
+        # An established user: every cache counter row exists already
+        bump(cls.user.pk, *SCOPES)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_add_expense_for_tracked_person(self):
+        data = {
+            "date": timezone.localdate().isoformat(), "amount": "25", "category": self.category.pk,
+            "payment_type": "cash", "source_kind": "borrowed", "borrowed_from": "Ravi", "beneficiary_kind": "me",
+        }
+        with self.assertNumQueries(31) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post("/add-expense/", data)
+        self.assertEqual(response.status_code, 302)
+        # One ledger row, written exactly once
+        self.assertEqual(ledger_writes(ctx.captured_queries), 1)
+        entry = PersonLedgerEntry.objects.get(person=self.person)
+        self.assertEqual(entry.amount, Decimal("-25.00"))
+        self.assertEqual(entry.expense, Expense.objects.get(user=self.user))
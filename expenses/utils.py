@@ -0,0 +1,214 @@
+import calendar
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Expense, ExpenseMonthlyRollup
+
+
+ZERO = Decimal("0.00")
+
+
+# -------------------------------------------------
+# Loaded-value snapshot helpers
+# -------------------------------------------------
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def stored_values(instance, fields) -> Optional[dict]:
+    """
+    Values the instance had when it was loaded from the DB.
+    Returns None for new objects or when one of the fields was deferred.
+    """
+    loaded = getattr(instance, "_loaded_values", None)
+    if loaded is None:
+        return None
+    values = {}
+    for name in fields:
+        if name not in loaded:
+            return None
+        values[name] = loaded[name]
+    return values
+
+
+def current_values(instance, fields) -> dict:
+    return {name: getattr(instance, name) for name in fields}
+
+
+def values_changed(instance, fields) -> bool:
+    """True when any field differs from what was loaded (or that is unknown)."""
+    old = stored_values(instance, fields)
+    return old is None or old != current_values(instance, fields)
+
+
+def remember_values(instance):
+    """Refresh the snapshot after a save so the next save diffs correctly."""
+    instance._loaded_values = {
+        f.attname: getattr(instance, f.attname)
+        for f in instance._meta.concrete_fields
+    }
+
+
+# -------------------------------------------------
+# Monthly rollups (shared by expenses + income)
+# -------------------------------------------------
+
+def month_floor(value) -> date:
+    return _as_date(value).replace(day=1)
+
+
+def whole_month_range(from_date, to_date):
+    """
+    (first_month, last_month) when the range starts on the 1st of a month
+    and ends on a month end, so rollups can answer it exactly.
+    A missing bound stays open (None). Returns None otherwise.
+    """
+    try:
+        start = _as_date(from_date) if from_date else None
+        end = _as_date(to_date) if to_date else None
+    except ValueError:
+        return None
+
+    if start and start.day != 1:
+        return None
+    if end and end.day != calendar.monthrange(end.year, end.month)[1]:
+        return None
+    return start, (end.replace(day=1) if end else None)
+
+
+def bump_rollup(model, user_id, bucket: dict, amount, count: int):
+    """Add amount/count to one bucket row, creating the row when missing."""
+    pk = (
+        model.objects
+        .filter(user_id=user_id, **bucket)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if pk is not None:
+        model.objects.filter(pk=pk).update(
+            total=F("total") + amount,
+            entry_count=F("entry_count") + count,
+        )
+    else:
+        model.objects.create(user_id=user_id, total=amount, entry_count=count, **bucket)
+
+
+def sync_rollup(model, instance, fields, bucket_for, rebuild, created=False, deleted=False):
+    """
+    Move an instance's amount between rollup buckets after a save/delete.
+
+    - created -> add to the new bucket
+    - deleted -> subtract from the stored bucket
+    - updated -> subtract old, add new (skipped when nothing relevant changed)
+    When the previous state is unknown the user's rollups are rebuilt.
+    """
+    user_id = instance.user_id
+    old = None if created else stored_values(instance, fields)
+    new = None if deleted else current_values(instance, fields)
+
+    if deleted and old is None:
+        old = current_values(instance, fields)
+    if not created and not deleted and old is None:
+        rebuild(user_id)
+        return
+    if old is not None and new is not None and old == new:
+        return
+
+    if old is not None:
+        bump_rollup(model, user_id, bucket_for(old), -Decimal(old["amount"] or ZERO), -1)
+    if new is not None:
+        bump_rollup(model, user_id, bucket_for(new), Decimal(new["amount"] or ZERO), 1)
+
+
+# -------------------------------------------------
+# Expense rollups
+# -------------------------------------------------
+
+def _expense_bucket(values: dict) -> dict:
+    return {
+        "month": month_floor(values["date"]),
+        "category_id": values["category_id"],
+        "payment_type": values["payment_type"],
+        "is_borrowed": values["is_borrowed"],
+        "is_for_others": values["is_for_others"],
+    }
+
+
+def rebuild_expense_rollups(user_id=None) -> int:
+    """Recompute expense rollups from raw rows (one user, or everyone)."""
+    expenses = Expense.objects.all()
+    rollups = ExpenseMonthlyRollup.objects.all()
+    if user_id is not None:
+        expenses = expenses.filter(user_id=user_id)
+        rollups = rollups.filter(user_id=user_id)
+
+    rows = (
+        expenses
+        .annotate(month=TruncMonth("date"))
+        .values("user_id", "month", "category_id", "payment_type", "is_borrowed", "is_for_others")
+        .annotate(total=Sum("amount"), entry_count=Count("id"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        created = ExpenseMonthlyRollup.objects.bulk_create(
+            (ExpenseMonthlyRollup(**row) for row in rows),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def sync_expense_rollup(instance: Expense, created=False, deleted=False):
+    sync_rollup(
+        ExpenseMonthlyRollup,
+        instance,
+        Expense.ROLLUP_FIELDS,
+        _expense_bucket,
+        rebuild_expense_rollups,
+        created=created,
+        deleted=deleted,
+    )
+
+
+def expense_rollup_summary(user, from_date, to_date, **bucket_filters) -> Optional[dict]:
+    """
+    Summary card numbers from the rollup table.
+
+    bucket_filters may narrow on category_id, payment_type, is_borrowed
+    and is_for_others. Returns None when the date range is not made of
+    whole months; callers then aggregate the raw rows instead.
+    """
+    months = whole_month_range(from_date, to_date)
+    if months is None:
+        return None
+
+    first_month, last_month = months
+    qs = ExpenseMonthlyRollup.objects.filter(user=user, **bucket_filters)
+    if first_month:
+        qs = qs.filter(month__gte=first_month)
+    if last_month:
+        qs = qs.filter(month__lte=last_month)
+
+    agg = qs.aggregate(
+        rows=Sum("entry_count"),
+        amount=Sum("total"),
+        own_self=Sum("total", filter=Q(is_borrowed=False, is_for_others=False)),
+        own_others=Sum("total", filter=Q(is_borrowed=False, is_for_others=True)),
+        borrowed_self=Sum("total", filter=Q(is_borrowed=True, is_for_others=False)),
+    )
+    return {
+        "entry_count": agg["rows"] or 0,
+        "total": agg["amount"] or ZERO,
+        "own_self": agg["own_self"] or ZERO,
+        "own_others": agg["own_others"] or ZERO,
+        "borrowed_self": agg["borrowed_self"] or ZERO,
+    }
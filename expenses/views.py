@@ -3,20 +3,22 @@ from datetime import date
 import calendar
 from decimal import Decimal
 from urllib.parse import urlparse, parse_qs, urlencode
-import csv
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
-from django.http import HttpResponse
-from django.urls import reverse
-from accounts.utils import get_currency_symbol
+from kharcha.cache import EXPENSES, PEOPLE, cached_value
+from kharcha.exports import EXPORT_CHUNK_SIZE, stream_csv, wants_gzip
+from kharcha.pagination import CountedPaginator, KeysetPaginator, keyset_params
 from django.contrib import messages
+from .categories import category_directory, get_or_create_category, miscellaneous_category
 from .forms import ExpenseForm
-from .models import Expense, Category
-from people.utils import get_or_create_person_by_name, apply_expense_to_person_ledger
-from people.models import Person
+from .models import LEDGER_APPLY, Expense
+from .utils import expense_rollup_summary
+from people.utils import get_or_create_person_by_name, get_person_by_name, named_person_q
+from people.banners import EXPENSE as EXPENSE_BANNER, set_ask_banner
+from people.counterparties import counterparty_names
+from people.models import Counterparty, Person
 
 
 def month_start_end(year, month):
@@ -67,17 +69,21 @@ def month_redirect_url(next_url, exp_date):
 def my_expenses(request):
     user = request.user
 
+    # Filters come from the URL, or from the cursor token in keyset mode
+    params, cursor_state = keyset_params(request)
+    cursor_mode = params.get("paging") == "cursor"
+
     # ---- Base queryset: this user's expenses ----
     base_qs = Expense.objects.filter(user=user).select_related("category")
 
     # ========= 1. DATE RANGE & MONTH NAV LOGIC =========
     today = timezone.localdate()
 
-    raw_from = request.GET.get("from_date")
-    raw_to = request.GET.get("to_date")
+    raw_from = params.get("from_date")
+    raw_to = params.get("to_date")
 
     # If user hasn't provided any from/to → default to current month
-    if "from_date" not in request.GET and "to_date" not in request.GET:
+    if "from_date" not in params and "to_date" not in params:
         active_start, active_end = month_start_end(today.year, today.month)
         from_date = active_start.isoformat()
         to_date = active_end.isoformat()
@@ -136,25 +142,28 @@ def my_expenses(request):
 
     # ========= 2. OTHER FILTERS (keep your existing logic) =========
 
+    # Global + custom categories (cached; dropdown + selected label)
+    categories = category_directory(user)
+
     # ---- Category filter ----
-    selected_category = request.GET.get("category", "all")
+    selected_category = params.get("category", "all")
     selected_category_name = None
 
     if selected_category != "all":
         base_qs = base_qs.filter(category_id=selected_category)
-        cat_obj = Category.objects.filter(pk=selected_category).first()
+        cat_obj = categories.get(selected_category)
         if cat_obj:
             selected_category_name = cat_obj.name
 
     # ---- Payment type filter ----
-    payment_type = request.GET.get("payment_type", "all")
+    payment_type = params.get("payment_type", "all")
     if payment_type != "all":
         base_qs = base_qs.filter(payment_type=payment_type)
 
     # ---- From / Lender / For filters ----
-    from_filter = request.GET.get("from_filter", "all")          # 'all' | 'own' | 'borrowed'
-    selected_lender = request.GET.get("lender", "all")
-    selected_for_person = request.GET.get("for_person", "all")   # 'all' | 'me' | name
+    from_filter = params.get("from_filter", "all")          # 'all' | 'own' | 'borrowed'
+    selected_lender = params.get("lender", "all")
+    selected_for_person = params.get("for_person", "all")   # 'all' | 'me' | name
 
     filtered_qs = base_qs
 
@@ -165,40 +174,21 @@ def my_expenses(request):
 
     if selected_lender != "all":
         filtered_qs = filtered_qs.filter(
+            named_person_q(user, selected_lender, "borrowed_from_person", "borrowed_from"),
             is_borrowed=True,
-            borrowed_from__iexact=selected_lender,
         )
 
     if selected_for_person == "me":
         filtered_qs = filtered_qs.filter(is_for_others=False)
     elif selected_for_person not in ("all", ""):
         filtered_qs = filtered_qs.filter(
+            named_person_q(user, selected_for_person, "paid_for_person", "paid_for"),
             is_for_others=True,
-            paid_for__iexact=selected_for_person,
         )
 
-    # ---- Dropdown lists for lender / for_person ----
-    lender_list = (
-        Expense.objects
-        .filter(user=user, is_borrowed=True)
-        .exclude(borrowed_from__isnull=True)
-        .exclude(borrowed_from="")
-        .values_list("borrowed_from", flat=True)
-        .distinct()
-        .order_by("borrowed_from")
-    )
-
-    for_person_list = (
-        Expense.objects
-        .filter(user=user, is_for_others=True)
-        .exclude(paid_for__isnull=True)
-        .exclude(paid_for="")
-        .values_list("paid_for", flat=True)
-        .distinct()
-        .order_by("paid_for")
-    )
-
-    has_results = filtered_qs.exists()
+    # ---- Dropdown lists for lender / for_person (cached directory) ----
+    lender_list = counterparty_names(user, Counterparty.LENDER)
+    for_person_list = counterparty_names(user, Counterparty.PAID_FOR)
 
     # "filters_off" = only date filters used; others at defaults
     filters_off = (
@@ -210,49 +200,98 @@ def my_expenses(request):
     )
 
     # ========= 3. SUMMARY (same idea as before) =========
-    total_agg = filtered_qs.aggregate(
-        total_amount=Sum("amount"),
-    )
-    total = total_agg["total_amount"] or Decimal("0.00")
-
-    own_self_total = Decimal("0.00")
-    own_others_total = Decimal("0.00")
-    borrowed_self_total = Decimal("0.00")
-
-    if filters_off and has_results:
-        detail_agg = filtered_qs.aggregate(
+    # Whole-month ranges without person filters are served by the rollup table
+    summary = None
+    if selected_lender == "all" and selected_for_person in ("all", "me") and (
+        selected_category == "all" or selected_category.isdigit()
+    ):
+        rollup_filters = {}
+        if selected_category != "all":
+            rollup_filters["category_id"] = int(selected_category)
+        if payment_type != "all":
+            rollup_filters["payment_type"] = payment_type
+        if from_filter in ("own", "borrowed"):
+            rollup_filters["is_borrowed"] = (from_filter == "borrowed")
+        if selected_for_person == "me":
+            rollup_filters["is_for_others"] = False
+        summary = expense_rollup_summary(user, from_date, to_date, **rollup_filters)
+
+    def compute_summary():
+        # One round trip: row count, total and the split totals together
+        agg = filtered_qs.aggregate(
+            entry_count=Count("id"),
+            total_amount=Sum("amount"),
             own_self=Sum("amount", filter=Q(is_borrowed=False, is_for_others=False)),
             own_others=Sum("amount", filter=Q(is_borrowed=False, is_for_others=True)),
             borrowed_self=Sum("amount", filter=Q(is_borrowed=True, is_for_others=False)),
         )
-        own_self_total = detail_agg["own_self"] or Decimal("0.00")
-        own_others_total = detail_agg["own_others"] or Decimal("0.00")
-        borrowed_self_total = detail_agg["borrowed_self"] or Decimal("0.00")
+        return {
+            "entry_count": agg["entry_count"],
+            "total": agg["total_amount"] or Decimal("0.00"),
+            "own_self": agg["own_self"] or Decimal("0.00"),
+            "own_others": agg["own_others"] or Decimal("0.00"),
+            "borrowed_self": agg["borrowed_self"] or Decimal("0.00"),
+        }
+
+    # The rollup read is as cheap as a cache hit; the raw-row aggregate is
+    # cached per filters (the queryset's SQL) and data version (person
+    # filters resolve through Person rows, hence PEOPLE).
+    if summary is None:
+        summary = cached_value(
+            "expenses:summary", user.pk, (EXPENSES, PEOPLE), compute_summary, str(filtered_qs.query),
+        )
 
-    categories = Category.objects.filter(Q(user=user) | Q(user__isnull=True)).order_by("name")
+    has_results = summary["entry_count"] > 0
+    total = summary["total"]
 
-    # ========= 4. PAGINATION =========
-    paginator = Paginator(filtered_qs, 25)  # 25 rows per page
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-
-    # Build querystring for pagination (keep filters, drop page)
-    qd = request.GET.copy()
-    if "page" in qd:
-        qd.pop("page")
+    own_self_total = Decimal("0.00")
+    own_others_total = Decimal("0.00")
+    borrowed_self_total = Decimal("0.00")
+
+    if filters_off:
+        own_self_total = summary["own_self"]
+        own_others_total = summary["own_others"]
+        borrowed_self_total = summary["borrowed_self"]
+
+    # Build querystring for pagination (keep filters, drop page / cursor)
+    qd = params.copy()
+    for key in ["page", "cursor"]:
+        qd.pop(key, None)
     base_querystring = qd.urlencode()
 
+    # Same filters with the paging mode flipped (numbered <-> cursor)
+    toggle_qd = qd.copy()
+    if cursor_mode:
+        toggle_qd.pop("paging", None)
+    else:
+        toggle_qd["paging"] = "cursor"
+    paging_toggle_qs = toggle_qd.urlencode()
+
     # Build querystring for month nav (drop from/to/page, keep other filters)
-    month_qd = request.GET.copy()
-    for key in ["from_date", "to_date", "page"]:
-        if key in month_qd:
-            month_qd.pop(key)
+    month_qd = qd.copy()
+    for key in ["from_date", "to_date"]:
+        month_qd.pop(key, None)
     month_base_qs = month_qd.urlencode()
 
+    # ========= 4. PAGINATION =========
+    if cursor_mode:
+        # Opt-in seek pagination: constant cost per page, no COUNT / OFFSET
+        paginator = KeysetPaginator(
+            filtered_qs, ("-date", "-created_at", "id"), 25, querystring=base_querystring
+        )
+        page_obj = paginator.get_page(cursor_state)
+    else:
+        # Reuse the summary count instead of a separate COUNT(*)
+        paginator = CountedPaginator(filtered_qs, 25, summary["entry_count"])  # 25 rows per page
+        page_number = params.get("page")
+        page_obj = paginator.get_page(page_number)
+
     context = {
         "expenses": page_obj,
         "page_obj": page_obj,
         "base_querystring": base_querystring,
+        "cursor_mode": cursor_mode,
+        "paging_toggle_qs": paging_toggle_qs,
         "categories": categories,
         "from_date": from_date,
         "to_date": to_date,
@@ -296,7 +335,6 @@ def home(request):
 def add_expense(request):
     next_url = request.GET.get("next") or request.POST.get("next", "")
     from_people = request.GET.get("from_people") or request.POST.get("from_people")
-    currency = get_currency_symbol(request.user.profile)
 
     if request.method == "POST":
         
@@ -328,35 +366,23 @@ def add_expense(request):
             if beneficiary_kind == "other" or paid_for_val:
                 expense.is_for_others = True
                 expense.paid_for = paid_for_val
-                print(f"DEBUG: Detected 'For Others'. Name: {expense.paid_for}") # 👈 Debug
 
-            # Category Logic
+            # Category Logic (resolved from the cached directory)
+            directory = form.fields["category"].directory
             new_category_name = (request.POST.get("new_category") or "").strip()
             if new_category_name:
-                normalized_name = new_category_name.strip().title()
-                existing_category = Category.objects.filter(user=request.user, name__iexact=normalized_name).first()
-                if not existing_category:
-                    existing_category = Category.objects.filter(user__isnull=True, name__iexact=normalized_name).first()
-                
-                if existing_category:
-                    expense.category = existing_category
-                else:
-                    expense.category = Category.objects.create(name=normalized_name, user=request.user)
+                expense.category = get_or_create_category(request.user, new_category_name, directory)
 
             if expense.category is None:
-                misc, _ = Category.objects.get_or_create(name="Miscellaneous", user=None)
-                expense.category = misc
+                expense.category = miscellaneous_category(request.user, directory)
             
 
             
             # Preventing "Repayment" if not owing money
             
             
-            force_track_session = request.session.get("force_ledger_track", False)
-            
-            # Check GET/POST for from_people flag
-            from_people_param = request.GET.get("from_people") or request.POST.get("from_people")
-            is_wizard = force_track_session or (str(from_people_param) == "1")
+            # The people wizard says so with from_people=1 (GET or POST)
+            is_wizard = str(from_people) == "1"
 
             # 2. If NOT from Wizard, apply strict rules
             if not is_wizard:
@@ -369,15 +395,11 @@ def add_expense(request):
                     # Identify the person
                     check_person = None
                     if expense.is_for_others and expense.paid_for:
-                        
-                        from people.utils import get_person_by_name
                         check_person = get_person_by_name(request.user, expense.paid_for)
                     
                     if check_person:
                         # Check Balance
-                        from django.db.models import Sum
-                        agg = check_person.ledger_entries.filter(archived=False).aggregate(total=Sum("amount"))
-                        current_balance = agg["total"] or Decimal("0.00")
+                        current_balance = check_person.cached_balance
                         
                         # BLOCK if Balance >= 0 (We don't owe them, so we can't repay)
                         if current_balance >= 0:
@@ -398,71 +420,40 @@ def add_expense(request):
                             return render(request, "expenses/expense_form.html", context)
 
 
-        
-            expense.save()
-            
 
-        
-            
-
-            # Check Session (using .get first so we don't lose it on failure)
-            force_track_session = request.session.get("force_ledger_track", False)
-           
+            is_wizard_flow = is_wizard
 
-            target_person = None
+            # Resolve the person BEFORE saving so the post_save signal applies
+            # the ledger exactly once, with the right intent (no second pass here)
+            target_name, target_link = "", None
             if expense.is_borrowed and expense.borrowed_from:
-                target_person = get_or_create_person_by_name(request.user, expense.borrowed_from)
-                print(f"DEBUG: Target Person (Borrowed) -> {target_person.name}")
+                target_name, target_link = expense.borrowed_from, "borrowed_from_person"
             elif expense.is_for_others and expense.paid_for:
-                target_person = get_or_create_person_by_name(request.user, expense.paid_for)
-                print(f"DEBUG: Target Person (Paid For) -> {target_person.name}")
-            else:
-                print("DEBUG: No target person identified.")
+                target_name, target_link = expense.paid_for, "paid_for_person"
+
+            target_person = None
+            if target_name:
+                if is_wizard_flow:
+                    target_person = get_or_create_person_by_name(request.user, target_name)
+                else:
+                    target_person = get_person_by_name(request.user, target_name)
 
             if target_person:
-                is_wizard_flow = force_track_session or (str(from_people) == "1")
-               
+                setattr(expense, target_link, target_person)  # spares save() the lookup
+                if is_wizard_flow or target_person.tracking_preference == Person.TRACK:
+                    expense.ledger_intent = LEDGER_APPLY
 
-                if is_wizard_flow:
-                    print("DEBUG: ACTION -> Force Applying to Ledger...") 
-                    #  Session POP 
-                    if force_track_session:
-                        request.session.pop("force_ledger_track", None)
-                        
-                    apply_expense_to_person_ledger(request.user, expense, force_apply=True)
-                    
+            expense.save()
 
-                else:
-                    
-                    if target_person.tracking_preference == Person.TRACK:
-                        
-                        apply_expense_to_person_ledger(request.user, expense, force_apply=True)
+            if target_name and target_person is None:
+                # New people start as ASK (created after the save: nothing applied yet)
+                target_person = get_or_create_person_by_name(request.user, target_name)
+
+            # Wizard / TRACK: already applied by the post_save signal above
+            if target_person and not is_wizard_flow and target_person.tracking_preference == Person.ASK:
+                set_ask_banner(request, EXPENSE_BANNER, target_person, expense, month_redirect_url(next_url, expense.date))
 
-                    elif target_person.tracking_preference == Person.ASK:
-                        
-                        request.session.pop("pending_banner", None)
-                        redirect_target = month_redirect_url(next_url, expense.date)
-
-                        apply_and_track_url = reverse("people-apply-expense-and-track", args=[target_person.pk, expense.pk]) + "?" + urlencode({"next": redirect_target})
-                        apply_once_url = reverse("people-apply-expense-once", args=[target_person.pk, expense.pk]) + "?" + urlencode({"next": redirect_target})
-                        set_no_track_url = reverse("people-set-no-track", args=[target_person.pk]) + "?" + urlencode({"next": redirect_target})
-
-                        banner_html = (
-                            f"<div style='margin-bottom:.4rem;'>"
-                            f"<strong>Expense involves {target_person.name}</strong> — {currency}{expense.amount}. "
-                            f"Do you want Kharcha to track balances with <strong>{target_person.name}</strong>? "
-                            f"<a href='#' class='ask-btn ask-yes' data-post-url='{apply_and_track_url}'>Yes — track & apply</a> · "
-                            f"<a href='#' class='ask-btn ask-once' data-post-url='{apply_once_url}'>Apply this once</a> · "
-                            f"<a href='#' class='ask-btn ask-no' data-post-url='{set_no_track_url}'>No — don't track</a>"
-                            f"</div>"
-                        )
-                        request.session["pending_banner"] = {"type": "expense_ask", "html": banner_html}
-                        request.session.modified = True
-            
-            
             return redirect(month_redirect_url(next_url, expense.date))
-        else:
-            print("DEBUG: Form Invalid:", form.errors)
 
     else:
         # GET Request Logic (Simplified for brevity - your existing code works here)
@@ -483,8 +474,7 @@ def add_expense(request):
         if cat_param:
             alias = cat_param.strip().lower().replace("_", " ").replace("-", " ").strip()
             lookup_name = "Repayment" if alias in {"repayment", "loan repayment", "loan_repayment"} else cat_param.strip().title()
-            category_obj = Category.objects.filter(user=request.user, name__iexact=lookup_name).first()
-            if not category_obj: category_obj = Category.objects.filter(user__isnull=True, name__iexact=lookup_name).first()
+            category_obj = category_directory(request.user).find(lookup_name)
             if category_obj: initial["category"] = category_obj.pk
 
         form = ExpenseForm(initial=initial, user=request.user)
@@ -541,35 +531,13 @@ def edit_expense(request, pk):
                 expense.paid_for = ""
 
             # same new_category logic as add_expense ...
+            directory = form.fields["category"].directory
             new_category_name = (request.POST.get("new_category") or "").strip()
             if new_category_name:
-                normalized_name = new_category_name.strip().title()
-
-                existing_category = Category.objects.filter(
-                    user=request.user,
-                    name__iexact=normalized_name,
-                ).first()
-
-                if not existing_category:
-                    existing_category = Category.objects.filter(
-                        user__isnull=True,
-                        name__iexact=normalized_name,
-                    ).first()
-
-                if existing_category:
-                    expense.category = existing_category
-                else:
-                    expense.category = Category.objects.create(
-                        name=normalized_name,
-                        user=request.user,
-                    )
+                expense.category = get_or_create_category(request.user, new_category_name, directory)
 
             if expense.category is None:
-                misc, _ = Category.objects.get_or_create(
-                    name="Miscellaneous",
-                    user=None,
-                )
-                expense.category = misc
+                expense.category = miscellaneous_category(request.user, directory)
 
             expense.save()
 
@@ -614,23 +582,23 @@ def expense_download_csv(request):
     today = date.today()
     formatted_date = today.strftime("%d-%b-%Y").lower()
 
-    from_date_str = request.GET.get("from_date") or ""
-    to_date_str = request.GET.get("to_date") or ""
+    # Same date semantics as my_expenses: no dates at all -> this month,
+    # a blank bound stays open. ?range=all exports everything.
+    qs = Expense.objects.filter(user=user)
 
-    if from_date_str and to_date_str:
-        try:
-            current_from = date.fromisoformat(from_date_str)
-            current_to = date.fromisoformat(to_date_str)
-        except ValueError:
-            current_from, current_to = today.replace(day=1), today
-    else:
-        current_from, current_to = today.replace(day=1), today
-
-    qs = (
-        Expense.objects
-        .filter(user=user, date__range=(current_from, current_to))
-        .order_by("-date", "-created_at")
-    )
+    if request.GET.get("range") != "all":
+        if "from_date" not in request.GET and "to_date" not in request.GET:
+            qs = qs.filter(date__range=(today.replace(day=1), today))
+        else:
+            try:
+                from_date = request.GET.get("from_date") or ""
+                to_date = request.GET.get("to_date") or ""
+                if from_date:
+                    qs = qs.filter(date__gte=date.fromisoformat(from_date))
+                if to_date:
+                    qs = qs.filter(date__lte=date.fromisoformat(to_date))
+            except ValueError:
+                qs = Expense.objects.filter(user=user, date__range=(today.replace(day=1), today))
 
     selected_category = request.GET.get("category", "all")
     selected_person = request.GET.get("person", "all")
@@ -640,32 +608,21 @@ def expense_download_csv(request):
         qs = qs.filter(category_id=selected_category)
 
     if selected_person != "all":
-        qs = qs.filter(paid_for__iexact=selected_person)
+        qs = qs.filter(named_person_q(user, selected_person, "paid_for_person", "paid_for"))
 
     if payment_type != "all":
         qs = qs.filter(payment_type=payment_type)
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="expenses_{formatted_date}.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        "Date",
-        "Amount",
-        "Category",
-        "Description",
-        "Paid For",
-        "Payment Type",
-    ])
-
-    for expense in qs:
-        writer.writerow([
-            expense.date,
-            expense.amount,
-            expense.category.name if expense.category else "",
-            expense.description or "",
-            expense.paid_for or "",
-            expense.payment_type or "",
-        ])
-
-    return response
+    # Plain tuples in chunks; category name comes from the JOIN, not a query per row
+    rows = (
+        qs.order_by("-date", "-created_at")
+        .values_list("date", "amount", "category__name", "description", "paid_for", "payment_type")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    return stream_csv(
+        f"expenses_{formatted_date}.csv",
+        ["Date", "Amount", "Category", "Description", "Paid For", "Payment Type"],
+        rows,
+        gzip=wants_gzip(request),
+    )
@@ -1,9 +1,13 @@
 from django.contrib import admin
+
+from kharcha.admin import LargeTableAdmin, UserFilter
 from .models import Income
 
 
 @admin.register(Income)
-class IncomeAdmin(admin.ModelAdmin):
+class IncomeAdmin(LargeTableAdmin):
     list_display = ("user", "date", "amount", "source", "payment_type", "person", "created_at")
-    list_filter = ("user", "source", "payment_type", "person", "date")
+    list_filter = (UserFilter, "source", "payment_type", "date")
+    list_select_related = ("user",)
     search_fields = ("source", "person", "description")
+    autocomplete_fields = ("user",)
@@ -27,6 +27,8 @@ class IncomeForm(forms.ModelForm):
                 attrs={
                     "class": "form-control",
                     "placeholder": "Who was this with ?",
+                    "autocomplete": "off",
+                    "data-person-autocomplete": "1",
                 }
             ),
             "description": forms.TextInput(
@@ -0,0 +1,80 @@
+from django.db import transaction
+
+from .forms import IncomeForm
+from .models import Income
+from .utils import rebuild_income_rollups
+from expenses.importers import (
+    IMPORT_BATCH_SIZE,
+    ImportResult,
+    batched,
+    choice_value,
+    form_errors,
+    read_rows,
+    rebind,
+)
+from kharcha.cache import INCOME, LEDGER, bump
+from people.balances import refresh_person_summaries
+from people.counterparties import rebuild_counterparties
+from people.models import PersonLedgerEntry
+from people.utils import LedgerBatch
+from search.utils import rebuild_search_index
+
+
+def _income_data(row) -> dict:
+    return {
+        "date": row.get("date", ""),
+        "amount": row.get("amount", "").replace(",", ""),
+        "source": choice_value(row.get("source"), Income.SOURCE_CHOICES, "other"),
+        "payment_type": choice_value(row.get("payment_type"), Income.PAYMENT_TYPE_CHOICES, "cash"),
+        "person": row.get("person", ""),
+        "description": row.get("description", ""),
+    }
+
+
+def import_incomes(user, lines, batch_size=IMPORT_BATCH_SIZE, dry_run=False) -> ImportResult:
+    """
+    Import incomes from CSV (Date, Amount, Source, Person, Payment Type,
+    Description; the income download is a valid input).
+
+    Same pipeline as import_expenses: IncomeForm validation, bulk_create
+    per batch, missing people created in one insert and loan / repayment
+    rows applied to tracked people's ledgers by LedgerBatch.
+    """
+    result = ImportResult()
+
+    form = IncomeForm({})
+
+    with transaction.atomic():
+        ledger = LedgerBatch(user)
+
+        for batch in batched(read_rows(lines), batch_size):
+            incomes = []
+            for line_no, row in batch:
+                rebind(form, _income_data(row), Income())
+                if not form.is_valid():
+                    result.errors.append((line_no, form_errors(form)))
+                    continue
+
+                income = form.save(commit=False)
+                income.user = user
+                income.normalize_people()
+                incomes.append(income)
+
+            result.created += len(incomes)
+            if dry_run or not incomes:
+                continue
+
+            ledger.add_people(income.person for income in incomes)
+            ledger.link(incomes)
+            Income.objects.bulk_create(incomes)
+            entries = PersonLedgerEntry.objects.bulk_create(ledger.income_entries(incomes))
+            result.ledger_entries += len(entries)
+
+        if result.created and not dry_run:
+            rebuild_income_rollups(user.pk)
+            rebuild_counterparties(user.pk)
+            bump(user.pk, INCOME, LEDGER)
+            refresh_person_summaries(ledger.touched)
+            rebuild_search_index(user.pk)
+
+    return result
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BATCH_SIZE = 2000
+LINKS = (("person", "linked_person"),)
+
+
+def _key(name):
+    # Frozen copy of expenses.models.name_key
+    return " ".join((name or "").split()).casefold()
+
+
+def link_people(apps, schema_editor):
+    Person = apps.get_model("people", "Person")
+    Income = apps.get_model("income", "Income")
+
+    people = {
+        (user_id, key): pk
+        for pk, user_id, key in Person.objects.values_list("pk", "user_id", "name_key").iterator(chunk_size=BATCH_SIZE)
+    }
+    named = models.Q()
+    for name_field, _ in LINKS:
+        named |= ~models.Q(**{name_field: ""})
+
+    # Keyset batches over the rows that name someone
+    last_pk = 0
+    while True:
+        batch = list(
+            Income.objects.filter(named, pk__gt=last_pk).order_by("pk")
+            .only("pk", "user_id", *(name_field for name_field, _ in LINKS))[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for row in batch:
+            for name_field, fk_field in LINKS:
+                name = getattr(row, name_field)
+                setattr(row, f"{fk_field}_id", people.get((row.user_id, _key(name))) if name else None)
+        Income.objects.bulk_update(batch, [fk_field for _, fk_field in LINKS])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('income', '0007_income_user_date_idx'),
+        ('people', '0011_person_name_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='income',
+            name='linked_person',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='incomes', to='people.person'),
+        ),
+        migrations.RunPython(link_people, migrations.RunPython.noop),
+    ]
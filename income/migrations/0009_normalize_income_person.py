@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:20
+
+from django.db import migrations
+
+
+BATCH_SIZE = 2000
+
+
+def _normalize(value):
+    # Frozen copy of expenses.models.normalize_name
+    return " ".join(part.capitalize() for part in (value or "").split())
+
+
+def normalize_people(apps, schema_editor):
+    """
+    Income.save() normalizes `person` only since people 0011; older rows
+    may hold "ravi " or "RAVI". Rewrite them so lookups can compare names
+    exactly.
+    """
+    Income = apps.get_model("income", "Income")
+
+    last_pk = 0
+    while True:
+        batch = list(
+            Income.objects.exclude(person="").filter(pk__gt=last_pk).order_by("pk")
+            .only("pk", "person")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        changed = []
+        for row in batch:
+            name = _normalize(row.person)
+            if name != row.person:
+                row.person = name
+                changed.append(row)
+        Income.objects.bulk_update(changed, ["person"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('income', '0008_income_linked_person'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_people, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
 from django.conf import settings
 from django.db import models
 
+from expenses.models import LEDGER_AUTO, LoadedValuesMixin, PersonLinksMixin, normalize_name
 
-class Income(models.Model):
+
+class Income(LoadedValuesMixin, PersonLinksMixin, models.Model):
     SOURCE_CHOICES = [
         ("salary_wages", "Salary / Wages"),
         ("business", "Business Income"),
@@ -51,6 +53,12 @@ class Income(models.Model):
         blank=True,
         help_text="Who gave you this money? (optional)",
     )
+    # The Person row behind `person` (None when nobody by that name exists)
+    linked_person = models.ForeignKey(
+        "people.Person", on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="incomes",
+    )
+    PERSON_LINKS = (("person", "linked_person"),)
 
     # Description (optional)
     description = models.CharField(
@@ -68,13 +76,56 @@ class Income(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Fields that decide which monthly rollup bucket an income lands in
+    ROLLUP_FIELDS = ("date", "amount", "source", "payment_type")
+    # Fields the person ledger row is derived from
+    LEDGER_FIELDS = ("date", "amount", "source", "person", "linked_person_id", "applied_to_people")
+    ledger_intent = LEDGER_AUTO
+
     class Meta:
         ordering = ["-date", "-created_at"]
+        indexes = [
+            # Every list / summary query: user + date range, newest first
+            models.Index(fields=["user", "-date", "-created_at"], name="income_user_date_idx"),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.person:
-            self.person = self.person.strip().title()
+        self.normalize_people()
+        kwargs["update_fields"] = self.link_people(kwargs.get("update_fields"))
         super().save(*args, **kwargs)
 
+    def normalize_people(self):
+        # save() runs this; bulk_create() skips save(), so bulk paths call it directly
+        if self.person:
+            self.person = normalize_name(self.person)
+
     def __str__(self):
         return f"{self.user.username} +₹{self.amount} on {self.date}"
+
+
+class IncomeMonthlyRollup(models.Model):
+    """
+    Pre-aggregated income totals per user, month, source and payment type.
+    Kept current by income.signals.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="income_rollups",
+    )
+    # Always the first day of the month
+    month = models.DateField()
+    source = models.CharField(max_length=30)
+    payment_type = models.CharField(max_length=20)
+
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    entry_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "month"], name="income_rollup_user_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m}: {self.total} ({self.entry_count})"
@@ -1,13 +1,17 @@
 # income/signals.py
 import logging
 from decimal import Decimal
-from django.db import transaction
+from django.db import DEFAULT_DB_ALIAS
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 from .models import Income
-from people.models import PersonLedgerEntry, Person
-from people.utils import get_or_create_person_by_name, apply_income_to_person_ledger
+from .utils import sync_income_rollup
+from expenses.models import LEDGER_APPLY, LEDGER_AUTO
+from expenses.utils import remember_values, values_changed
+from kharcha.cache import INCOME, bump
+from people.counterparties import sync_income_counterparties
+from people.ledger_queue import queue_ledger_sync
 
 logger = logging.getLogger(__name__)
 ZERO = Decimal("0.00")
@@ -16,51 +20,46 @@ ZERO = Decimal("0.00")
 @receiver(post_save, sender=Income)
 def rebuild_income_person_ledger(sender, instance: Income, created, **kwargs):
     """
-    Idempotent: delete old PersonLedgerEntry rows for this Income, then decide whether to apply.
-    - If instance.applied_to_people is True -> force apply (user explicitly applied)
+    Idempotent: skipped when no Income.LEDGER_FIELDS changed; otherwise queued, and on
+    commit the income's existing PersonLedgerEntry row is updated in place (or deleted).
+    - If instance.applied_to_people is True (or ledger_intent == LEDGER_APPLY)
+      -> force apply (user explicitly applied)
     - Else -> apply only when person.tracking_preference == Person.TRACK
     """
-    user = getattr(instance, "user", None)
-    if not user:
+    if not instance.user_id:
         logger.warning("Income saved without user: id=%s", getattr(instance, "pk", "<unknown>"))
         return
 
-    person_raw = (getattr(instance, "person", "") or "").strip()
-    if not person_raw:
-        # nothing to do
-        return
-
-    try:
-        with transaction.atomic():
-            # delete any previous ledger entries for this income
-            PersonLedgerEntry.objects.filter(income=instance).delete()
+    # Only the LEDGER_FIELDS feed the ledger row; e.g. a description
+    # edit leaves it untouched (no ledger queries at all)
+    explicit = instance.ledger_intent == LEDGER_APPLY
+    instance.ledger_intent = LEDGER_AUTO  # one save, one application
+    ledger_changed = created or explicit or values_changed(instance, Income.LEDGER_FIELDS)
 
-            person = get_or_create_person_by_name(user, person_raw)
-            if not person:
-                return
+    # Keep the monthly summary rollup and the dropdown directory in step
+    sync_income_rollup(instance, created=created)
+    sync_income_counterparties(instance, created=created)
+    remember_values(instance)
+    bump(instance.user_id, INCOME)
 
-            force_apply = bool(getattr(instance, "applied_to_people", False))
-            should_auto_apply = (getattr(person, "tracking_preference", Person.ASK) == Person.TRACK)
-
-            if not force_apply and not should_auto_apply:
-                logger.debug("Income #%s not applied: person %s pref=%s, applied_to_people=%s",
-                             instance.pk, person.name, getattr(person, "tracking_preference", None), getattr(instance, "applied_to_people", False))
-                return
+    if not ledger_changed:
+        return
+    if created and not (instance.person or "").strip():
+        return  # nobody to apply it to, and no rows yet
 
-            # delegate ledger creation logic to helper
-            applied = apply_income_to_person_ledger(user, person, instance)
-            if applied:
-                logger.info("Income #%s applied to person %s ledger (force=%s).", instance.pk, person.name, force_apply)
-    except Exception as exc:
-        logger.exception("Failed to rebuild person ledger for Income id=%s: %s", instance.pk, exc)
-        raise
+    # Queued: on commit LedgerBatch creates the (ASK) person if needed and
+    # updates the income's row in place, or deletes it when it no longer applies
+    queue_ledger_sync(instance, force_apply=explicit, using=kwargs.get("using") or DEFAULT_DB_ALIAS)
 
 
 @receiver(post_delete, sender=Income)
 def cleanup_income_person_ledger(sender, instance: Income, **kwargs):
-    try:
-        PersonLedgerEntry.objects.filter(income=instance).delete()
-    except Exception:
-        logger.exception("Failed to cleanup PersonLedgerEntry for deleted Income id=%s", getattr(instance, "pk", "<unknown>"))
-        raise
+    # Rollup / directory rows go away with the user, so only adjust them for direct deletes
+    origin = kwargs.get("origin")
+    if isinstance(origin, Income) or getattr(origin, "model", None) is Income:
+        sync_income_rollup(instance, deleted=True)
+        sync_income_counterparties(instance, deleted=True)
+        bump(instance.user_id, INCOME)
+    # Its PersonLedgerEntry row goes with it (FK CASCADE; the ledger's
+    # post_delete updates the person's summary)
 
@@ -1,3 +1,88 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from expenses.tests import QUERY_COUNT_SETTINGS, PageQueriesMixin, ledger_writes
+from kharcha.cache import SCOPES, bump
+from people.models import Person, PersonLedgerEntry
+from .models import Income
+
+
+@override_settings(**QUERY_COUNT_SETTINGS)
+class IncomeListQueryTests(PageQueriesMixin, TestCase):
+    """SQL round trips per income page (session-less, user and profile included)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("pages")
+        today = timezone.localdate()
+        for i in range(60):
+            Income.objects.create(
+                user=cls.user, amount=Decimal("100.00") + i,
+                date=today.replace(day=1) + timedelta(days=i % today.day),
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_first_page(self):
+        self.assertPageQueries("/income/", 6, 6)
+
+    def test_second_page(self):
+        self.assertPageQueries("/income/?page=2", 6, 6)
+
+    def test_cursor_paging(self):
+        self.assertPageQueries("/income/?paging=cursor", 6, 6)
+
+
+@override_settings(**QUERY_COUNT_SETTINGS)
+class IncomeWriteQueryTests(TestCase):
+    """SQL round trips of the add / banner POSTs, including the on-commit ledger work."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("writes")
+        cls.person = Person.objects.create(user=cls.user, name="Ravi", tracking_preference=Person.TRACK)
+        # An established user: every cache counter row exists already
+        bump(cls.user.pk, *SCOPES)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_add_income_loan_from_tracked_person(self):
+        data = {
+            "date": timezone.localdate().isoformat(), "amount": "40", "source": "loan",
+            "payment_type": "cash", "person": "Ravi",
+        }
+        with self.assertNumQueries(30) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post("/income/add/", data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ledger_writes(ctx.captured_queries), 1)
+        entry = PersonLedgerEntry.objects.get(person=self.person)
+        self.assertEqual(entry.amount, Decimal("-40.00"))
+
+    def test_apply_income_and_track(self):
+        # A loan from an ASK person: no ledger row until the banner's "track & apply"
+        with self.captureOnCommitCallbacks(execute=True):
+            income = Income.objects.create(
+                user=self.user, amount=Decimal("50.00"), date=timezone.localdate(), source="loan", person="Meera",
+            )
+        asked = Person.objects.get(user=self.user, name="Meera")
+        self.assertEqual(asked.tracking_preference, Person.ASK)
+        self.assertFalse(PersonLedgerEntry.objects.filter(person=asked).exists())
+
+        with self.assertNumQueries(24) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f"/apply-income-and-track/{asked.pk}/{income.pk}/")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ledger_writes(ctx.captured_queries), 1)
+        asked.refresh_from_db()
+        self.assertEqual(asked.tracking_preference, Person.TRACK)
+        self.assertEqual(PersonLedgerEntry.objects.get(person=asked).amount, Decimal("-50.00"))
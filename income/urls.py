@@ -6,5 +6,5 @@ urlpatterns = [
     path("income/add/", views.income_add, name="income-add"),
     path("income/<int:pk>/edit/", views.income_edit, name="income-edit"),
     path("income/<int:pk>/delete/", views.income_delete, name="income-delete"),
-    path("download/", views.income_download_csv, name="income-download"),
+    path("income/download/", views.income_download_csv, name="income-download"),
 ]
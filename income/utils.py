@@ -0,0 +1,80 @@
+from decimal import Decimal
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from expenses.utils import month_floor, sync_rollup, whole_month_range
+from .models import Income, IncomeMonthlyRollup
+
+
+ZERO = Decimal("0.00")
+
+
+def _income_bucket(values: dict) -> dict:
+    return {
+        "month": month_floor(values["date"]),
+        "source": values["source"],
+        "payment_type": values["payment_type"],
+    }
+
+
+def rebuild_income_rollups(user_id=None) -> int:
+    """Recompute income rollups from raw rows (one user, or everyone)."""
+    incomes = Income.objects.all()
+    rollups = IncomeMonthlyRollup.objects.all()
+    if user_id is not None:
+        incomes = incomes.filter(user_id=user_id)
+        rollups = rollups.filter(user_id=user_id)
+
+    rows = (
+        incomes
+        .annotate(month=TruncMonth("date"))
+        .values("user_id", "month", "source", "payment_type")
+        .annotate(total=Sum("amount"), entry_count=Count("id"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        created = IncomeMonthlyRollup.objects.bulk_create(
+            (IncomeMonthlyRollup(**row) for row in rows),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def sync_income_rollup(instance: Income, created=False, deleted=False):
+    sync_rollup(
+        IncomeMonthlyRollup,
+        instance,
+        Income.ROLLUP_FIELDS,
+        _income_bucket,
+        rebuild_income_rollups,
+        created=created,
+        deleted=deleted,
+    )
+
+
+def income_rollup_summary(user, from_date, to_date, **bucket_filters) -> Optional[dict]:
+    """
+    Total + row count from the rollup table, optionally narrowed on
+    source / payment_type. None when the range is not whole months.
+    """
+    months = whole_month_range(from_date, to_date)
+    if months is None:
+        return None
+
+    first_month, last_month = months
+    qs = IncomeMonthlyRollup.objects.filter(user=user, **bucket_filters)
+    if first_month:
+        qs = qs.filter(month__gte=first_month)
+    if last_month:
+        qs = qs.filter(month__lte=last_month)
+
+    agg = qs.aggregate(rows=Sum("entry_count"), amount=Sum("total"))
+    return {
+        "entry_count": agg["rows"] or 0,
+        "total": agg["amount"] or ZERO,
+    }
@@ -2,19 +2,22 @@ from decimal import Decimal
 from datetime import date, timedelta
 
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Sum
+from django.db.models import Count, Sum
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from expenses.views import month_redirect_url 
-from accounts.utils import get_currency_symbol 
+from kharcha.cache import INCOME, PEOPLE, cached_value
+from kharcha.exports import EXPORT_CHUNK_SIZE, stream_csv, wants_gzip
+from kharcha.pagination import CountedPaginator, KeysetPaginator, keyset_params
 
 
 from .models import Income
 from .forms import IncomeForm
-import csv
-from django.http import HttpResponse
-from people.models import Person, PersonLedgerEntry
+from .utils import income_rollup_summary
+from people.banners import INCOME as INCOME_BANNER, set_ask_banner
+from people.counterparties import counterparty_names
+from people.models import Counterparty, Person
+from people.utils import get_person_by_name, named_person_q
 
 
 
@@ -30,10 +33,14 @@ def _month_bounds(d: date):
 def income_list(request):
     user = request.user
 
+    # Filters come from the URL, or from the cursor token in keyset mode
+    params, cursor_state = keyset_params(request)
+    cursor_mode = params.get("paging") == "cursor"
+
     # ---------------- Date range (from_date / to_date) like expenses ----------------
     today = date.today()
-    from_date_str = request.GET.get("from_date") or ""
-    to_date_str = request.GET.get("to_date") or ""
+    from_date_str = params.get("from_date") or ""
+    to_date_str = params.get("to_date") or ""
 
     if from_date_str and to_date_str:
         try:
@@ -80,50 +87,81 @@ def income_list(request):
     )
 
     # ---------------- Filters (source / person / payment_type) ----------------
-    selected_source = request.GET.get("source", "all")
-    selected_person = request.GET.get("person", "all")
-    payment_type = request.GET.get("payment_type", "all")
+    selected_source = params.get("source", "all")
+    selected_person = params.get("person", "all")
+    payment_type = params.get("payment_type", "all")
 
     if selected_source != "all":
         base_qs = base_qs.filter(source=selected_source)
 
     if selected_person != "all":
-        base_qs = base_qs.filter(person__iexact=selected_person)
+        base_qs = base_qs.filter(named_person_q(user, selected_person, "linked_person", "person"))
 
     if payment_type != "all":
         base_qs = base_qs.filter(payment_type=payment_type)
 
-    # person list for dropdown
-    person_list = (
-        Income.objects
-        .filter(user=user)
-        .exclude(person__isnull=True)
-        .exclude(person="")
-        .values_list("person", flat=True)
-        .distinct()
-        .order_by("person")
-    )
+    # person list for dropdown (cached directory)
+    person_list = counterparty_names(user, Counterparty.INCOME_PERSON)
 
     # ---------------- Summary & flags ----------------
-    summary = base_qs.aggregate(total_amount=Sum("amount"))
-    total = summary["total_amount"] or Decimal("0.00")
-    has_results = base_qs.exists()
-
-    # ---------------- Pagination ----------------
-    page_number = request.GET.get("page", 1)
-    paginator = Paginator(base_qs, 20)
-    page_obj = paginator.get_page(page_number)
+    # Month ranges without a person filter are served by the rollup table
+    summary = None
+    if selected_person == "all":
+        rollup_filters = {}
+        if selected_source != "all":
+            rollup_filters["source"] = selected_source
+        if payment_type != "all":
+            rollup_filters["payment_type"] = payment_type
+        summary = income_rollup_summary(user, current_from, current_to, **rollup_filters)
+
+    def compute_summary():
+        # One round trip for both the total and the row count
+        agg = base_qs.aggregate(entry_count=Count("id"), total_amount=Sum("amount"))
+        return {
+            "entry_count": agg["entry_count"],
+            "total": agg["total_amount"] or Decimal("0.00"),
+        }
+
+    # Raw-row aggregates only: same filters (the queryset's SQL), same data
+    # version, no summary query
+    if summary is None:
+        summary = cached_value("income:summary", user.pk, (INCOME, PEOPLE), compute_summary, str(base_qs.query))
+
+    total = summary["total"]
+    has_results = summary["entry_count"] > 0
 
     # ---------------- Querystrings for links ----------------
-    qs = request.GET.copy()
-    qs.pop("page", None)
+    qs = params.copy()
+    for key in ["page", "cursor"]:
+        qs.pop(key, None)
     base_querystring = qs.urlencode()
 
-    month_qs = request.GET.copy()
-    for key in ["from_date", "to_date", "page"]:
+    # Same filters with the paging mode flipped (numbered <-> cursor)
+    toggle_qs = qs.copy()
+    if cursor_mode:
+        toggle_qs.pop("paging", None)
+    else:
+        toggle_qs["paging"] = "cursor"
+    paging_toggle_qs = toggle_qs.urlencode()
+
+    month_qs = qs.copy()
+    for key in ["from_date", "to_date"]:
         month_qs.pop(key, None)
     month_base_qs = month_qs.urlencode()
 
+    # ---------------- Pagination ----------------
+    if cursor_mode:
+        # Opt-in seek pagination: constant cost per page, no COUNT / OFFSET
+        paginator = KeysetPaginator(
+            base_qs, ("-date", "-created_at", "id"), 20, querystring=base_querystring
+        )
+        page_obj = paginator.get_page(cursor_state)
+    else:
+        page_number = params.get("page", 1)
+        # Reuse the summary count instead of a separate COUNT(*)
+        paginator = CountedPaginator(base_qs, 20, summary["entry_count"])
+        page_obj = paginator.get_page(page_number)
+
     context = {
         "incomes": page_obj,
         "page_obj": page_obj,
@@ -142,6 +180,8 @@ def income_list(request):
         "has_next_month": has_next_month,
         "month_base_qs": month_base_qs,
         "base_querystring": base_querystring,
+        "cursor_mode": cursor_mode,
+        "paging_toggle_qs": paging_toggle_qs,
 
         "selected_source": selected_source,
         "selected_person": selected_person,
@@ -157,7 +197,6 @@ def income_list(request):
 def income_add(request):
     next_url = request.GET.get("next") or request.POST.get("next", "")
     from_people = request.GET.get("from_people") or request.POST.get("from_people")
-    currency = get_currency_symbol(request.user.profile)
 
 
     def canonical_source_from_param(src):
@@ -174,18 +213,11 @@ def income_add(request):
 
             # ========== FROM PEOPLE FLOW ==========
             if from_people == "1" and income.person and income.source in {"loan", "loan_repayment"}:
-                person = Person.objects.filter(
-                    user=request.user,
-                    name__iexact=income.person.strip()
-                ).first()
+                person = get_person_by_name(request.user, income.person)
 
                 if person:
-                    balance = (
-                        PersonLedgerEntry.objects
-                        .filter(user=request.user, person=person, archived=False)
-                        .aggregate(total=Sum("amount"))["total"]
-                        or Decimal("0.00")
-                    )
+                    income.linked_person = person  # spares save() the lookup
+                    balance = person.cached_balance
 
                     # Loan repayment when YOU owe them → do NOT auto apply
                     if income.source == "loan_repayment" and balance <= 0:
@@ -214,40 +246,11 @@ def income_add(request):
                 and income.person
                 and income.source in {"loan", "loan_repayment"}
             ):
-                person = Person.objects.filter(
-                    user=request.user,
-                    name__iexact=income.person.strip()
-                ).first()
+                # Not linked yet when the save just created them (as ASK)
+                person = income.linked_person or get_person_by_name(request.user, income.person)
 
                 if person and person.tracking_preference == Person.ASK:
-                    apply_track = reverse(
-                        "people-apply-income-and-track",
-                        args=[person.pk, income.pk]
-                    ) + f"?next={redirect_url}"
-
-                    apply_once = reverse(
-                        "people-apply-income-once",
-                        args=[person.pk, income.pk]
-                    ) + f"?next={redirect_url}"
-
-                    dont_track = reverse(
-                        "people-set-no-track",
-                        args=[person.pk]
-                    ) + f"?next={redirect_url}"
-
-                    html = (
-                        f"<strong>Income involves {person.name}</strong> — {currency}{income.amount}. "
-                        f"Do you want Kharcha to track balances with <strong>{person.name}</strong>? "
-                        f"<a href='#' class='ask-btn ask-yes' data-post-url='{apply_track}'>Yes — track & apply</a> · "
-                        f"<a href='#' class='ask-btn ask-once' data-post-url='{apply_once}'>Apply this once</a> · "
-                        f"<a href='#' class='ask-btn ask-no' data-post-url='{dont_track}'>No — don't track</a>"
-                    )
-
-                    request.session["pending_banner"] = {
-                        "type": "income_ask",
-                        "html": str(html),
-                    }
-                    request.session.modified = True
+                    set_ask_banner(request, INCOME_BANNER, person, income, redirect_url)
 
             return redirect(redirect_url)
 
@@ -331,23 +334,23 @@ def income_download_csv(request):
     today = date.today()
     formatted_date = today.strftime("%d-%b-%Y").lower()
 
-    from_date_str = request.GET.get("from_date") or ""
-    to_date_str = request.GET.get("to_date") or ""
+    # Defaults to this month like income_list; ?range=all exports everything
+    qs = Income.objects.filter(user=user)
 
-    if from_date_str and to_date_str:
-        try:
-            current_from = date.fromisoformat(from_date_str)
-            current_to = date.fromisoformat(to_date_str)
-        except ValueError:
+    if request.GET.get("range") != "all":
+        from_date_str = request.GET.get("from_date") or ""
+        to_date_str = request.GET.get("to_date") or ""
+
+        if from_date_str and to_date_str:
+            try:
+                current_from = date.fromisoformat(from_date_str)
+                current_to = date.fromisoformat(to_date_str)
+            except ValueError:
+                current_from, current_to = _month_bounds(today)
+        else:
             current_from, current_to = _month_bounds(today)
-    else:
-        current_from, current_to = _month_bounds(today)
 
-    qs = (
-        Income.objects
-        .filter(user=user, date__range=(current_from, current_to))
-        .order_by("-date", "-created_at")
-    )
+        qs = qs.filter(date__range=(current_from, current_to))
 
     selected_source = request.GET.get("source", "all")
     selected_person = request.GET.get("person", "all")
@@ -357,32 +360,20 @@ def income_download_csv(request):
         qs = qs.filter(source=selected_source)
 
     if selected_person != "all":
-        qs = qs.filter(person__iexact=selected_person)
+        qs = qs.filter(named_person_q(user, selected_person, "linked_person", "person"))
 
     if payment_type != "all":
         qs = qs.filter(payment_type=payment_type)
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="income_{formatted_date}.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        "Date",
-        "Amount",
-        "Source",
-        "Person",
-        "Payment Type",
-        "Description",
-    ])
-
-    for income in qs:
-        writer.writerow([
-            income.date,
-            income.amount,
-            income.source,
-            income.person or "",
-            income.payment_type or "",
-            income.description or "",
-        ])
-
-    return response
\ No newline at end of file
+    rows = (
+        qs.order_by("-date", "-created_at")
+        .values_list("date", "amount", "source", "person", "payment_type", "description")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    return stream_csv(
+        f"income_{formatted_date}.csv",
+        ["Date", "Amount", "Source", "Person", "Payment Type", "Description"],
+        rows,
+        gzip=wants_gzip(request),
+    )
@@ -0,0 +1,109 @@
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+from expenses.models import name_key
+
+
+# -------------------------------------------------
+# Changelist filters
+# -------------------------------------------------
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Sidebar filter with a text box instead of a list of choices, for
+    columns with too many values to list (users, people, categories):
+    RelatedFieldListFilter would load every row of the related table.
+    """
+
+    template = "admin/input_filter.html"
+    lookup = None  # e.g. "user__username__iexact"
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = (self.value() or "").strip()
+        if value:
+            return queryset.filter(**{self.lookup: self.lookup_value(value)})
+        return queryset
+
+    def lookup_value(self, value):
+        return value
+
+    def choices(self, changelist):
+        # Other filters / search / ordering, carried as hidden inputs
+        remaining = QueryDict(changelist.get_query_string(remove=[self.parameter_name])[1:])
+        yield {
+            "value": self.value() or "",
+            "hidden": [(key, value) for key, values in remaining.lists() for value in values],
+            "clear_query_string": changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
+class UserFilter(InputFilter):
+    title = "user"
+    parameter_name = "username"
+    lookup = "user__username__iexact"
+
+
+class PersonFilter(InputFilter):
+    title = "person"
+    parameter_name = "person_name"
+    lookup = "person__name_key"
+
+    def lookup_value(self, value):
+        return name_key(value)
+
+
+class CategoryFilter(InputFilter):
+    title = "category"
+    parameter_name = "category_name"
+    lookup = "category__name__iexact"
+
+
+# -------------------------------------------------
+# Counting
+# -------------------------------------------------
+
+# Above this many rows an unfiltered changelist shows the planner's estimate
+ESTIMATE_COUNT_ABOVE = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that skips COUNT(*) over a whole large table.
+
+    On PostgreSQL an unfiltered changelist uses pg_class.reltuples
+    (kept current by autovacuum / ANALYZE) once the table is big;
+    filtered lists, small tables and other backends count exactly.
+    Pair with show_full_result_count = False.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if connection.vendor == "postgresql" and query is not None and not query.where:
+            estimate = self._estimate(self.object_list.model._meta.db_table)
+            if estimate > ESTIMATE_COUNT_ABOVE:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def _estimate(table) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > 0 else 0
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin defaults for tables that grow with every user's activity."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
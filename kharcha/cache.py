@@ -0,0 +1,112 @@
+"""
+Per-user versioned caching.
+
+Every user has a data-version counter per scope (EXPENSES, INCOME, LEDGER,
+...), and every scope has a global counter too. A cached value is stored
+under a key that embeds the counters of the scopes it was computed from,
+so bumping any of them moves the key: stale entries are never read again
+and simply expire. Nothing has to know which keys exist.
+
+The counters are rows of accounts.DataVersion, bumped with an atomic
+UPDATE ... SET version = version + 1 inside the writing transaction, so
+they move for everybody exactly when the data does, whatever cache
+backend (or number of workers) holds the values. A request reads all of a
+user's counters in one query (see kharcha.identity).
+
+Signals bump the counters for single-row writes; bulk paths
+(bulk_create, queryset update()) call bump() themselves.
+
+    summary = cached_value("expense-summary", user.pk, (EXPENSES,), compute, from_date, to_date)
+
+Only cache what costs more than the cache round trip itself (with the
+database backend, a query): a single indexed aggregate does not qualify.
+
+For template fragments, vary Django's {% cache %} tag on data_version():
+
+    {% cache 600 "people-rows" request.user.pk version %}
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import F
+
+from . import identity
+
+
+EXPENSES = "expenses"
+INCOME = "income"
+LEDGER = "ledger"            # PersonLedgerEntry rows
+PEOPLE = "people"            # Person rows (names, preferences, summaries)
+CATEGORIES = "categories"
+COUNTERPARTIES = "counterparties"
+
+SCOPES = (EXPENSES, INCOME, LEDGER, PEOPLE, CATEGORIES, COUNTERPARTIES)
+
+GLOBAL = "global"
+GLOBAL_OWNER = 0             # DataVersion.owner of the global counters
+
+DEFAULT_TIMEOUT = 60 * 60
+
+_MISSING = object()
+
+
+def bump(user_id, *scopes):
+    """
+    Invalidate what `user_id` (None: every user) has cached from `scopes`.
+
+    Inside a transaction the counters stay locked until it ends, and other
+    requests see them move together with the rows written.
+    """
+    from accounts.models import DataVersion
+
+    owner = user_id or GLOBAL_OWNER
+    counters = DataVersion.objects.filter(owner=owner, scope__in=scopes)
+    if counters.update(version=F("version") + 1) < len(set(scopes)):
+        # First bump of some scope: create the missing rows and bump again
+        # (an extra step on the others is harmless; a lost one would not be)
+        DataVersion.objects.bulk_create(
+            [DataVersion(owner=owner, scope=scope) for scope in scopes], ignore_conflicts=True,
+        )
+        counters.update(version=F("version") + 1)
+    identity.forget(user_id, *scopes)
+
+
+def _read_versions(user_id) -> dict:
+    from accounts.models import DataVersion
+
+    return {
+        (owner, scope): version
+        for owner, scope, version in DataVersion.objects
+        .filter(owner__in={GLOBAL_OWNER, user_id or GLOBAL_OWNER})
+        .values_list("owner", "scope", "version")
+    }
+
+
+def data_version(user_id, *scopes) -> str:
+    """
+    The user's (and the global) counters for `scopes`, as one string. All
+    of the user's counters come from one query, once per request.
+    """
+    versions = identity.remember(
+        ("cache-versions", user_id), lambda: _read_versions(user_id), user_id, *SCOPES,
+    )
+    return ".".join(
+        str(versions.get((owner, scope), 0))
+        for scope in scopes for owner in (GLOBAL_OWNER, user_id or GLOBAL_OWNER)
+    )
+
+
+def versioned_key(name, user_id, scopes, *parts) -> str:
+    """Cache key for `name` + `parts` that moves whenever one of `scopes` is bumped."""
+    raw = ":".join([data_version(user_id, *scopes), *map(str, parts)])
+    return f"{name}:{user_id or GLOBAL}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def cached_value(name, user_id, scopes, compute, *parts, timeout=DEFAULT_TIMEOUT):
+    """compute() once per data version (and `parts`), then served from the cache."""
+    key = versioned_key(name, user_id, scopes, *parts)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
@@ -0,0 +1,90 @@
+"""
+Request-scoped identity map.
+
+IdentityMapMiddleware opens a fresh map for every request; views, forms,
+signals and people.utils then share one instance per looked-up object
+(the user's profile, a person by name, cache versions) instead of
+each fetching its own copy:
+
+    person = identity.remember(("person", user.pk, key), lambda: <query>, user.pk, PEOPLE)
+
+Entries are filed under a user and the kharcha.cache scopes they were read
+from, and kharcha.cache.bump() forgets them along with the cached values,
+so a write later in the request is never hidden by an earlier read.
+
+Outside a request (management commands, shell) there is no map and every
+lookup simply runs.
+"""
+import threading
+
+
+_local = threading.local()
+
+
+class IdentityMap:
+    """{key: object} for one request, with an index of keys by (user id, scope)."""
+
+    def __init__(self):
+        self.objects = {}
+        self.scoped = {}
+
+    def get(self, key, load, user_id=None, scopes=()):
+        try:
+            return self.objects[key]
+        except KeyError:
+            pass
+        value = load()
+        self.put(key, value, user_id, scopes)
+        return value
+
+    def put(self, key, value, user_id=None, scopes=()):
+        self.objects[key] = value
+        for scope in scopes:
+            self.scoped.setdefault((user_id, scope), set()).add(key)
+
+    def forget(self, user_id, scopes):
+        """Drop what was read from `scopes` for `user_id` (None: for every user)."""
+        for owner, scope in list(self.scoped):
+            if scope in scopes and (user_id is None or owner == user_id):
+                for key in self.scoped.pop((owner, scope)):
+                    self.objects.pop(key, None)
+
+
+def current():
+    """The identity map of the request being served, or None."""
+    return getattr(_local, "map", None)
+
+
+def remember(key, load, user_id=None, *scopes):
+    """load() once per request under `key`; a plain call outside one."""
+    identity_map = current()
+    if identity_map is None:
+        return load()
+    return identity_map.get(key, load, user_id, scopes)
+
+
+def register(key, value, user_id=None, *scopes):
+    """Hand the map an object obtained elsewhere (e.g. just created)."""
+    identity_map = current()
+    if identity_map is not None:
+        identity_map.put(key, value, user_id, scopes)
+
+
+def forget(user_id, *scopes):
+    identity_map = current()
+    if identity_map is not None:
+        identity_map.forget(user_id, scopes)
+
+
+class IdentityMapMiddleware:
+    """Opens a fresh identity map per request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.map = IdentityMap()
+        try:
+            return self.get_response(request)
+        finally:
+            _local.map = None
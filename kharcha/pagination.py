@@ -0,0 +1,190 @@
+from typing import Optional
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator that reuses a row count the view already computed
+    (e.g. from the summary aggregate), so no extra COUNT(*) is run.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def count(self):
+        return self._known_count
+
+
+# -------------------------------------------------
+# Keyset (cursor) pagination
+# -------------------------------------------------
+
+KEYSET_SALT = "kharcha.pagination.keyset"
+
+
+def load_keyset_token(token) -> Optional[dict]:
+    """Decode a next/prev token; None when missing, tampered or malformed."""
+    if not token:
+        return None
+    try:
+        state = signing.loads(token, salt=KEYSET_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(state, dict) or not {"o", "k", "d", "q"} <= state.keys():
+        return None
+    return state
+
+
+def keyset_params(request):
+    """
+    The filter parameters for a list view.
+
+    Cursor links only carry ?cursor=<token>; the token holds the filter
+    querystring it was built from, so restore that. Otherwise use request.GET.
+    """
+    state = load_keyset_token(request.GET.get("cursor"))
+    if state is not None:
+        return QueryDict(state["q"]), state
+    return request.GET, None
+
+
+class KeysetPage:
+    """Page-like object so templates can iterate rows as with Paginator pages."""
+
+    def __init__(self, object_list, has_next, has_previous, next_token, previous_token):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+
+class KeysetPaginator:
+    """
+    Seek pagination over a fixed ordering such as ("-date", "-created_at", "id").
+
+    Pages are fetched with WHERE (key) < (last key seen) instead of OFFSET and
+    no COUNT(*) is run, so every page costs the same however far back the user
+    scrolls. The last field must be unique (normally "id"). Fields listed in
+    `nullable` sort their NULLs last; leave out fields the filter already
+    keeps non-NULL, so the plain ORDER BY still matches their index.
+    """
+
+    def __init__(self, queryset, ordering, per_page, querystring="", nullable=()):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.nullable = frozenset(nullable)
+        self.per_page = per_page
+        self.querystring = querystring
+
+    def _field(self, name):
+        return self.queryset.model._meta.get_field(name.lstrip("-"))
+
+    def _raw(self, name, obj):
+        field = self._field(name)
+        return None if field.value_from_object(obj) is None else field.value_to_string(obj)
+
+    def _order_by(self, backwards):
+        """ORDER BY for the given direction; NULLs stay at the end going forward."""
+        order = []
+        for name in self.ordering:
+            field = self._field(name)
+            descending = name.startswith("-") != backwards
+            if field.name not in self.nullable:
+                order.append(f"-{field.name}" if descending else field.name)
+                continue
+            nulls = {"nulls_first": True} if backwards else {"nulls_last": True}
+            order.append(F(field.name).desc(**nulls) if descending else F(field.name).asc(**nulls))
+        return order
+
+    def _token(self, obj, direction) -> str:
+        state = {
+            "m": self.queryset.model._meta.label_lower,
+            "o": list(self.ordering),
+            "k": [self._raw(name, obj) for name in self.ordering],
+            "d": direction,
+            "q": self.querystring,
+        }
+        return signing.dumps(state, salt=KEYSET_SALT, compress=True)
+
+    def _seek(self, raw_values, backwards) -> Q:
+        """Lexicographic "comes after this key" filter for the given direction."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for name, raw in zip(self.ordering, raw_values):
+            field = self._field(name)
+            value = None if raw is None else field.to_python(raw)
+            if value is None:
+                # NULLs come last: nothing sorts after one going forward,
+                # every non-NULL value precedes one going back
+                if backwards:
+                    condition |= equal & Q(**{f"{field.name}__isnull": False})
+                equal &= Q(**{f"{field.name}__isnull": True})
+                continue
+            descending = name.startswith("-") != backwards
+            lookup = "lt" if descending else "gt"
+            after = Q(**{f"{field.name}__{lookup}": value})
+            if field.name in self.nullable and not backwards:
+                after |= Q(**{f"{field.name}__isnull": True})
+            condition |= equal & after
+            equal &= Q(**{field.name: value})
+        return condition
+
+    def get_page(self, state: Optional[dict] = None) -> KeysetPage:
+        if state is not None and (
+            state.get("m") != self.queryset.model._meta.label_lower
+            or state["o"] != list(self.ordering)
+        ):
+            state = None  # token from a different list; start over
+
+        backwards = state is not None and state["d"] == "prev"
+        qs = self.queryset.order_by(*self._order_by(backwards))
+        if state is not None:
+            try:
+                qs = qs.filter(self._seek(state["k"], backwards))
+            except ValidationError:
+                return self.get_page(None)
+
+        rows = list(qs[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        if backwards and not rows:
+            return self.get_page(None)
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, state is not None
+
+        return KeysetPage(
+            rows,
+            has_next=bool(rows) and has_next,
+            has_previous=bool(rows) and has_previous,
+            next_token=self._token(rows[-1], "next") if rows and has_next else None,
+            previous_token=self._token(rows[0], "prev") if rows and has_previous else None,
+        )
@@ -15,6 +15,8 @@ from dotenv import load_dotenv
 import dj_database_url
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
@@ -73,6 +75,7 @@ INSTALLED_APPS = [
     "people.apps.PeopleConfig",
     'expenses.apps.ExpensesConfig',
     "income.apps.IncomeConfig",
+    "search.apps.SearchConfig",
     "crispy_forms",
     "crispy_bootstrap5",
     'anymail',
@@ -98,6 +101,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     "allauth.account.middleware.AccountMiddleware",
+    'kharcha.identity.IdentityMapMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -135,6 +139,57 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND: "db" (default: a table in the main database, shared by every
+# worker; build.sh runs createcachetable), "file" (CACHE_LOCATION directory,
+# shared by the workers on one machine) or "locmem" (per worker process).
+# kharcha.cache keys everything by per-user data versions kept in the
+# database (accounts.DataVersion), so any of them stays consistent across
+# workers; locmem just holds a copy per worker.
+
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "kharcha"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", str(BASE_DIR / ".cache")),
+    "db": ("django.core.cache.backends.db.DatabaseCache", "kharcha_cache"),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[os.environ.get("CACHE_BACKEND", "db")]
+
+CACHES = {
+    "default": {
+        "BACKEND": _cache_backend,
+        "LOCATION": os.environ.get("CACHE_LOCATION", _cache_location),
+        "TIMEOUT": 60 * 60,
+        "KEY_PREFIX": "kharcha",
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    }
+}
+
+# Sessions
+# SESSION_BACKEND: "cached_db" (reads served from the cache above, rows kept
+# for durability), "signed_cookies" (no server-side rows at all) or "db".
+# cached_db needs a cache every worker shares, so with locmem the default is
+# signed cookies: another worker's cache could still hold a logged-out session.
+# Expired rows are purged in batches by `manage.py purge_sessions` (and the
+# guest cleanup endpoint).
+
+SESSION_BACKENDS = {
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+    "db": "django.contrib.sessions.backends.db",
+}
+SESSION_ENGINE = SESSION_BACKENDS[os.environ.get(
+    "SESSION_BACKEND", "signed_cookies" if _cache_backend.endswith("LocMemCache") else "cached_db",
+)]
+if (
+    SESSION_ENGINE.endswith("cached_db") and _cache_backend.endswith("LocMemCache")
+    and int(os.environ.get("WEB_CONCURRENCY") or 1) > 1
+):
+    raise ImproperlyConfigured(
+        "cached_db sessions on the per-process locmem cache; use CACHE_BACKEND=db or file with WEB_CONCURRENCY > 1."
+    )
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -27,4 +27,5 @@ urlpatterns = [
     path("accounts/", include("allauth.urls")),
     path("", include("people.urls")), 
     path("", include("income.urls")),
+    path("", include("search.urls")),
 ]
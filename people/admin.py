@@ -1,17 +1,30 @@
 from django.contrib import admin
+
+from kharcha.admin import LargeTableAdmin, PersonFilter, UserFilter
 from .models import Person, PersonLedgerEntry
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
-    list_display = ("name", "user", "balance", "auto_suggest_enabled", "created_at")
-    list_filter = ("user", "auto_suggest_enabled")
+class PersonAdmin(LargeTableAdmin):
+    list_display = ("name", "user", "balance", "active_entry_count", "last_activity_at", "tracking_preference", "auto_suggest_enabled", "created_at")
+    list_filter = (UserFilter, "tracking_preference", "archived", "auto_suggest_enabled")
+    list_select_related = ("user",)
     search_fields = ("name", "user__username")
+    autocomplete_fields = ("user",)
+    readonly_fields = Person.SUMMARY_FIELDS
+
+    @admin.display(description="balance", ordering="cached_balance")
+    def balance(self, obj):
+        # Denormalized active balance (people.balances), not an aggregate per row
+        return obj.cached_balance
 
 
 @admin.register(PersonLedgerEntry)
-class PersonLedgerEntryAdmin(admin.ModelAdmin):
-    list_display = ("person", "user", "amount", "source_type", "created_at")
-    list_filter = ("source_type", "user")
+class PersonLedgerEntryAdmin(LargeTableAdmin):
+    list_display = ("person", "user", "amount", "source_type", "archived", "created_at")
+    list_filter = ("source_type", "archived", UserFilter, PersonFilter)
+    # Person.__str__ shows the username too
+    list_select_related = ("person__user", "user")
     search_fields = ("person__name", "note")
+    autocomplete_fields = ("user", "person", "expense", "income")
 
@@ -0,0 +1,67 @@
+import heapq
+import uuid
+from bisect import bisect_left
+
+from django.db.models import F
+
+from expenses.models import name_key
+from kharcha.cache import LEDGER, PEOPLE, cached_value
+from .models import Person
+
+
+CACHE_TIMEOUT = 60 * 60
+
+SUGGESTION_LIMIT = 10
+
+
+def _build(user_id) -> dict:
+    """
+    One query: names in rank order (latest ledger activity first), plus a
+    sorted array of (word key, rank) so "ra" finds "Ravi" and "ku" finds
+    "Ravi Kumar". `version` changes with every build and feeds the ETag.
+    """
+    names, entries = [], []
+    people = (
+        Person.objects.filter(user_id=user_id)
+        .order_by(F("last_activity_at").desc(nulls_last=True), "name_key")
+        .values_list("name", "name_key")
+    )
+    for rank, (name, key) in enumerate(people):
+        names.append(name)
+        words = key.split(" ")
+        for start in range(len(words)):
+            entries.append((" ".join(words[start:]), rank))
+    entries.sort()
+    return {
+        "version": uuid.uuid4().hex[:12],
+        "names": names,
+        "keys": [key for key, _ in entries],
+        "ranks": [rank for _, rank in entries],
+    }
+
+
+def person_index(user) -> dict:
+    """
+    The user's name index, built on the first lookup and cached until their
+    people (names) or ledger (ranking) change.
+    """
+    user_id = getattr(user, "pk", user)
+    return cached_value("people:autocomplete", user_id, (PEOPLE, LEDGER), lambda: _build(user_id), timeout=CACHE_TIMEOUT)
+
+
+def suggest_people(index: dict, query: str, limit: int = SUGGESTION_LIMIT) -> list:
+    """
+    Names with a word starting with `query` (as name_key folds it), most
+    recently active first. A binary search finds the matching run of the
+    sorted keys; no database access.
+    """
+    prefix = name_key(query)
+    if not prefix:
+        return []
+    keys, ranks = index["keys"], index["ranks"]
+    ranks_found = set()
+    position = bisect_left(keys, prefix)
+    while position < len(keys) and keys[position].startswith(prefix):
+        ranks_found.add(ranks[position])
+        position += 1
+    return [index["names"][rank] for rank in heapq.nsmallest(limit, ranks_found)]
@@ -0,0 +1,200 @@
+import calendar
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+
+from .models import Person, PersonBalanceSnapshot, PersonLedgerEntry
+
+
+ZERO = Decimal("0.00")
+
+SUMMARY_FIELDS = Person.SUMMARY_FIELDS
+
+
+# -------------------------------------------------
+# Incremental updates (one ledger row at a time)
+# -------------------------------------------------
+
+def _active_entries():
+    return PersonLedgerEntry.objects.filter(person=OuterRef("pk"), archived=False).order_by().values("person")
+
+
+def _last_activity():
+    return Subquery(_active_entries().annotate(at=Max("created_at")).values("at"))
+
+
+def entry_added(entry: PersonLedgerEntry):
+    """A new active row: one UPDATE, relative to whatever is stored."""
+    if entry.archived:
+        return
+    Person.objects.filter(pk=entry.person_id).update(
+        cached_balance=F("cached_balance") + entry.amount,
+        active_entry_count=F("active_entry_count") + 1,
+        last_activity_at=Greatest(Coalesce("last_activity_at", Value(entry.created_at)), Value(entry.created_at)),
+    )
+
+
+def entry_removed(entry: PersonLedgerEntry):
+    """Call after the row is gone, so the latest remaining row is picked up."""
+    if entry.archived:
+        return
+    Person.objects.filter(pk=entry.person_id).update(
+        cached_balance=F("cached_balance") - entry.amount,
+        active_entry_count=F("active_entry_count") - 1,
+        last_activity_at=_last_activity(),
+    )
+
+
+# -------------------------------------------------
+# Recomputing from the ledger
+# -------------------------------------------------
+
+def refresh_person_summaries(person_ids) -> int:
+    """
+    Recompute the summary fields from the ledger, in one UPDATE, and drop
+    the people's balance snapshots. For writes that skip the signals:
+    queryset update(archived=...), bulk_create, edits of existing rows.
+    """
+    person_ids = {pk for pk in person_ids if pk}
+    if not person_ids:
+        return 0
+    PersonBalanceSnapshot.objects.filter(person_id__in=person_ids).delete()
+    return Person.objects.filter(pk__in=person_ids).update(**_expected())
+
+
+def _expected() -> dict:
+    active = _active_entries()
+    return {
+        "cached_balance": Coalesce(
+            Subquery(active.annotate(total=Sum("amount")).values("total")),
+            Value(ZERO),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        "active_entry_count": Coalesce(Subquery(active.annotate(n=Count("id")).values("n")), Value(0)),
+        "last_activity_at": _last_activity(),
+    }
+
+
+def ledger_totals(person_ids) -> dict:
+    """{person id: sum of all their rows, archived included}, in one grouped query."""
+    rows = (
+        PersonLedgerEntry.objects.filter(person_id__in=set(person_ids))
+        .values("person_id").annotate(total=Sum("amount")).order_by()
+    )
+    return {row["person_id"]: row["total"] for row in rows}
+
+
+def summary_drift(user_id=None):
+    """
+    People whose stored summary disagrees with their ledger, as
+    (person, {field: (stored, expected)}).
+    """
+    people = Person.objects.order_by("pk")
+    if user_id is not None:
+        people = people.filter(user_id=user_id)
+    expected = {f"expected_{name}": value for name, value in _expected().items()}
+    for person in people.annotate(**expected).iterator(chunk_size=2000):
+        diff = {}
+        for name in SUMMARY_FIELDS:
+            stored, wanted = getattr(person, name), getattr(person, f"expected_{name}")
+            if stored != wanted:
+                diff[name] = (stored, wanted)
+        if diff:
+            yield person, diff
+
+
+# -------------------------------------------------
+# As-of balances (monthly snapshots + tail scan)
+# -------------------------------------------------
+
+def _month_end(day: date) -> date:
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def invalidate_snapshots(person_id, since: date = None):
+    """Drop the snapshots a ledger change on `since` (or anywhere) makes stale."""
+    snapshots = PersonBalanceSnapshot.objects.filter(person_id=person_id)
+    if since is not None:
+        snapshots = snapshots.filter(as_of__gte=since)
+    snapshots.delete()
+
+
+def _latest_snapshot(person: Person, day: date):
+    return PersonBalanceSnapshot.objects.filter(person=person, as_of__lte=day).order_by("-as_of").first()
+
+
+def _build_snapshots(person: Person, after, before: date) -> list:
+    """
+    Snapshot every month with activity between the `after` snapshot and
+    the month of `before` (exclusive), from one grouped scan of those rows.
+    Snapshots always form an unbroken prefix: invalidation drops a suffix.
+    """
+    rows = PersonLedgerEntry.objects.filter(
+        person=person, archived=False, effective_date__lt=before.replace(day=1),
+    )
+    balance, count = ZERO, 0
+    if after is not None:
+        rows = rows.filter(effective_date__gt=after.as_of)
+        balance, count = after.balance, after.entry_count
+
+    snapshots = []
+    for row in (
+        rows.annotate(month=TruncMonth("effective_date"))
+        .values("month")
+        .annotate(total=Sum("amount"), n=Count("id"))
+        .order_by("month")
+    ):
+        balance += row["total"]
+        count += row["n"]
+        snapshots.append(PersonBalanceSnapshot(
+            user_id=person.user_id, person=person, as_of=_month_end(row["month"]),
+            balance=balance, entry_count=count,
+        ))
+    return PersonBalanceSnapshot.objects.bulk_create(snapshots, ignore_conflicts=True)
+
+
+def balance_as_of(person: Person, day: date) -> Decimal:
+    """
+    Active balance with `person` at the end of `day` (by effective date):
+    the latest month-end snapshot before it plus the rows after that,
+    so at most about a month of rows is read.
+    """
+    snapshot = _latest_snapshot(person, day)
+    if snapshot is None or snapshot.as_of < day.replace(day=1) - timedelta(days=1):
+        built = _build_snapshots(person, snapshot, day)
+        if built:
+            snapshot = built[-1]
+
+    tail = PersonLedgerEntry.objects.filter(person=person, archived=False, effective_date__lte=day)
+    balance = ZERO
+    if snapshot is not None:
+        tail = tail.filter(effective_date__gt=snapshot.as_of)
+        balance = snapshot.balance
+    return balance + (tail.aggregate(total=Sum("amount"))["total"] or ZERO)
+
+
+def balance_timeline(person: Person, start: date, end: date) -> tuple:
+    """
+    (opening balance, [(day, change, running balance)]) for the days in
+    start..end that have activity; for balance-over-time charts.
+    """
+    opening = balance_as_of(person, start - timedelta(days=1))
+    points, running = [], opening
+    for row in (
+        PersonLedgerEntry.objects
+        .filter(person=person, archived=False, effective_date__range=(start, end))
+        .values("effective_date")
+        .annotate(change=Sum("amount"))
+        .order_by("effective_date")
+    ):
+        running += row["change"]
+        points.append((row["effective_date"], row["change"], running))
+    return opening, points
+
+
+def current_balance(person: Person) -> Decimal:
+    """Stored active balance, read fresh (the instance may predate recent ledger writes)."""
+    balance = Person.objects.filter(pk=person.pk).values_list("cached_balance", flat=True).first()
+    return balance if balance is not None else ZERO
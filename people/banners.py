@@ -0,0 +1,30 @@
+"""
+The pending ASK banner.
+
+After an expense / income names a person whose tracking preference is
+ASK, base.html asks whether to track them. The session only holds what
+the question needs (ids, the name, the amount and where to return to);
+the template builds the text and the action links, so the entry stays a
+few hundred bytes (small enough for signed-cookie sessions).
+"""
+SESSION_KEY = "pending_banner"  # base.html reads request.session.pending_banner
+
+EXPENSE = "expense"
+INCOME = "income"
+
+
+def set_ask_banner(request, kind, person, source, next_url):
+    """Ask about `person` for `source` (an expense or income, per `kind`) on the next pages."""
+    request.session[SESSION_KEY] = {
+        "kind": kind,
+        "person": person.pk,
+        "name": person.name,
+        "source": source.pk,
+        "amount": str(source.amount),
+        "next": next_url,
+    }
+
+
+def clear_banner(request):
+    # pop() only marks the session modified when the banner was there
+    request.session.pop(SESSION_KEY, None)
@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from expenses.models import Expense
+from expenses.utils import current_values, stored_values
+from income.models import Income
+from kharcha import identity
+from kharcha.cache import COUNTERPARTIES, bump
+from .models import Counterparty
+
+
+# (role, model field holding the name). Expense.save() blanks the name
+# when the matching flag is off, so a non-empty name means the role applies.
+EXPENSE_ROLES = (
+    (Counterparty.LENDER, "borrowed_from"),
+    (Counterparty.PAID_FOR, "paid_for"),
+)
+INCOME_ROLES = (
+    (Counterparty.INCOME_PERSON, "person"),
+)
+
+
+def _bump(user_id, role, name, delta):
+    rows = Counterparty.objects.filter(user_id=user_id, role=role, name=name)
+    if delta > 0:
+        if rows.update(usage_count=F("usage_count") + delta):
+            return
+        try:
+            with transaction.atomic():
+                Counterparty.objects.create(user_id=user_id, role=role, name=name, usage_count=delta)
+        except IntegrityError:
+            # Created concurrently; fall back to the increment
+            rows.update(usage_count=F("usage_count") + delta)
+    else:
+        rows.update(usage_count=F("usage_count") + delta)
+        rows.filter(usage_count__lte=0).delete()
+
+
+def _sync(instance, roles, created, deleted):
+    fields = [field for _, field in roles]
+    old = None if created else stored_values(instance, fields)
+    new = None if deleted else current_values(instance, fields)
+
+    if deleted and old is None:
+        old = current_values(instance, fields)
+    if not created and not deleted and old is None:
+        rebuild_counterparties(instance.user_id)
+        return
+
+    changed = False
+    for role, field in roles:
+        before = (old or {}).get(field) or ""
+        after = (new or {}).get(field) or ""
+        if before == after:
+            continue
+        if before:
+            _bump(instance.user_id, role, before, -1)
+        if after:
+            _bump(instance.user_id, role, after, 1)
+        changed = True
+
+    if changed:
+        bump(instance.user_id, COUNTERPARTIES)
+
+
+def sync_expense_counterparties(instance: Expense, created=False, deleted=False):
+    _sync(instance, EXPENSE_ROLES, created, deleted)
+
+
+def sync_income_counterparties(instance: Income, created=False, deleted=False):
+    _sync(instance, INCOME_ROLES, created, deleted)
+
+
+def counterparty_names(user, role) -> list:
+    """Sorted names for one dropdown; one query per request for all roles."""
+    user_id = getattr(user, "pk", user)
+
+    def build():
+        directory = defaultdict(list)
+        for row_role, name in (
+            Counterparty.objects
+            .filter(user_id=user_id)
+            .order_by("name")
+            .values_list("role", "name")
+        ):
+            directory[row_role].append(name)
+        return dict(directory)
+
+    directory = identity.remember(("counterparties", user_id), build, user_id, COUNTERPARTIES)
+    return directory.get(role, [])
+
+
+def rebuild_counterparties(user_id=None) -> int:
+    """Recompute the directory from raw expense / income rows."""
+    expenses = Expense.objects.all()
+    incomes = Income.objects.all()
+    existing = Counterparty.objects.all()
+    if user_id is not None:
+        expenses = expenses.filter(user_id=user_id)
+        incomes = incomes.filter(user_id=user_id)
+        existing = existing.filter(user_id=user_id)
+
+    sources = [(expenses, role, field) for role, field in EXPENSE_ROLES]
+    sources += [(incomes, role, field) for role, field in INCOME_ROLES]
+
+    rows = []
+    for qs, role, field in sources:
+        for entry in (
+            qs.exclude(**{field: ""})
+            .values("user_id", field)
+            .annotate(n=Count("id"))
+            .order_by()
+        ):
+            rows.append(Counterparty(
+                user_id=entry["user_id"], role=role, name=entry[field], usage_count=entry["n"],
+            ))
+
+    with transaction.atomic():
+        user_ids = set(existing.values_list("user_id", flat=True)) | {r.user_id for r in rows}
+        existing.delete()
+        Counterparty.objects.bulk_create(rows, batch_size=1000)
+
+    for uid in user_ids:
+        bump(uid, COUNTERPARTIES)
+    return len(rows)
@@ -3,6 +3,7 @@ from decimal import Decimal
 from django import forms
 
 from .models import Person
+from expenses.models import name_key, normalize_name
 
 class PersonForm(forms.ModelForm):
     class Meta:
@@ -19,12 +20,16 @@ class PersonForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
     def clean_name(self):
-        name = self.cleaned_data["name"].strip()
-        normalized = name.title()  # same as Person.save
+        normalized = normalize_name(self.cleaned_data["name"])  # same as Person.save
 
-        if self.user:
-            
-            if Person.objects.filter(user=self.user, name__iexact=normalized).exists():
+        # Unchanged (up to case / spacing): nothing new to clash with, even
+        # for a duplicate migrated with an id-suffixed key
+        unchanged = self.instance.pk and name_key(normalized) == name_key(self.instance.name)
+        if self.user and not unchanged:
+            others = Person.objects.filter(user=self.user, name_key=name_key(normalized))
+            if self.instance.pk:
+                others = others.exclude(pk=self.instance.pk)
+            if others.exists():
                 raise forms.ValidationError(
                     "You already have someone with this name."
                 )
@@ -0,0 +1,95 @@
+"""
+Deferred ledger work.
+
+Expense / income saves queue their source here instead of rewriting its
+ledger rows on the spot; the queue is flushed once, on commit, through
+LedgerBatch. Inside one transaction (edits, imports, bulk
+recategorization) repeated saves of the same source collapse into one
+entry, and the rows of all queued sources are read and written in a few
+set-based queries per user, so the work grows with the number of people
+touched rather than the number of saves.
+
+Outside a transaction (autocommit) on_commit runs straight away, so a
+single save behaves as before: its rows are in place when save() returns.
+"""
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .utils import LedgerBatch
+from expenses.models import Expense
+from income.models import Income
+
+
+_local = threading.local()
+
+
+class PendingLedger:
+    """The sources queued in one transaction: {(model, pk): force_apply}, in save order."""
+
+    def __init__(self, using):
+        self.using = using
+        self.sources = {}
+        self.scheduled = False
+
+    def add(self, model, pk, force_apply):
+        key = (model, pk)
+        # Explicit consent on any of the saves sticks
+        self.sources[key] = self.sources.get(key, False) or force_apply
+        if not self.scheduled:
+            self.scheduled = True
+            transaction.on_commit(self.flush, using=self.using)
+
+    def is_current(self) -> bool:
+        """False once the transaction that scheduled us rolled back (its hooks are dropped)."""
+        if not self.scheduled:
+            return True
+        hooks = transaction.get_connection(self.using).run_on_commit
+        return any(func == self.flush for _, func, *_ in hooks)
+
+    def flush(self):
+        queued, self.sources, self.scheduled = self.sources, {}, False
+
+        # Reload: the latest committed state of every source, in two
+        # queries. Sources deleted since (or rolled back in a savepoint)
+        # simply drop out.
+        loaded = {}
+        for model, related in ((Expense, ("user", "category")), (Income, ("user",))):
+            ids = [pk for (kind, pk) in queued if kind is model]
+            if ids:
+                for source in model.objects.using(self.using).select_related(*related).filter(pk__in=ids):
+                    loaded[(model, source.pk)] = source
+
+        by_user = {}
+        for key, force_apply in queued.items():
+            source = loaded.get(key)
+            if source is not None:
+                by_user.setdefault(source.user_id, []).append((source, force_apply))
+
+        with transaction.atomic(using=self.using):
+            for sources in by_user.values():
+                # Only the people these sources name, reusing the request's lookups
+                batch = LedgerBatch(sources[0][0].user, [source for source, _ in sources])
+                # Incomes create their (ASK) person, like the explicit views do,
+                # and pick up the FK (saved before that person existed)
+                unlinked = [
+                    source for source, _ in sources
+                    if isinstance(source, Income) and source.linked_person_id is None
+                ]
+                batch.add_people(source.person for source in unlinked)
+                batch.link(unlinked)
+                batch.sync(sources)
+                batch.write()
+
+
+def _pending(using) -> PendingLedger:
+    pending = getattr(_local, using, None)
+    if pending is None or not pending.is_current():
+        pending = PendingLedger(using)
+        setattr(_local, using, pending)
+    return pending
+
+
+def queue_ledger_sync(source, force_apply=False, using=DEFAULT_DB_ALIAS):
+    """Bring an expense's / income's ledger rows in line when the current transaction commits."""
+    _pending(using).add(source._meta.concrete_model, source.pk, force_apply)
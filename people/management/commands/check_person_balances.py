@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from people.balances import refresh_person_summaries, summary_drift
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare each person\'s cached balance / active entry count / last activity '
+        'with their ledger and fail on drift (--fix recomputes the drifted people)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only check people of this username')
+        parser.add_argument('--fix', action='store_true', help='Recompute drifted summaries from the ledger')
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"No user named '{options['user']}'")
+            user_id = user.pk
+
+        drifted = []
+        for person, diff in summary_drift(user_id):
+            drifted.append(person.pk)
+            details = ', '.join(f'{name}: {stored} != {expected}' for name, (stored, expected) in diff.items())
+            self.stdout.write(self.style.WARNING(f'#{person.pk} {person.name} (user {person.user_id}): {details}'))
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All person summaries match the ledger.'))
+            return
+
+        if options['fix']:
+            refresh_person_summaries(drifted)
+            self.stdout.write(self.style.SUCCESS(f'Recomputed {len(drifted)} people.'))
+        else:
+            raise CommandError(f'{len(drifted)} people have drifted; rerun with --fix to recompute them.')
@@ -0,0 +1,90 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from people.reconcile import has_drift, reconcile_user
+
+User = get_user_model()
+
+REPORT_FIELDS = ("user_id", "username", "stored", "inserted", "updated", "deleted")
+
+
+def _init_worker():
+    # Forked workers must not share the parent's database connections
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every user\'s person ledger from their expenses / incomes, diff it '
+        'against the stored rows and report the differences; --fix writes the corrections. '
+        'Users are spread over a process pool (--workers); SQLite fixes run in one process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only this username')
+        parser.add_argument('--fix', action='store_true', help='Write the corrections (default: report only)')
+        parser.add_argument(
+            '--add-missing', action='store_true',
+            help='Also give sources without ledger rows what the current rules would (default: only existing rows are corrected)',
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+        parser.add_argument('--report', help='Also write the per-user reconciliation report to this CSV file')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"No user named '{options['user']}'")
+        user_ids = list(users.values_list('pk', flat=True))
+
+        workers = max(1, options['workers'])
+        if options['fix'] and connection.vendor == 'sqlite':
+            workers = 1  # one writer at a time
+
+        reports = []
+        for report in self._run(user_ids, options['fix'], options['add_missing'], workers):
+            reports.append(report)
+            if has_drift(report):
+                self.stdout.write(self.style.WARNING(
+                    f"{report['username']} (#{report['user_id']}): stored {report['stored']}, "
+                    f"+{report['inserted']} ~{report['updated']} -{report['deleted']}"
+                ))
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as handle:
+                writer = csv.DictWriter(handle, fieldnames=REPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(reports)
+
+        drifted = [report for report in reports if has_drift(report)]
+        totals = {key: sum(report[key] for report in reports) for key in ('stored', 'inserted', 'updated', 'deleted')}
+        summary = (
+            f"{len(reports)} users, {totals['stored']} stored rows: "
+            f"+{totals['inserted']} ~{totals['updated']} -{totals['deleted']} in {len(drifted)} users"
+        )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'Ledger matches its sources ({summary}).'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt: {summary}.'))
+        else:
+            raise CommandError(f'Ledger differs from its sources ({summary}); rerun with --fix to rebuild it.')
+
+    def _run(self, user_ids, fix, add_missing, workers):
+        work = partial(reconcile_user, fix=fix, add_missing=add_missing)
+        if workers == 1 or len(user_ids) < 2:
+            yield from map(work, user_ids)
+            return
+
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            yield from pool.map(work, user_ids, chunksize=16)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0013_expense_user_date_idx'),
+        ('income', '0007_income_user_date_idx'),
+        ('people', '0006_person_archived_personledgerentry_archived_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='personledgerentry',
+            index=models.Index(condition=models.Q(('archived', False)), fields=['person', '-created_at'], name='ledger_person_active_idx'),
+        ),
+    ]
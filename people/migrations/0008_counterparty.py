@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counterparties(apps, schema_editor):
+    Expense = apps.get_model("expenses", "Expense")
+    Income = apps.get_model("income", "Income")
+    Counterparty = apps.get_model("people", "Counterparty")
+
+    sources = [
+        (Expense, "lender", "borrowed_from"),
+        (Expense, "paid_for", "paid_for"),
+        (Income, "income_person", "person"),
+    ]
+    rows = []
+    for model, role, field in sources:
+        for entry in (
+            model.objects
+            .exclude(**{field: ""})
+            .values("user_id", field)
+            .annotate(n=Count("id"))
+            .order_by()
+        ):
+            rows.append(Counterparty(
+                user_id=entry["user_id"], role=role, name=entry[field], usage_count=entry["n"],
+            ))
+    Counterparty.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0013_expense_user_date_idx'),
+        ('income', '0007_income_user_date_idx'),
+        ('people', '0007_ledger_person_active_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counterparty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('lender', 'Lender (borrowed from)'), ('paid_for', 'Paid for'), ('income_person', 'Income person')], max_length=16)),
+                ('name', models.CharField(max_length=100)),
+                ('usage_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counterparties', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+                'unique_together': {('user', 'role', 'name')},
+            },
+        ),
+        migrations.RunPython(backfill_counterparties, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:50
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_summaries(apps, schema_editor):
+    Person = apps.get_model("people", "Person")
+    PersonLedgerEntry = apps.get_model("people", "PersonLedgerEntry")
+
+    active = PersonLedgerEntry.objects.filter(person=OuterRef("pk"), archived=False).order_by().values("person")
+    Person.objects.update(
+        cached_balance=Coalesce(
+            Subquery(active.annotate(total=Sum("amount")).values("total")),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        active_entry_count=Coalesce(Subquery(active.annotate(n=Count("id")).values("n")), Value(0)),
+        last_activity_at=Subquery(active.annotate(at=Max("created_at")).values("at")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0008_counterparty'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='active_entry_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='cached_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(condition=models.Q(('active_entry_count__gt', 0), ('archived', False), ('tracking_preference', 'TRACK')), fields=['user', '-last_activity_at', 'name'], name='person_active_list_idx'),
+        ),
+    ]
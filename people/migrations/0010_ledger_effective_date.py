@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_effective_dates(apps, schema_editor):
+    PersonLedgerEntry = apps.get_model("people", "PersonLedgerEntry")
+    Expense = apps.get_model("expenses", "Expense")
+    Income = apps.get_model("income", "Income")
+
+    PersonLedgerEntry.objects.filter(effective_date__isnull=True).update(
+        effective_date=Coalesce(
+            Subquery(Expense.objects.filter(pk=OuterRef("expense_id")).values("date")[:1]),
+            Subquery(Income.objects.filter(pk=OuterRef("income_id")).values("date")[:1]),
+            TruncDate("created_at"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0013_expense_user_date_idx'),
+        ('income', '0007_income_user_date_idx'),
+        ('people', '0009_person_balance_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('entry_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-as_of'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='personledgerentry',
+            options={'ordering': ['-effective_date', '-created_at']},
+        ),
+        migrations.AddField(
+            model_name='personledgerentry',
+            name='effective_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(backfill_effective_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='personledgerentry',
+            name='effective_date',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='personledgerentry',
+            index=models.Index(condition=models.Q(('archived', False)), fields=['person', '-effective_date', '-created_at'], name='ledger_person_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='personbalancesnapshot',
+            name='person',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='people.person'),
+        ),
+        migrations.AddField(
+            model_name='personbalancesnapshot',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='person_balance_snapshots', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='personbalancesnapshot',
+            unique_together={('person', 'as_of')},
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-17 06:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _key(name):
+    # Frozen copy of expenses.models.name_key
+    return " ".join((name or "").split()).casefold()
+
+
+def backfill_name_keys(apps, schema_editor):
+    Person = apps.get_model("people", "Person")
+
+    people, seen = [], set()
+    for person in Person.objects.order_by("user_id", "pk").only("pk", "user_id", "name").iterator(chunk_size=2000):
+        key = _key(person.name)
+        if (person.user_id, key) in seen:
+            # Spelled-differently duplicates of an older person ("Ravi" /
+            # "RAVI"): lookups resolve to the oldest, the others keep
+            # an id-suffixed key and stay reachable by id
+            key = f"{key[:80]}#{person.pk}"
+        seen.add((person.user_id, key))
+        person.name_key = key
+        people.append(person)
+        if len(people) >= 2000:
+            Person.objects.bulk_update(people, ["name_key"])
+            people = []
+    Person.objects.bulk_update(people, ["name_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0010_ledger_effective_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_name_keys, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='person',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='person',
+            constraint=models.UniqueConstraint(fields=('user', 'name_key'), name='person_user_name_key_uniq'),
+        ),
+    ]
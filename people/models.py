@@ -3,6 +3,9 @@ from decimal import Decimal
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from expenses.models import LoadedValuesMixin, name_key, normalize_name
 
 
 class Person(models.Model):
@@ -20,6 +23,9 @@ class Person(models.Model):
 
     
     name = models.CharField(max_length=100)
+    # name_key(name): what every by-name lookup matches on, so finding a
+    # person is a point lookup on the (user, name_key) unique index
+    name_key = models.CharField(max_length=100, editable=False)
 
     # Tracking constants (use these everywhere in code)
     TRACK = "TRACK"
@@ -46,20 +52,55 @@ class Person(models.Model):
     )
     archived = models.BooleanField(default=False, help_text="If true, hide this person from main People list (untracked/archived).")
 
+    # Summary of the ACTIVE (non-archived) ledger rows, kept current by
+    # people.balances; `check_person_balances` verifies / repairs them
+    cached_balance = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    active_entry_count = models.IntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    SUMMARY_FIELDS = ("cached_balance", "active_entry_count", "last_activity_at")
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ("user", "name")
         ordering = ["name"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "name_key"], name="person_user_name_key_uniq"),
+        ]
+        indexes = [
+            # Default People list: tracked people with an open ledger, latest first
+            models.Index(
+                fields=["user", "-last_activity_at", "name"],
+                condition=models.Q(tracking_preference="TRACK", archived=False, active_entry_count__gt=0),
+                name="person_active_list_idx",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.name:
-            
-            self.name = self.name.strip().title()
+        self.normalize()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_key"}
+        if self.pk and not self._state.adding and not args and kwargs.get("update_fields") is None:
+            # The summary fields are written by people.balances only; a full
+            # save from a stale instance must not overwrite them
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.SUMMARY_FIELDS
+            ]
         super().save(*args, **kwargs)
 
+    def normalize(self):
+        # save() runs this; bulk_create() skips save(), so bulk paths call it directly
+        self.name = normalize_name(self.name)
+        key = name_key(self.name)
+        # Duplicates migrated as "<key>#<pk>" (people 0011) keep that key
+        # while the name still folds to it
+        if self.pk and self.name_key == f"{key[:80]}#{self.pk}":
+            key = self.name_key
+        self.name_key = key
+
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
@@ -76,6 +117,14 @@ class Person(models.Model):
         agg = self.ledger_entries.aggregate(total=models.Sum("amount"))
         return agg["total"] or Decimal("0.00")
 
+    @property
+    def list_balance(self) -> Decimal:
+        """People list: archived people show what was owed when they were archived."""
+        if not self.archived:
+            return self.cached_balance
+        total = getattr(self, "ledger_total", None)  # set by people_list
+        return self.balance if total is None else total
+
     @property
     def balance_label(self) -> str:
         amt = self.balance
@@ -87,7 +136,7 @@ class Person(models.Model):
             return "Settled"
 
 
-class PersonLedgerEntry(models.Model):
+class PersonLedgerEntry(LoadedValuesMixin, models.Model):
     """
     A single change in balance with a person.
 
@@ -139,11 +188,106 @@ class PersonLedgerEntry(models.Model):
     archived = models.BooleanField(default=False, help_text="If true, this ledger row is archived and not counted in active balances.")
 
     note = models.CharField(max_length=255, blank=True)
+    # When the money actually moved: the expense / income date, or the day
+    # a manual row was entered. Statements and as-of balances go by this.
+    effective_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-effective_date", "-created_at"]
+        indexes = [
+            # Statement pages and balances only ever read active rows
+            models.Index(
+                fields=["person", "-created_at"],
+                condition=models.Q(archived=False),
+                name="ledger_person_active_idx",
+            ),
+            # Statement order + as-of tail scans (effective_date ranges)
+            models.Index(
+                fields=["person", "-effective_date", "-created_at"],
+                condition=models.Q(archived=False),
+                name="ledger_person_date_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.effective_date is None:
+            self.effective_date = self.default_effective_date()
+        super().save(*args, **kwargs)
+
+    def default_effective_date(self):
+        if self.expense_id:
+            return self.expense.date
+        if self.income_id:
+            return self.income.date
+        return timezone.localdate()
 
     def __str__(self):
         sign = "+" if self.amount >= 0 else "-"
         return f"{self.person.name}: {sign}{abs(self.amount)} ({self.source_type})"
+
+
+class PersonBalanceSnapshot(models.Model):
+    """
+    A person's active balance at the end of a month (effective dates up
+    to and including `as_of`). An as-of balance is then the latest
+    snapshot plus the rows after it, instead of the whole ledger.
+
+    Built lazily by people.balances; ledger changes delete the snapshots
+    they invalidate (as_of >= the row's effective date).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="person_balance_snapshots",
+    )
+    person = models.ForeignKey(
+        Person,
+        on_delete=models.CASCADE,
+        related_name="balance_snapshots",
+    )
+    as_of = models.DateField()  # last day of the month
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    entry_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("person", "as_of")
+        ordering = ["-as_of"]
+
+    def __str__(self):
+        return f"{self.person_id} @ {self.as_of}: {self.balance}"
+
+
+class Counterparty(models.Model):
+    """
+    Distinct names a user has entered on expenses / incomes, per role,
+    with how many rows use them. Kept current by the expense / income
+    signals and feeds the list filter dropdowns without DISTINCT scans.
+    """
+
+    LENDER = "lender"
+    PAID_FOR = "paid_for"
+    INCOME_PERSON = "income_person"
+
+    ROLE_CHOICES = [
+        (LENDER, "Lender (borrowed from)"),
+        (PAID_FOR, "Paid for"),
+        (INCOME_PERSON, "Income person"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="counterparties",
+    )
+    role = models.CharField(max_length=16, choices=ROLE_CHOICES)
+    name = models.CharField(max_length=100)
+    usage_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("user", "role", "name")
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"{self.name} ({self.role}, {self.usage_count})"
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from .models import PersonLedgerEntry
+from .utils import LedgerBatch
+from expenses.models import Expense
+from income.models import Income
+
+User = get_user_model()
+
+
+# -------------------------------------------------
+# Ledger rebuild / reconciliation (one user at a time)
+# -------------------------------------------------
+
+def reconcile_user(user_id, fix=False, add_missing=False) -> dict:
+    """
+    Recompute one user's expected ledger from their expenses / incomes
+    (LedgerBatch.replay, see there for `add_missing`) and diff it against
+    the stored rows. With `fix` the corrections are written (bulk insert /
+    update / delete, then the people's summaries and search documents),
+    all in one transaction.
+
+    Module-level and keyed by id so process-pool workers can run it.
+    """
+    user = User.objects.get(pk=user_id)
+    with transaction.atomic():
+        batch = LedgerBatch(user)
+        expenses = (
+            Expense.objects.filter(user=user)
+            .filter(~Q(borrowed_from="") | ~Q(paid_for=""))
+            .select_related("category")
+        )
+        incomes = Income.objects.filter(user=user).exclude(person="")
+        rows = list(PersonLedgerEntry.objects.filter(user=user))
+
+        batch.replay([*expenses, *incomes], rows, add_missing=add_missing)
+        report = {"user_id": user.pk, "username": user.username, "stored": len(rows), **batch.planned()}
+        if fix:
+            batch.write()
+    return report
+
+
+def has_drift(report: dict) -> bool:
+    return any(report[key] for key in ("inserted", "updated", "deleted"))
@@ -0,0 +1,150 @@
+import heapq
+from decimal import Decimal
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .balances import refresh_person_summaries
+from .models import Person, PersonLedgerEntry
+from .utils import WRITE_BATCH_SIZE
+from kharcha.cache import LEDGER, bump
+from search.utils import reindex_ledger_entries
+
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+PLAN_SALT = "people.settlement.plan"
+
+# A party in a plan is a tracked person (id, name) or YOU, the user
+YOU = None
+
+
+# -------------------------------------------------
+# Planning (min cash flow)
+# -------------------------------------------------
+
+def open_balances(user) -> dict:
+    """
+    {(person id, name): active balance} for tracked, unarchived people whose
+    balance is not settled, summed from the ledger in one grouped query.
+    """
+    rows = (
+        PersonLedgerEntry.objects
+        .filter(user=user, archived=False, person__tracking_preference=Person.TRACK, person__archived=False)
+        .values("person_id", "person__name")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    balances = {}
+    for row in rows:
+        total = (row["total"] or ZERO).quantize(CENT)
+        if total:
+            balances[(row["person_id"], row["person__name"])] = total
+    return balances
+
+
+def plan_settlement(balances: dict) -> list:
+    """
+    Transfers that bring every balance to zero, as [(payer, payee, amount)]
+    with parties as in open_balances() or YOU.
+
+    Everyone with a positive balance owes money, everyone with a negative
+    one is owed, and YOU hold the difference. The largest debt is repeatedly
+    matched against the largest credit (two heaps), so chains like "Ravi
+    owes me, I owe Asha" become "Ravi pays Asha". Each step settles at least
+    one party, so there are at most (parties - 1) transfers, in O(n log n).
+    (Finding the true minimum is NP-hard.)
+    """
+    owed_to_you = sum(balances.values(), ZERO)
+    positions = dict(balances)
+    if owed_to_you:
+        positions[YOU] = -owed_to_you
+
+    # Max-heaps via negated amounts; the counter keeps ties stable (by name)
+    debtors, creditors = [], []
+    for order, party in enumerate(sorted(positions, key=lambda p: "" if p is YOU else p[1].casefold())):
+        amount = positions[party]
+        if amount > 0:
+            debtors.append((-amount, order, party))
+        elif amount < 0:
+            creditors.append((amount, order, party))
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers = []
+    while debtors and creditors:
+        debt, debtor_order, debtor = heapq.heappop(debtors)
+        credit, creditor_order, creditor = heapq.heappop(creditors)
+        amount = min(-debt, -credit)
+        transfers.append((debtor, creditor, amount))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor_order, debtor))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_order, creditor))
+    return transfers
+
+
+def plan_token(balances: dict) -> str:
+    """Signed record of the balances a plan was shown for."""
+    return signing.dumps({str(pk): str(amount) for (pk, _), amount in balances.items()}, salt=PLAN_SALT)
+
+
+def _party_name(party) -> str:
+    return "you" if party is YOU else party[1]
+
+
+def settlement_entries(user, transfers) -> list:
+    """
+    Manual ledger rows for a plan: a transfer changes the balance of each
+    person on either end (never YOU), so it is one or two rows.
+    """
+    today = timezone.localdate()
+    entries = []
+    for payer, payee, amount in transfers:
+        note = f"Settlement: {_party_name(payer)} paid {_party_name(payee)}"[:255]
+        for party, signed in ((payer, -amount), (payee, amount)):
+            if party is not YOU:
+                entries.append(PersonLedgerEntry(
+                    user=user, person_id=party[0], amount=signed,
+                    source_type="manual", note=note, effective_date=today,
+                ))
+    return entries
+
+
+# -------------------------------------------------
+# Applying an accepted plan
+# -------------------------------------------------
+
+def apply_settlement(user, token: str):
+    """
+    Re-plan from the current ledger and write it, all in one transaction:
+    one bulk_create of manual rows, then one summary refresh and the rows'
+    search documents. Returns the number of people settled, or None when
+    the token is bad or the balances moved since the plan was shown.
+    """
+    try:
+        expected = signing.loads(token, salt=PLAN_SALT)
+    except signing.BadSignature:
+        return None
+
+    with transaction.atomic():
+        # Lock the user's tracked people so no ledger write lands mid-plan
+        people = Person.objects.filter(user=user, tracking_preference=Person.TRACK, archived=False)
+        list(people.select_for_update().values_list("pk", flat=True))
+        balances = open_balances(user)
+        if {str(pk): amount for (pk, _), amount in balances.items()} != {
+            pk: Decimal(amount) for pk, amount in expected.items()
+        }:
+            return None
+
+        entries = settlement_entries(user, plan_settlement(balances))
+        PersonLedgerEntry.objects.bulk_create(entries, batch_size=WRITE_BATCH_SIZE)
+        refresh_person_summaries(pk for pk, _ in balances)
+        bump(user.pk, LEDGER)
+        written = [entry.pk for entry in entries]
+        for start in range(0, len(written), WRITE_BATCH_SIZE):
+            reindex_ledger_entries(written[start:start + WRITE_BATCH_SIZE])
+    return len(balances)
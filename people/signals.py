@@ -1,75 +1,64 @@
 
-import logging
-from decimal import Decimal
-
-from django.db import transaction
-from django.db.models.signals import post_save
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Person
-from .utils import apply_income_to_person_ledger, get_person_by_name
-from income.models import Income
-from people.models import PersonLedgerEntry
-from people.utils import apply_expense_to_person_ledger
-from expenses.models import Expense
+from .balances import entry_added, entry_removed, invalidate_snapshots, refresh_person_summaries
+from .models import Person, PersonLedgerEntry
+from .utils import link_rows_to_person
+from expenses.utils import remember_values, stored_values
+from kharcha.cache import LEDGER, PEOPLE, bump
 
+# Income -> ledger is applied by income.signals.rebuild_income_person_ledger
+# alone (one receiver, one application per save).
 
-logger = logging.getLogger(__name__)
-ZERO = Decimal("0.00")
 
+# -------------------------------------------------
+# Person links (Expense / Income -> Person FKs)
+# -------------------------------------------------
 
-@receiver(post_save, sender=Income)
-def handle_income_post_save(sender, instance: Income, created, **kwargs):
-    """
-    Auto-apply income to Person ledger ONLY when:
-      - Person already exists
-      - tracking_preference == TRACK
+@receiver(post_save, sender=Person)
+def link_named_rows(sender, instance: Person, created, **kwargs):
+    # Rows saved before this person existed carry the name but no FK
+    if created:
+        link_rows_to_person(instance)
 
-    This signal MUST NOT create Person records.
-    """
-    user = getattr(instance, "user", None)
-    if not user:
-        logger.warning("Income saved without user: id=%s", getattr(instance, "pk", "<unknown>"))
-        return
 
-    person_name = getattr(instance, "person", None)
-    if not person_name:
-        return  # income not linked to a person
+# -------------------------------------------------
+# Cached data versions (kharcha.cache)
+# -------------------------------------------------
 
-    
-    person = get_person_by_name(user, person_name)
-    if not person:
-        logger.debug(
-            "Income #%s references person '%s' but person does not exist yet (ASK flow).",
-            instance.pk,
-            person_name,
-        )
-        return
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def bump_people_version(sender, instance: Person, **kwargs):
+    bump(instance.user_id, PEOPLE)
 
-    # Only auto-apply if user explicitly tracks this person
-    if person.tracking_preference != Person.TRACK:
-        logger.debug(
-            "Income #%s not auto-applied: person %s preference=%s",
-            instance.pk,
-            person.name,
-            person.tracking_preference,
-        )
-        return
 
-    try:
-        with transaction.atomic():
-            applied = apply_income_to_person_ledger(user, person, instance)
-            if applied:
-                logger.info(
-                    "Auto-applied income #%s to ledger for person %s",
-                    instance.pk,
-                    person.name,
-                )
-    except Exception as exc:
-        logger.exception(
-            "Failed to auto-apply income #%s to person ledger: %s",
-            instance.pk,
-            exc,
-        )
-        raise
+# -------------------------------------------------
+# Person balance summary (cached_balance etc.)
+# -------------------------------------------------
 
+@receiver(post_save, sender=PersonLedgerEntry)
+def update_person_summary_on_save(sender, instance: PersonLedgerEntry, created, **kwargs):
+    if created:
+        entry_added(instance)
+        if not instance.archived:
+            invalidate_snapshots(instance.person_id, since=instance.effective_date)
+    else:
+        # Amount / archived / person / date may have changed: recompute both sides
+        old = stored_values(instance, ["person_id"]) or {}
+        refresh_person_summaries({instance.person_id, old.get("person_id")})
+    remember_values(instance)
+    bump(instance.user_id, LEDGER)
+
+
+@receiver(post_delete, sender=PersonLedgerEntry)
+def update_person_summary_on_delete(sender, instance: PersonLedgerEntry, **kwargs):
+    # The person (or the whole account) is going away with its rows
+    origin = kwargs.get("origin")
+    if isinstance(origin, (Person, User)) or getattr(origin, "model", None) in (Person, User):
+        return
+    entry_removed(instance)
+    if not instance.archived:
+        invalidate_snapshots(instance.person_id, since=instance.effective_date)
+    bump(instance.user_id, LEDGER)
@@ -0,0 +1,124 @@
+import math
+from decimal import Decimal
+
+from django.core.paginator import Page
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.expressions import RowRange
+
+from kharcha.pagination import CountedPaginator
+from .models import Person, PersonLedgerEntry
+
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+# Newest first, as the statement is shown; `id` breaks ties
+STATEMENT_ORDER = ("-effective_date", "-created_at", "id")
+
+EXPORT_FIELDS = ("date", "recorded_at", "source", "note", "amount", "balance")
+
+SOURCE_LABELS = dict(PersonLedgerEntry.SOURCE_TYPE_CHOICES)
+
+
+def _cents(value) -> Decimal:
+    # SQLite hands window sums back unscaled ("-843"); match the amounts
+    return (value or ZERO).quantize(CENT)
+
+
+def _chronological():
+    """STATEMENT_ORDER reversed: the order the balance builds up in."""
+    return [F("effective_date").asc(), F("created_at").asc(), F("id").desc()]
+
+
+def statement_rows(person: Person):
+    """
+    The person's active rows, newest first, each annotated with
+    `running_balance` (the balance once that row is counted) and
+    `statement_count` (rows in the whole statement). Both are window
+    functions over every active row, so any slice of this queryset is still
+    one query.
+    """
+    return (
+        PersonLedgerEntry.objects.filter(person=person, archived=False)
+        .annotate(
+            running_balance=Window(
+                Sum("amount"), order_by=_chronological(), frame=RowRange(start=None, end=0),
+            ),
+            statement_count=Window(Count("id")),
+        )
+        .order_by(*STATEMENT_ORDER)
+    )
+
+
+# -------------------------------------------------
+# Statement pages
+# -------------------------------------------------
+
+def statement_page(person: Person, number, per_page: int) -> Page:
+    """
+    Numbered statement page: rows, running balances and the page count
+    from a single query (no separate COUNT). Out-of-range numbers get the
+    last page, as Paginator.get_page does.
+    """
+    try:
+        number = max(int(number), 1)
+    except (TypeError, ValueError):
+        number = 1
+
+    rows = list(statement_rows(person)[(number - 1) * per_page: number * per_page])
+    for row in rows:
+        row.running_balance = _cents(row.running_balance)
+    if rows:
+        count = rows[0].statement_count
+    else:
+        # Past the end (or nothing yet): the stored summary knows the size
+        count = person.active_entry_count
+        last = max(math.ceil(count / per_page), 1)
+        if number > last:
+            return statement_page(person, last, per_page)
+
+    paginator = CountedPaginator(statement_rows(person), per_page, count)
+    return Page(rows, number, paginator)
+
+
+def fill_running_balances(person: Person, rows):
+    """
+    Running balances for a keyset page (`rows` in STATEMENT_ORDER). A seek
+    filter cuts rows out of any window, so take the active total minus the
+    rows newer than the page instead: one aggregate.
+    """
+    if not rows:
+        return
+    top = rows[0]
+    newer = (
+        Q(effective_date__gt=top.effective_date)
+        | Q(effective_date=top.effective_date, created_at__gt=top.created_at)
+        | Q(effective_date=top.effective_date, created_at=top.created_at, id__lt=top.id)
+    )
+    sums = PersonLedgerEntry.objects.filter(person=person, archived=False).aggregate(
+        total=Sum("amount"), newer=Sum("amount", filter=newer),
+    )
+    running = _cents(sums["total"]) - _cents(sums["newer"])
+    for row in rows:
+        row.running_balance = running
+        running -= row.amount
+
+
+# -------------------------------------------------
+# Exports (whole history, oldest first)
+# -------------------------------------------------
+
+def statement_export_rows(person: Person, chunk_size: int):
+    """
+    Lazy (date, recorded at, source, note, amount, balance) tuples over the
+    whole active history, oldest first. The running balance is computed by
+    the database while the rows stream out in chunks.
+    """
+    rows = (
+        statement_rows(person)
+        .order_by(*_chronological())
+        .values_list("effective_date", "created_at", "source_type", "note", "amount", "running_balance")
+        .iterator(chunk_size=chunk_size)
+    )
+    for day, recorded_at, source, note, amount, balance in rows:
+        yield day, recorded_at, SOURCE_LABELS.get(source, source), note, amount, _cents(balance)
@@ -1,3 +1,243 @@
+import random
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import Sum
 from django.test import TestCase
 
-# Create your tests here.
+from expenses.models import Category, Expense
+from income.models import Income
+from .balances import balance_as_of, balance_timeline, summary_drift
+from .forms import PersonForm
+from .models import Person, PersonBalanceSnapshot, PersonLedgerEntry
+from .settlement import YOU, apply_settlement, open_balances, plan_settlement, plan_token
+
+
+class PersonSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("summary")
+        self.person = Person.objects.create(user=self.user, name="Ravi", tracking_preference=Person.TRACK)
+        self.category, _ = Category.objects.get_or_create(name="Food", user=None)
+
+    def assertSummary(self, balance, count):
+        self.person.refresh_from_db()
+        self.assertEqual(self.person.cached_balance, Decimal(balance))
+        self.assertEqual(self.person.active_entry_count, count)
+        self.assertEqual(list(summary_drift(self.user.pk)), [])
+
+    def test_deleting_sources_removes_their_rows_once(self):
+        # The ledger work runs on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            expense = Expense.objects.create(
+                user=self.user, category=self.category, amount=100, date=date(2026, 1, 1),
+                is_for_others=True, paid_for="Ravi",
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            income = Income.objects.create(
+                user=self.user, amount=40, date=date(2026, 1, 2), source="loan", person="Ravi",
+            )
+        self.assertSummary("60.00", 2)
+
+        expense.delete()
+        self.assertSummary("-40.00", 1)
+        income.delete()
+        self.assertSummary("0.00", 0)
+        self.assertFalse(PersonLedgerEntry.objects.filter(person=self.person).exists())
+
+
+class BalanceSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("snapshots")
+        self.person = Person.objects.create(user=self.user, name="Ravi", tracking_preference=Person.TRACK)
+        # Activity in Jan-Mar, May and Jun (none in April), plus an archived row
+        for day, amount in [
+            (date(2025, 1, 5), "100.00"), (date(2025, 1, 31), "-20.00"), (date(2025, 2, 14), "55.50"),
+            (date(2025, 3, 1), "-300.00"), (date(2025, 3, 20), "42.00"), (date(2025, 5, 9), "10.00"),
+            (date(2025, 6, 30), "-7.25"),
+        ]:
+            self.add(day, amount)
+        self.add(date(2025, 2, 1), "999.00", archived=True)
+
+    def add(self, day, amount, archived=False):
+        return PersonLedgerEntry.objects.create(
+            user=self.user, person=self.person, amount=Decimal(amount),
+            source_type="manual", effective_date=day, archived=archived,
+        )
+
+    def expected(self, day):
+        return PersonLedgerEntry.objects.filter(
+            person=self.person, archived=False, effective_date__lte=day,
+        ).aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
+
+    def snapshot_months(self):
+        return list(
+            PersonBalanceSnapshot.objects.filter(person=self.person)
+            .order_by("as_of").values_list("as_of", flat=True)
+        )
+
+    def test_matches_a_plain_aggregate(self):
+        # Out of order, so snapshots are built in pieces and then reused
+        for day in [
+            date(2025, 3, 10), date(2024, 12, 31), date(2025, 1, 31), date(2025, 7, 15),
+            date(2025, 4, 30), date(2025, 2, 1), date(2025, 6, 29), date(2026, 1, 1),
+        ]:
+            self.assertEqual(balance_as_of(self.person, day), self.expected(day), day)
+        # An unbroken prefix: one per month with activity, up to the last one read
+        self.assertEqual(self.snapshot_months(), [
+            date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 5, 31), date(2025, 6, 30),
+        ])
+
+    def test_backdated_row_drops_later_snapshots(self):
+        balance_as_of(self.person, date(2025, 7, 1))
+        self.add(date(2025, 2, 10), "5.00")
+        self.assertEqual(self.snapshot_months(), [date(2025, 1, 31)])
+
+        # Rebuilt on the next read, with the new row counted
+        self.assertEqual(balance_as_of(self.person, date(2025, 7, 1)), self.expected(date(2025, 7, 1)))
+        march = PersonBalanceSnapshot.objects.get(person=self.person, as_of=date(2025, 3, 31))
+        self.assertEqual(march.balance, self.expected(date(2025, 3, 31)))
+
+    def test_timeline_opening_balance(self):
+        opening, points = balance_timeline(self.person, date(2025, 3, 1), date(2025, 3, 31))
+        self.assertEqual(opening, self.expected(date(2025, 2, 28)))
+        self.assertEqual(points, [
+            (date(2025, 3, 1), Decimal("-300.00"), opening - 300),
+            (date(2025, 3, 20), Decimal("42.00"), opening - 258),
+        ])
+        self.assertEqual(points[-1][2], self.expected(date(2025, 3, 31)))
+
+
+class PersonNameKeyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("keys")
+        self.oldest = Person.objects.create(user=self.user, name="Ravi")
+        # A spelled-differently duplicate, as migration 0011 leaves it
+        self.duplicate = Person.objects.create(user=self.user, name="Ravi K")
+        Person.objects.filter(pk=self.duplicate.pk).update(name="RAVI", name_key=f"ravi#{self.duplicate.pk}")
+
+    def test_migrated_duplicate_keeps_its_key_on_save(self):
+        person = Person.objects.get(pk=self.duplicate.pk)
+        person.tracking_preference = Person.TRACK
+        person.save()
+        person.refresh_from_db()
+        self.assertEqual(person.name_key, f"ravi#{person.pk}")
+
+    def test_renamed_duplicate_gets_a_plain_key(self):
+        person = Person.objects.get(pk=self.duplicate.pk)
+        person.name = "Ravi Kumar"
+        person.save()
+        person.refresh_from_db()
+        self.assertEqual(person.name_key, "ravi kumar")
+
+    def test_new_person_links_rows_naming_them(self):
+        category, _ = Category.objects.get_or_create(name="Food", user=None)
+        expense = Expense.objects.create(
+            user=self.user, category=category, amount=10, date=date(2026, 1, 1),
+            is_for_others=True, paid_for="meera  NAIR",
+        )
+        income = Income.objects.create(user=self.user, amount=5, date=date(2026, 1, 1), person="MEERA nair")
+        person = Person.objects.create(user=self.user, name="meera nair")
+        expense.refresh_from_db()
+        income.refresh_from_db()
+        self.assertEqual(expense.paid_for_person, person)
+        self.assertEqual(income.linked_person, person)
+
+    def test_migrated_duplicate_can_be_edited_in_the_form(self):
+        form = PersonForm(
+            {"name": "Ravi", "auto_suggest_enabled": "on"},
+            instance=Person.objects.get(pk=self.duplicate.pk), user=self.user,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+
+class PeopleSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("search")
+        for name in ("Ravi Kumar", "Ravindra", "Asha", "Kumar"):
+            Person.objects.create(user=self.user, name=name)
+        self.client.force_login(self.user)
+
+    def search(self, q):
+        response = self.client.get("/people/", {"q": q, "show_untracked": "1"})
+        return sorted(person.name for person in response.context["people"])
+
+    def test_whole_name_prefix(self):
+        self.assertEqual(self.search("RAV"), ["Ravi Kumar", "Ravindra"])
+        self.assertEqual(self.search("ravi k"), ["Ravi Kumar"])
+        # Not a word search: "kumar" only finds the name that starts with it
+        self.assertEqual(self.search("kumar"), ["Kumar"])
+
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("settle")
+
+    def owe(self, name, amount):
+        """A tracked person whose balance is `amount` (positive: they owe the user)."""
+        person, _ = Person.objects.get_or_create(
+            user=self.user, name=name, defaults={"tracking_preference": Person.TRACK},
+        )
+        PersonLedgerEntry.objects.create(
+            user=self.user, person=person, amount=Decimal(amount),
+            source_type="manual", effective_date=date(2026, 1, 1),
+        )
+        return person
+
+    def test_chain_through_you_becomes_one_transfer(self):
+        ravi, asha = (1, "Ravi"), (2, "Asha")
+        # Ravi owes me 100, I owe Asha 100
+        self.assertEqual(
+            plan_settlement({ravi: Decimal("100.00"), asha: Decimal("-100.00")}),
+            [(ravi, asha, Decimal("100.00"))],
+        )
+
+    def test_at_most_parties_minus_one_transfers(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            balances = {
+                (pk, f"P{pk}"): Decimal(rng.randrange(-50000, 50000)) / 100
+                for pk in range(1, rng.randrange(2, 12))
+            }
+            balances = {party: amount for party, amount in balances.items() if amount}
+            transfers = plan_settlement(balances)
+            parties = len(balances) + (1 if sum(balances.values()) else 0)
+            self.assertLessEqual(len(transfers), max(parties - 1, 0))
+
+            # Every party (YOU included) ends at zero
+            positions = dict(balances)
+            positions[YOU] = -sum(balances.values(), Decimal("0.00"))
+            for payer, payee, amount in transfers:
+                self.assertGreater(amount, 0)
+                positions[payer] -= amount
+                positions[payee] += amount
+            self.assertEqual(set(positions.values()), {Decimal("0.00")})
+
+    def test_apply_brings_every_balance_to_zero(self):
+        people = [self.owe("Ravi", "250.00"), self.owe("Asha", "-100.00"), self.owe("Meera", "-75.50")]
+        balances = open_balances(self.user)
+        self.assertEqual(apply_settlement(self.user, plan_token(balances)), 3)
+
+        self.assertEqual(open_balances(self.user), {})
+        for person in people:
+            person.refresh_from_db()
+            self.assertEqual(person.cached_balance, Decimal("0.00"))
+        self.assertEqual(list(summary_drift(self.user.pk)), [])
+
+    def test_apply_refuses_a_tampered_token(self):
+        self.owe("Ravi", "250.00")
+        token = plan_token(open_balances(self.user))
+        rows = PersonLedgerEntry.objects.count()
+        self.assertIsNone(apply_settlement(self.user, token[:-2] + "xx"))
+        self.assertIsNone(apply_settlement(self.user, ""))
+        self.assertEqual(PersonLedgerEntry.objects.count(), rows)
+
+    def test_apply_refuses_when_balances_moved(self):
+        self.owe("Ravi", "250.00")
+        self.owe("Asha", "-100.00")
+        token = plan_token(open_balances(self.user))
+        self.owe("Ravi", "10.00")
+        rows = PersonLedgerEntry.objects.count()
+        self.assertIsNone(apply_settlement(self.user, token))
+        self.assertEqual(PersonLedgerEntry.objects.count(), rows)
@@ -7,7 +7,11 @@ urlpatterns = [
     # PEOPLE LIST + CREATE
     path("people/", views.people_list, name="people-list"),
     path("people/add/", views.person_create, name="person-add"),
+    path("people/settle-up/", views.settle_up, name="people-settle-up"),
+    path("people/autocomplete/", views.person_autocomplete, name="people-autocomplete"),
     path("people/<int:pk>/", views.person_detail, name="person-detail"),
+    path("people/<int:pk>/timeline.json", views.person_timeline, name="person-timeline"),
+    path("people/<int:pk>/statement/", views.person_statement_export, name="person-statement-export"),
 
     # --- APPLY income to ledger ---
     path(
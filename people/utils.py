@@ -3,16 +3,24 @@ from decimal import Decimal
 from typing import Optional
 
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Q
 
+from .balances import current_balance, refresh_person_summaries
 from .models import Person, PersonLedgerEntry
 from django.utils.html import format_html
 from django.urls import reverse
-from expenses.models import Expense
+from expenses.models import Expense, name_key, normalize_name
+from income.models import Income
+from kharcha import identity
+from kharcha.cache import LEDGER, PEOPLE, bump
+from search.utils import reindex_ledger_entries
 
 
 ZERO = Decimal("0.00")
 
+# Rows per statement when LedgerBatch writes (keeps IN lists / inserts bounded)
+WRITE_BATCH_SIZE = 1000
+
 
 
 # -------------------------------------------------
@@ -20,23 +28,38 @@ ZERO = Decimal("0.00")
 # -------------------------------------------------
 
 def _normalize_name(raw_name: Optional[str]) -> Optional[str]:
-    if not raw_name:
-        return None
-    name = raw_name.strip()
-    if not name:
-        return None
-    return name.title()
+    return normalize_name(raw_name) or None
 
 
 def get_person_by_name(user, raw_name) -> Optional[Person]:
     """
-    Case-insensitive FIND ONLY.
+    Case-insensitive FIND ONLY (a point lookup on name_key).
      Does NOT create a Person.
+    Once per request and name: the view, the banner logic and filters
+    share the instance (and a miss) until the user's people / ledger change.
     """
     name = _normalize_name(raw_name)
     if not name:
         return None
-    return Person.objects.filter(user=user, name__iexact=name).first()
+    key = name_key(name)
+    return identity.remember(
+        ("person", user.pk, key),
+        lambda: Person.objects.filter(user=user, name_key=key).first(),
+        user.pk, PEOPLE, LEDGER,
+    )
+
+
+def share_person(person: Person):
+    """Hand the request a Person it just wrote (their save evicts the looked-up copy)."""
+    identity.register(("person", person.user_id, person.name_key), person, person.user_id, PEOPLE, LEDGER)
+
+
+def _known_people(user_id) -> dict:
+    """{name_key: Person or None (known not to exist)} already looked up in this request."""
+    identity_map = identity.current()
+    if identity_map is None:
+        return {}
+    return {key[2]: person for key, person in identity_map.objects.items() if key[:2] == ("person", user_id)}
 
 
 def get_or_create_person_by_name(user, raw_name) -> Optional[Person]:
@@ -48,19 +71,59 @@ def get_or_create_person_by_name(user, raw_name) -> Optional[Person]:
     if not name:
         return None
 
-    person = Person.objects.filter(user=user, name__iexact=name).first()
+    person = get_person_by_name(user, name)
     if person:
         if person.name != name:
             person.name = name
             person.save(update_fields=["name"])
         return person
 
-    return Person.objects.create(
+    person = Person.objects.create(
         user=user,
         name=name,
         tracking_preference=Person.ASK,
         auto_suggest_enabled=True,
     )
+    share_person(person)
+    return person
+
+
+def link_rows_to_person(person: Person):
+    """
+    Point the user's expenses / incomes that already name `person` (but
+    were saved before they existed) at them. For newly created people.
+    Stored names go through normalize_name, like Person.name, so they are
+    compared exactly.
+    """
+    for model, name_field, fk_field in (
+        (Expense, "borrowed_from", "borrowed_from_person"),
+        (Expense, "paid_for", "paid_for_person"),
+        (Income, "person", "linked_person"),
+    ):
+        model.objects.filter(
+            user_id=person.user_id, **{f"{fk_field}__isnull": True, name_field: person.name},
+        ).update(**{fk_field: person})
+
+
+def named_person_q(user, raw_name, fk_field, name_field) -> Q:
+    """
+    Filter for the rows naming `raw_name`: an indexed join on the Person FK
+    when that person exists, else the stored name (people never added).
+    """
+    person = get_person_by_name(user, raw_name)
+    if person:
+        return Q(**{fk_field: person})
+    return Q(**{name_field: normalize_name(raw_name)})
+
+
+def name_prefix_q(text) -> Q:
+    """
+    People whose whole name starts with `text` (as name_key folds it): a
+    range on name_key, so the (user, name_key) unique index serves it on
+    every backend (LIKE 'x%' would need a pattern_ops index on PostgreSQL).
+    """
+    key = name_key(text)
+    return Q(name_key__gte=key, name_key__lt=key + "\uffff")
 
 
 # -------------------------------------------------
@@ -68,131 +131,422 @@ def get_or_create_person_by_name(user, raw_name) -> Optional[Person]:
 # -------------------------------------------------
 
 def person_balance(user, person) -> Decimal:
-    agg = PersonLedgerEntry.objects.filter(
-        user=user,
-        person=person,
-        archived=False,
-    ).aggregate(total=Sum("amount"))
-    return agg["total"] or ZERO
+    # Person.cached_balance, read fresh: `person` may predate ledger writes
+    # made earlier in this request (e.g. the delete just above)
+    return current_balance(person)
 
 
 # -------------------------------------------------
-# Income → Ledger  
+# Single-source helpers (explicit "apply" actions)
 # -------------------------------------------------
 
 @transaction.atomic
 def apply_income_to_person_ledger(user, person: Person, income) -> bool:
     """
     Apply income AFTER explicit consent.
-    SAFE + idempotent + delete-safe.
+    SAFE + idempotent + delete-safe: the income's existing row is
+    updated in place (or removed when it no longer applies).
     """
     if not person or not income:
         return False
+    batch = LedgerBatch(user)
+    applied = batch.sync([(income, True)]) > 0
+    batch.write()
+    return applied
 
-    try:
-        amount = Decimal(income.amount)
-    except Exception:
-        return False
 
-    if amount <= ZERO:
+@transaction.atomic
+def apply_expense_to_person_ledger(user, expense, *args, **kwargs) -> bool:
+    """
+    Bring the expense's ledger rows (borrowed-from: negative, paid-for:
+    positive) in line with the expense, updating existing rows in place.
+    """
+    if not expense:
         return False
+    batch = LedgerBatch(user)
+    applied = batch.sync([(expense, kwargs.get("force_apply", False))]) > 0
+    batch.write()
+    return applied
 
-    #  removing any old ledger rows for this income
-    PersonLedgerEntry.objects.filter(
-        user=user,
-        income=income,
-    ).delete()
 
-    current_balance = person_balance(user, person)
+# -------------------------------------------------
+# Ledger rules (one user's batch of expenses / incomes)
+# -------------------------------------------------
 
-    if income.source == "loan":
-        ledger_amount = -amount
-        note = f"Loan from {person.name}"
+def _is_repayment_category(category) -> bool:
+    if not category:
+        return False
+    cat_name = category.name.lower().strip()
+    return "repayment" in cat_name or "settlement" in cat_name
 
-    elif income.source == "loan_repayment":
-        if current_balance <= ZERO:
-            return False
-        ledger_amount = -min(amount, current_balance)
-        note = f"Repayment by {person.name}"
 
-    else:
-        return False
+def _expense_role(entry) -> str:
+    return "borrowed" if entry.amount < ZERO else "paid_for"
 
-    PersonLedgerEntry.objects.create(
-        user=user,
-        person=person,
-        amount=ledger_amount,
-        source_type="income",
-        note=note,
-        income=income,   #  ALWAYS LINK
-    )
-    return True
 
-@transaction.atomic
-def apply_expense_to_person_ledger(user, expense, *args, **kwargs) -> bool:
-    force_apply = kwargs.get("force_apply", False)
-    ZERO = Decimal("0.00")
+def _income_role(entry) -> str:
+    return "income"
 
-    if not expense:
-        return False
-    
-    
-    PersonLedgerEntry.objects.filter(expense=expense).delete()
 
-    try:
-        amount = Decimal(expense.amount)
-    except Exception:
-        return False
+class LedgerBatch:
+    """
+    One user's people and active balances, loaded once, so a batch of
+    expenses / incomes can be turned into ledger rows in memory and
+    written with a handful of set-based queries, instead of a signal
+    (and a balance query) per row.
 
-    if amount <= ZERO:
-        return False
+    Balances are kept current as rows are planned, so the repayment
+    checks see earlier sources of the same batch.
 
-    # 2.  "BORROWED FROM" (Money coming IN)
-    if expense.is_borrowed and expense.borrowed_from:
-        person = get_person_by_name(user, expense.borrowed_from)
-        if person:
-            PersonLedgerEntry.objects.create(
-                user=user,
-                person=person,
-                amount=-amount,  # You owe them
-                source_type="expense",
-                note=f"Borrowed: {expense.description or 'Expense'}",
-                expense=expense,
-            )
+    - expense_entries / income_entries: rows for freshly bulk-created
+      sources (CSV import), returned for the caller to bulk_create.
+    - sync + write: bring existing sources' rows in line (updated in
+      place, only a role that appears or disappears inserts or deletes).
 
-    # 3.  "PAID FOR" (Money going OUT)
-    if expense.is_for_others and expense.paid_for:
-        person = get_person_by_name(user, expense.paid_for)
-        if person:
-            
-            is_repayment_category = False
-            
-            if expense.category:
-                
-                cat_name = expense.category.name.lower().strip()
-                
-                # Check for keywords instead of exact match
-                if "repayment" in cat_name or "settlement" in cat_name:
-                    is_repayment_category = True
-
-            if is_repayment_category:
-                # If Manual Entry (force_apply=False), check if we actually owe them.
-                if not force_apply:
-                    agg = person.ledger_entries.filter(archived=False).aggregate(total=Sum("amount"))
-                    current_balance = agg["total"] or ZERO
-                    
-                    # BLOCK if we don't owe them (Balance is 0 or Positive)
-                    if current_balance >= ZERO:
-                        return False 
-
-            # Create the entry (only if not blocked above)
-            PersonLedgerEntry.objects.create(
-                user=user,
-                person=person,
-                amount=amount,  # They owe you (or reduces your debt)
-                source_type="expense",
-                note=f"Paid for: {expense.description or 'Expense'}",
-                expense=expense,
-            )
+    Given `sources`, only the people they name are loaded, and the ones
+    this request already looked up (get_person_by_name) are reused as is.
+    """
 
-    return True
\ No newline at end of file
+    def __init__(self, user, sources=None):
+        self.user = user
+        if sources is None:
+            people = Person.objects.filter(user=user)
+        else:
+            people = self._referenced_people(sources)
+        self.people = {person.name_key: person for person in people}
+        self.by_id = {person.pk: person for person in self.people.values()}
+        self.balances = {person.pk: person.cached_balance for person in self.people.values()}
+        # People whose stored summary (cached_balance etc.) needs refreshing
+        # once the rows are written; see people.balances
+        self.touched = set()
+        self._new, self._changed, self._stale = [], {}, []
+
+    def _referenced_people(self, sources) -> list:
+        ids, keys = set(), set()
+        for source in sources:
+            for name_field, fk_field in source.PERSON_LINKS:
+                person_id, name = getattr(source, f"{fk_field}_id"), _normalize_name(getattr(source, name_field))
+                if person_id:
+                    ids.add(person_id)
+                elif name:
+                    keys.add(name_key(name))
+
+        people = []
+        for key, person in _known_people(self.user.pk).items():
+            if person is not None and person.pk in ids:
+                people.append(person)
+                ids.discard(person.pk)
+            keys.discard(key)  # known, and known missing, names
+        if ids or keys:
+            people.extend(Person.objects.filter(user=self.user).filter(Q(pk__in=ids) | Q(name_key__in=keys)))
+        return people
+
+    def person(self, raw_name) -> Optional[Person]:
+        name = _normalize_name(raw_name)
+        return self.people.get(name_key(name)) if name else None
+
+    def add_people(self, raw_names):
+        """Create the missing people in one insert (income rows create them, like the signal does)."""
+        missing = {}
+        for raw_name in raw_names:
+            name = _normalize_name(raw_name)
+            if name and name_key(name) not in self.people:
+                missing.setdefault(name_key(name), name)
+        if not missing:
+            return
+
+        people = []
+        for name in missing.values():
+            person = Person(
+                user=self.user,
+                name=name,
+                tracking_preference=Person.ASK,
+                auto_suggest_enabled=True,
+            )
+            person.normalize()
+            people.append(person)
+        for person in Person.objects.bulk_create(people):
+            self.people[person.name_key] = person
+            self.by_id[person.pk] = person
+            self.balances[person.pk] = ZERO
+            link_rows_to_person(person)
+        # bulk_create skips the post_save that bumps the version
+        bump(self.user.pk, PEOPLE)
+
+    def link(self, sources):
+        """Set the sources' Person FKs from their names, in memory (for bulk_create / reloaded rows)."""
+        for source in sources:
+            for name_field, fk_field in source.PERSON_LINKS:
+                person = self.person(getattr(source, name_field))
+                setattr(source, f"{fk_field}_id", person.pk if person else None)
+
+    def _linked(self, source, fk_field) -> Optional[Person]:
+        return self.by_id.get(getattr(source, f"{fk_field}_id"))
+
+    # ---- rules ----
+
+    def _balance_without(self, person: Person, rows) -> Decimal:
+        """Person's active balance minus this source's own current rows (as if deleted)."""
+        own = sum((entry.amount for entry in rows if entry.person_id == person.pk and not entry.archived), ZERO)
+        return self.balances.get(person.pk, ZERO) - own
+
+    def _row(self, person, amount, note, source, **link) -> dict:
+        return dict(
+            user_id=self.user.pk,
+            person_id=person.pk,
+            amount=amount,
+            note=note,
+            effective_date=source.date,
+            **link,
+        )
+
+    def _expense_rows(self, expense, force_apply, rows) -> dict:
+        try:
+            amount = Decimal(expense.amount)
+        except Exception:
+            return {}
+        if amount <= ZERO:
+            return {}
+
+        wanted = {}
+        link = dict(source_type="expense", expense_id=expense.pk)
+
+        # "BORROWED FROM" (Money coming IN): you owe them
+        if expense.is_borrowed and expense.borrowed_from:
+            person = self._linked(expense, "borrowed_from_person")
+            if person:
+                wanted["borrowed"] = self._row(
+                    person, -amount, f"Borrowed: {expense.description or 'Expense'}", expense, **link,
+                )
+
+        # "PAID FOR" (Money going OUT): they owe you (or reduces your debt)
+        if expense.is_for_others and expense.paid_for:
+            person = self._linked(expense, "paid_for_person")
+            if person:
+                # Repayments only count while we actually owe them
+                # (Manual Entry, force_apply=False). BLOCK if Balance is 0 or Positive
+                if _is_repayment_category(expense.category) and not force_apply:
+                    if self._balance_without(person, rows) >= ZERO:
+                        return wanted
+                wanted["paid_for"] = self._row(
+                    person, amount, f"Paid for: {expense.description or 'Expense'}", expense, **link,
+                )
+        return wanted
+
+    def _income_rows(self, income, force_apply, rows, balance=None) -> dict:
+        """
+        Applied when explicitly asked (force_apply / applied_to_people),
+        otherwise only for TRACK people. `balance` overrides the balance
+        a repayment is checked against.
+        """
+        person = self._linked(income, "linked_person")
+        if not person:
+            return {}
+        if not (force_apply or income.applied_to_people) and person.tracking_preference != Person.TRACK:
+            return {}
+
+        try:
+            amount = Decimal(income.amount)
+        except Exception:
+            return {}
+        if amount <= ZERO:
+            return {}
+
+        link = dict(source_type="income", income_id=income.pk)
+        if income.source == "loan":
+            return {"income": self._row(person, -amount, f"Loan from {person.name}", income, **link)}
+
+        if income.source == "loan_repayment":
+            if balance is None:
+                balance = self._balance_without(person, rows)
+            if balance > ZERO:
+                return {"income": self._row(
+                    person, -min(amount, balance), f"Repayment by {person.name}", income, **link,
+                )}
+        return {}
+
+    # ---- planning ----
+
+    def _count(self, entry, sign):
+        self.touched.add(entry.person_id)
+        if not entry.archived:
+            self.balances[entry.person_id] = self.balances.get(entry.person_id, ZERO) + sign * entry.amount
+
+    def _plan(self, rows, role_of, wanted: dict):
+        """
+        Diff a source's rows against `wanted` ({role: field values}):
+        unchanged rows are left alone, changed ones are updated with just
+        those fields, and only a role that appears or disappears inserts
+        or deletes a row.
+        """
+        existing = {}
+        for entry in rows:
+            if role_of(entry) in existing:
+                self._stale.append(entry)  # duplicate from older delete-and-recreate runs
+                self._count(entry, -1)
+            else:
+                existing[role_of(entry)] = entry
+
+        for role, values in wanted.items():
+            entry = existing.pop(role, None)
+            if entry is None:
+                entry = PersonLedgerEntry(**values)
+                self._new.append(entry)
+                self._count(entry, 1)
+                continue
+            changed = [name for name, value in values.items() if getattr(entry, name) != value]
+            if changed:
+                self._count(entry, -1)
+                for name in changed:
+                    setattr(entry, name, values[name])
+                self._count(entry, 1)
+                self._changed.setdefault(entry.pk, (entry, set()))[1].update(changed)
+
+        self._stale.extend(existing.values())
+        for entry in existing.values():
+            self._count(entry, -1)
+
+    def _take_new(self) -> list:
+        entries, self._new = self._new, []
+        return entries
+
+    def expense_entries(self, expenses) -> list:
+        """Rows for newly inserted expenses (signal rules, no force)."""
+        for expense in expenses:
+            self._plan([], _expense_role, self._expense_rows(expense, False, []))
+        return self._take_new()
+
+    def income_entries(self, incomes) -> list:
+        """Rows for newly inserted incomes (not applied explicitly)."""
+        for income in incomes:
+            self._plan([], _income_role, self._income_rows(income, False, []))
+        return self._take_new()
+
+    def sync(self, sources) -> int:
+        """
+        Plan the changes for existing sources, given as (expense or
+        income, force_apply) in the order they were saved; their current
+        rows are read in one query. Nothing is written until write().
+        Returns how many of the sources have ledger rows.
+        """
+        sources = list(sources)
+        expense_ids = [source.pk for source, _ in sources if isinstance(source, Expense)]
+        income_ids = [source.pk for source, _ in sources if not isinstance(source, Expense)]
+
+        rows = {}
+        for entry in PersonLedgerEntry.objects.filter(
+            Q(expense_id__in=expense_ids) | Q(income_id__in=income_ids)
+        ).order_by("pk"):
+            key = ("expense", entry.expense_id) if entry.expense_id else ("income", entry.income_id)
+            rows.setdefault(key, []).append(entry)
+
+        applied = 0
+        for source, force_apply in sources:
+            if isinstance(source, Expense):
+                own = rows.get(("expense", source.pk), [])
+                wanted = self._expense_rows(source, force_apply, own)
+                self._plan(own, _expense_role, wanted)
+            else:
+                own = rows.get(("income", source.pk), [])
+                wanted = self._income_rows(source, force_apply, own)
+                self._plan(own, _income_role, wanted)
+            applied += bool(wanted)
+        return applied
+
+    def replay(self, sources, rows, add_missing=False):
+        """
+        Full rebuild: recompute the rows of every source, in the order they
+        were saved, with balances starting at zero, and plan the diff
+        against `rows` (all the user's stored ledger rows). Manual
+        adjustments are kept and count towards the balances in that order.
+
+        Whether a source has a row at all depended on things a replay
+        cannot see (tracking preference and balance at save time, banner
+        consent, whether the person existed yet), so a stored row is taken
+        as the record of that decision: its content (person, amount, note,
+        date) is recomputed, a repayment keeps the balance it was applied
+        against, and rows the rules no longer allow at all are removed.
+        With `add_missing`, sources without rows get whatever the current
+        rules give them (after a logic fix that dropped rows).
+        """
+        self.balances = dict.fromkeys(self.by_id, ZERO)
+        own_rows, manual = {}, []
+        for entry in rows:
+            if entry.expense_id:
+                own_rows.setdefault((Expense, entry.expense_id), []).append(entry)
+            elif entry.income_id:
+                own_rows.setdefault((Income, entry.income_id), []).append(entry)
+            else:
+                manual.append(entry)
+
+        events = [(entry.created_at, entry.pk, entry) for entry in manual]
+        events += [(source.created_at, source.pk, source) for source in sources]
+        for _, _, item in sorted(events, key=lambda event: (event[0], event[1], isinstance(event[2], PersonLedgerEntry))):
+            if isinstance(item, PersonLedgerEntry):
+                if not item.archived:
+                    self.balances[item.person_id] = self.balances.get(item.person_id, ZERO) + item.amount
+                continue
+
+            own = own_rows.pop((type(item), item.pk), [])
+            # As stored so far: _plan takes them out again and puts the wanted rows in
+            for entry in own:
+                if not entry.archived:
+                    self.balances[entry.person_id] = self.balances.get(entry.person_id, ZERO) + entry.amount
+
+            if isinstance(item, Expense):
+                self._plan(own, _expense_role, self._replayed_expense(item, own, add_missing))
+            else:
+                self._plan(own, _income_role, self._replayed_income(item, own, add_missing))
+
+        # Rows of sources that no longer name anyone
+        for own in own_rows.values():
+            self._plan(own, _expense_role if own[0].expense_id else _income_role, {})
+
+    def _replayed_expense(self, expense, own, add_missing) -> dict:
+        stored = {_expense_role(entry) for entry in own}
+        if add_missing:
+            return self._expense_rows(expense, "paid_for" in stored, own)
+        wanted = self._expense_rows(expense, True, own)
+        return {role: values for role, values in wanted.items() if role in stored}
+
+    def _replayed_income(self, income, own, add_missing) -> dict:
+        if not own:
+            return self._income_rows(income, False, own) if add_missing else {}
+        # A repayment stays applied against the balance it was applied with
+        balance = max(-own[0].amount, ZERO) if income.source == "loan_repayment" else None
+        return self._income_rows(income, True, own, balance=balance)
+
+    def planned(self) -> dict:
+        """What write() would do: rows to insert / update / delete."""
+        return {"inserted": len(self._new), "updated": len(self._changed), "deleted": len(self._stale)}
+
+    def write(self) -> int:
+        """
+        Apply the planned changes: one DELETE, one bulk UPDATE, one
+        INSERT, then the people's summaries and the rows' search
+        documents in one pass each. Returns the number of rows written.
+        """
+        stale = [entry.pk for entry in self._stale]
+        changed = list(self._changed.values())
+        new = self._take_new()
+        self._changed, self._stale = {}, []
+
+        # post_delete keeps summaries / search in step (refreshed again below)
+        for start in range(0, len(stale), WRITE_BATCH_SIZE):
+            PersonLedgerEntry.objects.filter(pk__in=stale[start:start + WRITE_BATCH_SIZE]).delete()
+        if changed:
+            fields = set().union(*(names for _, names in changed))
+            PersonLedgerEntry.objects.bulk_update(
+                [entry for entry, _ in changed], sorted(fields), batch_size=WRITE_BATCH_SIZE,
+            )
+        if new:
+            PersonLedgerEntry.objects.bulk_create(new, batch_size=WRITE_BATCH_SIZE)
+
+        written = [entry.pk for entry, _ in changed] + [entry.pk for entry in new]
+        if stale or written:
+            bump(self.user.pk, LEDGER)
+            refresh_person_summaries(self.touched)
+            for start in range(0, len(written), WRITE_BATCH_SIZE):
+                reindex_ledger_entries(written[start:start + WRITE_BATCH_SIZE])
+        self.touched = set()
+        return len(written)
@@ -1,27 +1,38 @@
 # people/views.py
+import hashlib
+from datetime import date, timedelta
 from decimal import Decimal
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
-from django.utils.http import urlencode
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag, urlencode
+from django.utils.text import slugify
 from django.contrib import messages
 from django.utils.html import format_html
 from django.db import transaction
 from django.views.decorators.http import require_POST
-from django.db.models.functions import Coalesce
-from django.db import models
-from django.db.models import Value
-from django.core.paginator import Paginator
 
 from .models import Person, PersonLedgerEntry
-from accounts.utils import get_currency_symbol
+from accounts.utils import get_currency_symbol, get_profile
+from kharcha.cache import LEDGER, PEOPLE, bump, cached_value
+from kharcha.exports import EXPORT_CHUNK_SIZE, stream_csv, stream_jsonl, wants_gzip
+from kharcha.pagination import KeysetPaginator, keyset_params
+from .balances import balance_timeline, refresh_person_summaries, ledger_totals
 from .forms import ManualAdjustmentForm, PersonForm
-from .utils import apply_income_to_person_ledger, apply_expense_to_person_ledger
+from .autocomplete import person_index, suggest_people
+from .banners import clear_banner
+from .settlement import YOU, apply_settlement, open_balances, plan_settlement, plan_token
+from .statements import EXPORT_FIELDS, STATEMENT_ORDER, fill_running_balances, statement_export_rows, statement_page
+from .utils import apply_expense_to_person_ledger, name_prefix_q, share_person
 from income.models import Income
-from expenses.models import Expense
-from django.db.models import Max
+from expenses.models import LEDGER_APPLY, Expense, name_key
+
+
+PEOPLE_PER_PAGE = 25
 
 
 @login_required
@@ -35,52 +46,61 @@ def people_list(request):
     ?show_untracked=1:
       - Show ALL people (including archived / NO_TRACK)
 
+    ?q=: people whose name starts with it (case-insensitive), as a name_key
+    range the (user, name_key) index serves. Whole-name prefix only: "ravi"
+    finds "Ravi Kumar", "kumar" does not (the autocomplete matches words).
+
     Ordering:
       - Most recently updated person (ledger activity) first
+
+    Balances and activity come from the summary fields on Person, so no
+    ledger join / aggregate runs; pages are keyset-paginated.
     """
 
-    show_untracked = request.GET.get("show_untracked") == "1"
+    params, cursor_state = keyset_params(request)
+    show_untracked = params.get("show_untracked") == "1"
 
-    search = (request.GET.get("q") or "").strip()
+    search = (params.get("q") or "").strip()
 
 
     qs = Person.objects.filter(user=request.user)
 
     if search:
-        qs = qs.filter(name__icontains=search)
-
+        qs = qs.filter(name_prefix_q(search))
 
     if not show_untracked:
-        qs = (
-            qs.filter(
-                tracking_preference=Person.TRACK,
-                archived=False,
-                ledger_entries__archived=False,   # must have active ledger
-            )
-            .distinct()
+        # Served by person_active_list_idx: no ledger join / DISTINCT
+        people = qs.filter(
+            tracking_preference=Person.TRACK,
+            archived=False,
+            active_entry_count__gt=0,   # must have active ledger
         )
+        nullable = ()
+    else:
+        people = qs
+        nullable = ("last_activity_at",)  # people with no active rows go last
 
-    people = (
-        qs.annotate(
-            net_balance=Coalesce(
-                Sum(
-                    "ledger_entries__amount",
-                    filter=models.Q(ledger_entries__archived=False),
-                ),
-                Value(Decimal("0.00")),
-                output_field=models.DecimalField(max_digits=12, decimal_places=2),
-            ),
-            last_activity=Max(
-                "ledger_entries__created_at",
-                filter=models.Q(ledger_entries__archived=False),
-            ),
-        )
-        .order_by("-last_activity", "name")  #  MOST RECENT FIRST
+    # Build querystring for pagination (keep filters, drop cursor)
+    qd = params.copy()
+    qd.pop("cursor", None)
+
+    #  MOST RECENT FIRST
+    paginator = KeysetPaginator(
+        people, ("-last_activity_at", "name", "id"), PEOPLE_PER_PAGE,
+        querystring=qd.urlencode(), nullable=nullable,
     )
+    page_obj = paginator.get_page(cursor_state)
 
+    # Archived people show their full ledger total: one query for the page
+    archived = [person for person in page_obj if person.archived]
+    if archived:
+        totals = ledger_totals(person.pk for person in archived)
+        for person in archived:
+            person.ledger_total = totals.get(person.pk, Decimal("0.00"))
 
     context = {
-        "people": people,
+        "people": page_obj,
+        "page_obj": page_obj,
         "show_untracked": show_untracked,
         "search": search,
     }
@@ -91,29 +111,14 @@ def person_detail(request, pk):
     user = request.user
     person = get_object_or_404(Person, pk=pk, user=user)
 
-    # All ledger entries + current balance
-    
-
-    # ---- Ledger queryset (ACTIVE entries only) ----
-    ledger_qs = person.ledger_entries.filter(archived=False).order_by("-created_at")
-
-    # Balance must be computed on FULL queryset (NOT paginated)
-    agg = ledger_qs.aggregate(total=Sum("amount"))
-    balance = agg["total"] or Decimal("0.00")
-
-    # ---- Pagination ----
-    paginator = Paginator(ledger_qs, 10)  # 👈 10 entries per page
-    page_number = request.GET.get("page")
-    ledger_page = paginator.get_page(page_number)
-
-
+    # Balance over ALL active rows (NOT paginated), kept on the person
+    balance = person.cached_balance
 
     if request.method == "POST":
         action = request.POST.get("action")
 
         # -------- ADJUST WIZARD --------
         if action == "manual_adjust":
-            request.session["force_ledger_track"] = True
             amount_str = request.POST.get("amount") or "0"
             direction = request.POST.get("direction")  # they_paid / you_paid / i_borrowed
             note = (request.POST.get("note") or "").strip()
@@ -129,7 +134,7 @@ def person_detail(request, pk):
 
             # Where to come back after income/expense
             next_url = request.build_absolute_uri(request.path)
-            currency = get_currency_symbol(request.user.profile)
+            currency = get_currency_symbol(get_profile(request.user))
 
             if direction == "they_paid":
                 
@@ -178,9 +183,6 @@ def person_detail(request, pk):
                 # =========================================================
                 if balance > Decimal("0.00"):
                     
-                    if "force_ledger_track" in request.session:
-                        del request.session["force_ledger_track"]
-
                     params = {
                         "amount": str(amount),
                         "paid_for": person.name,
@@ -189,7 +191,7 @@ def person_detail(request, pk):
                         
                     }
                     add_expense_url = reverse("add-expense") + "?" + urlencode(params)
-                    currency = get_currency_symbol(request.user.profile)
+                    currency = get_currency_symbol(get_profile(request.user))
 
                     messages.info(
                         request,
@@ -208,9 +210,6 @@ def person_detail(request, pk):
                 # =========================================================
                 if balance == Decimal("0.00"):
                     
-                    if "force_ledger_track" in request.session:
-                        del request.session["force_ledger_track"]
-
                     params = {
                         "amount": str(amount),
                         "paid_for": person.name,
@@ -236,7 +235,7 @@ def person_detail(request, pk):
                 
                 #  Overpayment Check
                 if amount > abs(balance):
-                    currency = get_currency_symbol(request.user.profile)
+                    currency = get_currency_symbol(get_profile(request.user))
                     messages.warning(
                         request,
                         format_html(
@@ -249,8 +248,6 @@ def person_detail(request, pk):
                     )
                     return redirect("person-detail", pk=person.pk)
 
-                
-                request.session["force_ledger_track"] = True
 
                 params = {
                     "amount": str(amount),
@@ -317,14 +314,150 @@ def person_detail(request, pk):
             return redirect("person-detail", pk=person.pk)
 
     # -------- GET: normal render --------
+    # ---- Statement page (ACTIVE entries only), with running balances ----
+    params, cursor_state = keyset_params(request)
+    cursor_mode = params.get("paging") == "cursor"
+    if cursor_mode:
+        # Opt-in seek pagination on (-effective_date, -created_at, id); no COUNT / OFFSET
+        ledger_qs = person.ledger_entries.filter(archived=False)
+        paginator = KeysetPaginator(ledger_qs, STATEMENT_ORDER, 10, querystring="paging=cursor")
+        ledger_page = paginator.get_page(cursor_state)
+        fill_running_balances(person, ledger_page.object_list)
+    else:
+        # Rows, running balances and page count in one query
+        ledger_page = statement_page(person, request.GET.get("page"), 10)  # 👈 10 entries per page
+
     context = {
         "person": person,
         "ledger_page": ledger_page,
+        "cursor_mode": cursor_mode,
         "balance": balance,
     }
     return render(request, "people/person_detail.html", context)
 
 
+@login_required
+def settle_up(request):
+    """
+    One plan that settles every tracked balance with as few repayments as
+    the greedy matcher finds (people may pay each other directly).
+    GET shows it; POST writes the plan shown, if the balances still match.
+    """
+    if request.method == "POST":
+        settled = apply_settlement(request.user, request.POST.get("plan", ""))
+        if settled is None:
+            messages.warning(request, "Balances changed since the plan was shown. Please review the new plan.")
+            return redirect("people-settle-up")
+        messages.success(request, f"Settled balances with {settled} people.")
+        return redirect("people-list")
+
+    balances = cached_value(
+        "people:open-balances", request.user.pk, (LEDGER, PEOPLE), lambda: open_balances(request.user),
+    )
+    transfers = [
+        {
+            "payer": None if payer is YOU else payer[1],
+            "payee": None if payee is YOU else payee[1],
+            "amount": amount,
+        }
+        for payer, payee, amount in plan_settlement(balances)
+    ]
+    context = {
+        "transfers": transfers,
+        "people_count": len(balances),
+        "plan": plan_token(balances),
+    }
+    return render(request, "people/settle_up.html", context)
+
+
+STATEMENT_FORMATS = ("csv", "jsonl")
+
+
+@login_required
+def person_statement_export(request, pk):
+    """
+    Whole active history with `pk`, oldest first, with the running balance:
+    ?format=csv (default) or jsonl, ?gzip=1. Streamed, nothing is built in memory.
+    """
+    person = get_object_or_404(Person, pk=pk, user=request.user)
+    export_format = request.GET.get("format", "csv")
+    if export_format not in STATEMENT_FORMATS:
+        export_format = "csv"
+
+    rows = statement_export_rows(person, EXPORT_CHUNK_SIZE)
+    filename = f"statement_{slugify(person.name) or person.pk}_{timezone.localdate():%Y-%m-%d}.{export_format}"
+    if export_format == "jsonl":
+        return stream_jsonl(filename, EXPORT_FIELDS, rows, gzip=wants_gzip(request))
+    return stream_csv(
+        filename,
+        ["Date", "Recorded At", "Source", "Note", "Amount", "Balance"],
+        rows,
+        gzip=wants_gzip(request),
+    )
+
+
+# Browsers reuse a response this long, then revalidate with the ETag
+AUTOCOMPLETE_MAX_AGE = 60
+
+
+@login_required
+def person_autocomplete(request):
+    """
+    ?q=<prefix>: up to 10 of the user's people with a name word starting
+    with it, most recently active first, as JSON. Served from the cached
+    name index (people.autocomplete); the ETag follows the index version,
+    so an unchanged answer is a 304.
+    """
+    query = (request.GET.get("q") or "").strip()
+    index = person_index(request.user)
+    etag = quote_etag(f"{index['version']}-{hashlib.md5(name_key(query).encode()).hexdigest()[:12]}")
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({"q": query, "names": suggest_people(index, query)})
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=AUTOCOMPLETE_MAX_AGE)
+    patch_vary_headers(response, ["Cookie"])
+    return response
+
+
+# Longest range one timeline request may cover
+TIMELINE_MAX_DAYS = 366 * 5
+
+
+@login_required
+def person_timeline(request, pk):
+    """
+    Running balance with a person over time, as JSON for charts.
+
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD (default: the last 12 months).
+    Points are the days with activity, by effective date; `opening` is
+    the balance the day before `from` (an as-of balance).
+    """
+    person = get_object_or_404(Person, pk=pk, user=request.user)
+
+    try:
+        end = date.fromisoformat(request.GET["to"]) if request.GET.get("to") else timezone.localdate()
+        start = date.fromisoformat(request.GET["from"]) if request.GET.get("from") else end - timedelta(days=365)
+    except ValueError:
+        return JsonResponse({"error": "Dates must be YYYY-MM-DD."}, status=400)
+    if start > end or (end - start).days > TIMELINE_MAX_DAYS:
+        return JsonResponse({"error": f"'from' must be on or before 'to', at most {TIMELINE_MAX_DAYS} days apart."}, status=400)
+
+    opening, points = balance_timeline(person, start, end)
+    return JsonResponse({
+        "person": {"id": person.pk, "name": person.name},
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "opening": str(opening),
+        "closing": str(points[-1][2] if points else opening),
+        "points": [
+            {"date": day.isoformat(), "change": str(change), "balance": str(running)}
+            for day, change, running in points
+        ],
+    })
+
+
 @login_required
 def person_create(request):
     if request.method == "POST":
@@ -349,9 +482,10 @@ def apply_income_to_people(request, person_id, income_id):
 
     next_url = request.GET.get("next") or reverse("income-list")
 
-    # Mark income as applied — signal will rebuild ledger entries (signals should check TRACK)
+    # Mark income as applied — the post_save signal applies the ledger (once)
     income.applied_to_people = True
-    income.save()
+    income.ledger_intent = LEDGER_APPLY
+    income.save(update_fields=["applied_to_people"])
 
     messages.success(request, f"Updated balance with {person.name} using this income entry.")
     return redirect(next_url)
@@ -372,7 +506,7 @@ def apply_expense_and_track(request, person_id, expense_id):
     person = get_object_or_404(Person, pk=person_id, user=user)
     expense = get_object_or_404(Expense, pk=expense_id, user=user)
 
-    request.session.pop("pending_banner", None) # persistent banner 
+    clear_banner(request)  # persistent banner
 
     # Set to TRACK using model constant
     person.tracking_preference = Person.TRACK
@@ -403,7 +537,7 @@ def apply_expense_once(request, person_id, expense_id):
     expense = get_object_or_404(Expense, pk=expense_id, user=user)
 
     
-    request.session.pop("pending_banner", None)
+    clear_banner(request)
 
     try:
         apply_expense_to_person_ledger(user, expense, force_apply=True)
@@ -424,7 +558,7 @@ def set_person_no_track(request, person_id):
         return redirect(next_url)
 
     #  CLEAR PERSISTENT BANNER
-    request.session.pop("pending_banner", None)
+    clear_banner(request)
 
     person = get_object_or_404(Person, pk=person_id, user=request.user)
 
@@ -439,6 +573,8 @@ def set_person_no_track(request, person_id):
 
     # Archive ledger rows (keep data but hide from active sums)
     PersonLedgerEntry.objects.filter(user=request.user, person=person).update(archived=True)
+    refresh_person_summaries([person.pk])
+    bump(request.user.pk, LEDGER)
 
     messages.success(request, f"We will not track balances with {person.name} going forward. They are archived and can be restored from the Untracked list.")
     next_url = request.POST.get("next") or request.GET.get("next") or request.META.get("HTTP_REFERER") or reverse("people-list")
@@ -453,7 +589,7 @@ def set_person_track(request, person_id):
         return redirect(next_url)
 
     #  CLEAR PERSISTENT BANNER
-    request.session.pop("pending_banner", None)
+    clear_banner(request)
 
     person = get_object_or_404(Person, pk=person_id, user=request.user)
 
@@ -477,7 +613,7 @@ def set_person_ask(request, person_id):
         return redirect(next_url)
 
     #  CLEAR PERSISTENT BANNER
-    request.session.pop("pending_banner", None)
+    clear_banner(request)
     person = get_object_or_404(Person, pk=person_id, user=request.user)
 
     if hasattr(person, "tracking_preference"):
@@ -545,6 +681,8 @@ def restore_person_tracking(request, person_id):
         person.save(update_fields=["archived", "tracking_preference"])
         # unarchive ledger rows
         PersonLedgerEntry.objects.filter(user=request.user, person=person).update(archived=False)
+        refresh_person_summaries([person.pk])
+        bump(request.user.pk, LEDGER)
         messages.success(request, f"Restored tracking for {person.name} and reapplied previous balance.")
     else:
         messages.warning(request, "Invalid restore action.")
@@ -561,21 +699,21 @@ def apply_income_and_track(request, person_id, income_id):
     income = get_object_or_404(Income, pk=income_id, user=user)
 
     #  CLEAR PERSISTENT BANNER
-    request.session.pop("pending_banner", None)
+    clear_banner(request)
     # set person to track
     if hasattr(Person, "TRACK"):
         person.tracking_preference = Person.TRACK
     else:
         person.tracking_preference = "track"
     person.save(update_fields=["tracking_preference"])
+    share_person(person)
 
-    # marking income as explicitly applied 
+    # marking income as explicitly applied; the post_save signal applies
+    # the ledger (once), so no separate helper call here
     income.applied_to_people = True
-    income.save(update_fields=["applied_to_people"])
-
-    
+    income.ledger_intent = LEDGER_APPLY
     try:
-        apply_income_to_person_ledger(user, person, income)
+        income.save(update_fields=["applied_to_people"])
     except Exception as e:
         messages.warning(request, "Failed to apply income to ledger: " + str(e))
         next_url = request.POST.get("next") or request.GET.get("next") or "/"
@@ -592,14 +730,13 @@ def apply_income_once(request, person_id, income_id):
     income = get_object_or_404(Income, pk=income_id, user=user)
 
     #  CLEAR PERSISTENT BANNER
-    request.session.pop("pending_banner", None)
+    clear_banner(request)
 
-    # Mark income as applied once
+    # Mark income as applied once; the post_save signal applies the ledger
     income.applied_to_people = True
-    income.save(update_fields=["applied_to_people"])
-
+    income.ledger_intent = LEDGER_APPLY
     try:
-        apply_income_to_person_ledger(user, person, income)
+        income.save(update_fields=["applied_to_people"])
     except Exception as e:
         messages.warning(request, "Failed to apply income to ledger: " + str(e))
         next_url = request.POST.get("next") or request.GET.get("next") or "/"
@@ -615,7 +752,7 @@ from django.shortcuts import redirect
 @login_required
 @require_POST
 def clear_pending_banner(request):
-    request.session.pop("pending_banner", None)
+    clear_banner(request)
     return redirect(request.META.get("HTTP_REFERER", "/"))
 
 @login_required
@@ -626,7 +763,7 @@ def person_delete(request, pk):
     name = person.name
 
     # Clear any pending banner involving this person
-    request.session.pop("pending_banner", None)
+    clear_banner(request)
 
     # Hard delete person 
     person.delete()
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from search.utils import rebuild_search_index
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search documents for expenses, incomes and ledger entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild documents for this username')
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError(f"No user named '{options['user']}'")
+            user_id = user.pk
+
+        count = rebuild_search_index(user_id)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} documents.'))
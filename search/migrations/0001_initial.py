@@ -0,0 +1,141 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.utils import OperationalError
+from django.utils import timezone
+
+
+FTS_TABLE = "search_searchdocument_fts"
+
+
+def _gin_index():
+    return GinIndex(SearchVector("body", config="simple"), name="search_body_gin")
+
+
+def create_fulltext_index(apps, schema_editor):
+    """
+    PostgreSQL: GIN index on to_tsvector('simple', body).
+    SQLite: external-content FTS5 table, kept in step by triggers.
+    Other backends search with icontains and get nothing here.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.add_index(apps.get_model("search", "SearchDocument"), _gin_index())
+    elif vendor == "sqlite":
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "body, content='search_searchdocument', content_rowid='id')"
+            )
+        except OperationalError:
+            return  # SQLite built without FTS5: search falls back to icontains
+        schema_editor.execute(
+            f"CREATE TRIGGER search_fts_insert AFTER INSERT ON search_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER search_fts_delete AFTER DELETE ON search_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER search_fts_update AFTER UPDATE OF body ON search_searchdocument BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); "
+            f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END"
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.remove_index(apps.get_model("search", "SearchDocument"), _gin_index())
+    elif vendor == "sqlite":
+        for trigger in ("search_fts_insert", "search_fts_delete", "search_fts_update"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def _join(*parts):
+    return " ".join(part for part in parts if part)
+
+
+def backfill_documents(apps, schema_editor):
+    Expense = apps.get_model("expenses", "Expense")
+    Income = apps.get_model("income", "Income")
+    PersonLedgerEntry = apps.get_model("people", "PersonLedgerEntry")
+    SearchDocument = apps.get_model("search", "SearchDocument")
+
+    sources = dict(Income._meta.get_field("source").choices)
+
+    def expenses():
+        for row in Expense.objects.values(
+            "id", "user_id", "date", "amount", "description", "category__name", "borrowed_from", "paid_for"
+        ).iterator(chunk_size=2000):
+            yield SearchDocument(
+                user_id=row["user_id"], kind="expense", object_id=row["id"],
+                date=row["date"], amount=row["amount"],
+                title=(row["description"] or row["category__name"] or "Expense")[:255],
+                body=_join(row["description"], row["category__name"], row["borrowed_from"], row["paid_for"]),
+            )
+
+    def incomes():
+        for row in Income.objects.values(
+            "id", "user_id", "date", "amount", "description", "source", "person"
+        ).iterator(chunk_size=2000):
+            source = sources.get(row["source"], row["source"])
+            yield SearchDocument(
+                user_id=row["user_id"], kind="income", object_id=row["id"],
+                date=row["date"], amount=row["amount"],
+                title=(row["description"] or source or "Income")[:255],
+                body=_join(row["description"], source, row["person"]),
+            )
+
+    def ledger_entries():
+        for row in PersonLedgerEntry.objects.values(
+            "id", "user_id", "created_at", "amount", "note", "person__name"
+        ).iterator(chunk_size=2000):
+            yield SearchDocument(
+                user_id=row["user_id"], kind="ledger", object_id=row["id"],
+                date=timezone.localdate(row["created_at"]), amount=row["amount"],
+                title=(row["note"] or row["person__name"] or "Ledger entry")[:255],
+                body=_join(row["note"], row["person__name"]),
+            )
+
+    for documents in (expenses(), incomes(), ledger_entries()):
+        SearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('expenses', '0013_expense_user_date_idx'),
+        ('income', '0007_income_user_date_idx'),
+        ('people', '0008_counterparty'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('expense', 'Expense'), ('income', 'Income'), ('ledger', 'Ledger entry')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
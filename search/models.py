@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable row per expense, income and ledger entry: the text worth
+    searching (body) plus what the results page shows. Kept current by
+    search.signals.
+
+    The full-text index lives outside the model (see migration 0001):
+    a GIN index on to_tsvector(body) on PostgreSQL, an FTS5 table kept in
+    step by triggers on SQLite.
+    """
+
+    EXPENSE = "expense"
+    INCOME = "income"
+    LEDGER = "ledger"
+
+    KIND_CHOICES = [
+        (EXPENSE, "Expense"),
+        (INCOME, "Income"),
+        (LEDGER, "Ledger entry"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="search_documents",
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+
+    class Meta:
+        unique_together = ("kind", "object_id")
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}: {self.title}"
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SearchDocument
+from .utils import index_expense, index_income, index_ledger_entry, unindex
+from expenses.models import Expense
+from income.models import Income
+from people.models import PersonLedgerEntry
+
+
+@receiver(post_save, sender=Expense)
+def index_saved_expense(sender, instance: Expense, **kwargs):
+    index_expense(instance)
+
+
+@receiver(post_save, sender=Income)
+def index_saved_income(sender, instance: Income, **kwargs):
+    index_income(instance)
+
+
+@receiver(post_save, sender=PersonLedgerEntry)
+def index_saved_ledger_entry(sender, instance: PersonLedgerEntry, **kwargs):
+    index_ledger_entry(instance)
+
+
+@receiver(post_delete, sender=Expense)
+def unindex_expense(sender, instance: Expense, **kwargs):
+    unindex(SearchDocument.EXPENSE, instance.pk)
+
+
+@receiver(post_delete, sender=Income)
+def unindex_income(sender, instance: Income, **kwargs):
+    unindex(SearchDocument.INCOME, instance.pk)
+
+
+@receiver(post_delete, sender=PersonLedgerEntry)
+def unindex_ledger_entry(sender, instance: PersonLedgerEntry, **kwargs):
+    unindex(SearchDocument.LEDGER, instance.pk)
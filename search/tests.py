@@ -0,0 +1,72 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from expenses.models import Category, Expense
+from income.models import Income
+from people.models import Person, PersonLedgerEntry
+from .models import SearchDocument
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("search")
+        self.category, _ = Category.objects.get_or_create(name="Food", user=None)
+        self.client.force_login(self.user)
+
+    def hits(self, q):
+        response = self.client.get("/search/", {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return [(doc.kind, doc.object_id) for doc in response.context["results"]]
+
+    def add_expense(self, description):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Expense.objects.create(
+                user=self.user, category=self.category, amount=Decimal("250.00"),
+                date=date(2026, 3, 1), description=description,
+            )
+
+    def test_saved_rows_are_found(self):
+        expense = self.add_expense("Zomato dinner")
+        with self.captureOnCommitCallbacks(execute=True):
+            income = Income.objects.create(
+                user=self.user, amount=Decimal("5000.00"), date=date(2026, 3, 2),
+                description="Freelance invoice",
+            )
+        person = Person.objects.create(user=self.user, name="Ravi", tracking_preference=Person.TRACK)
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = PersonLedgerEntry.objects.create(
+                user=self.user, person=person, amount=Decimal("80.00"),
+                source_type="manual", note="Cab share", effective_date=date(2026, 3, 3),
+            )
+
+        self.assertEqual(self.hits("zomato"), [(SearchDocument.EXPENSE, expense.pk)])
+        self.assertEqual(self.hits("FREELANCE"), [(SearchDocument.INCOME, income.pk)])
+        self.assertEqual(self.hits("cab"), [(SearchDocument.LEDGER, entry.pk)])
+
+        # Other users never see them
+        self.client.force_login(User.objects.create_user("other"))
+        self.assertEqual(self.hits("zomato"), [])
+
+    def test_edited_and_deleted_rows(self):
+        expense = self.add_expense("Zomato dinner")
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.description = "Swiggy lunch"
+            expense.save()
+        self.assertEqual(self.hits("zomato"), [])
+        self.assertEqual(self.hits("swiggy"), [(SearchDocument.EXPENSE, expense.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expense.delete()
+        self.assertEqual(self.hits("swiggy"), [])
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchDocument.EXPENSE).exists())
+
+    def test_query_syntax_is_not_an_error(self):
+        expense = self.add_expense("Zomato dinner")
+        for q in ['"', "*", "a OR b", "zomato OR", "NEAR(", "(dinner", "-", "'; --", "zomato*"]:
+            self.hits(q)
+        # Operators are plain words: both terms must match
+        self.assertEqual(self.hits("zomato OR pizza"), [])
+        self.assertEqual(self.hits('"zomato" dinner'), [(SearchDocument.EXPENSE, expense.pk)])
@@ -0,0 +1,249 @@
+import re
+from functools import lru_cache
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import SearchDocument
+from expenses.models import Expense
+from income.models import Income
+from people.models import PersonLedgerEntry
+
+
+# Must match the FTS table / GIN index created in migration 0001
+FTS_TABLE = "search_searchdocument_fts"
+SEARCH_CONFIG = "simple"
+MAX_TERMS = 8
+
+INCOME_SOURCES = dict(Income.SOURCE_CHOICES)
+
+
+def _join(*parts) -> str:
+    return " ".join(part for part in parts if part)
+
+
+# -------------------------------------------------
+# Building documents
+# -------------------------------------------------
+
+def _expense_document(row: dict) -> SearchDocument:
+    return SearchDocument(
+        user_id=row["user_id"],
+        kind=SearchDocument.EXPENSE,
+        object_id=row["id"],
+        date=row["date"],
+        amount=row["amount"],
+        title=(row["description"] or row["category__name"] or "Expense")[:255],
+        body=_join(row["description"], row["category__name"], row["borrowed_from"], row["paid_for"]),
+    )
+
+
+def _income_document(row: dict) -> SearchDocument:
+    source = INCOME_SOURCES.get(row["source"], row["source"])
+    return SearchDocument(
+        user_id=row["user_id"],
+        kind=SearchDocument.INCOME,
+        object_id=row["id"],
+        date=row["date"],
+        amount=row["amount"],
+        title=(row["description"] or source or "Income")[:255],
+        body=_join(row["description"], source, row["person"]),
+    )
+
+
+def _ledger_document(row: dict) -> SearchDocument:
+    return SearchDocument(
+        user_id=row["user_id"],
+        kind=SearchDocument.LEDGER,
+        object_id=row["id"],
+        date=row["effective_date"],
+        amount=row["amount"],
+        title=(row["note"] or row["person__name"] or "Ledger entry")[:255],
+        body=_join(row["note"], row["person__name"]),
+    )
+
+
+EXPENSE_VALUES = ("id", "user_id", "date", "amount", "description", "category__name", "borrowed_from", "paid_for")
+INCOME_VALUES = ("id", "user_id", "date", "amount", "description", "source", "person")
+LEDGER_VALUES = ("id", "user_id", "effective_date", "amount", "note", "person__name")
+
+
+def _save(document: SearchDocument):
+    SearchDocument.objects.update_or_create(
+        kind=document.kind,
+        object_id=document.object_id,
+        defaults={
+            "user_id": document.user_id,
+            "date": document.date,
+            "amount": document.amount,
+            "title": document.title,
+            "body": document.body,
+        },
+    )
+
+
+def index_expense(expense: Expense):
+    _save(_expense_document({
+        "id": expense.pk,
+        "user_id": expense.user_id,
+        "date": expense.date,
+        "amount": expense.amount,
+        "description": expense.description,
+        "category__name": expense.category.name if expense.category_id else "",
+        "borrowed_from": expense.borrowed_from,
+        "paid_for": expense.paid_for,
+    }))
+
+
+def index_income(income: Income):
+    _save(_income_document({
+        "id": income.pk,
+        "user_id": income.user_id,
+        "date": income.date,
+        "amount": income.amount,
+        "description": income.description,
+        "source": income.source,
+        "person": income.person,
+    }))
+
+
+def index_ledger_entry(entry: PersonLedgerEntry):
+    _save(_ledger_document({
+        "id": entry.pk,
+        "user_id": entry.user_id,
+        "effective_date": entry.effective_date,
+        "amount": entry.amount,
+        "note": entry.note,
+        "person__name": entry.person.name,
+    }))
+
+
+def unindex(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def reindex_ledger_entries(entry_ids):
+    """
+    Refresh the documents of ledger rows written in bulk (bulk_create /
+    bulk_update skip the signals): one delete, one read, one insert.
+    """
+    entry_ids = list(entry_ids)
+    if not entry_ids:
+        return
+    SearchDocument.objects.filter(kind=SearchDocument.LEDGER, object_id__in=entry_ids).delete()
+    rows = PersonLedgerEntry.objects.filter(pk__in=entry_ids).order_by().values(*LEDGER_VALUES)
+    SearchDocument.objects.bulk_create(_ledger_document(row) for row in rows)
+
+
+def rebuild_search_index(user_id=None) -> int:
+    """
+    Rebuild documents from raw rows (one user, or everyone).
+    For paths that skip the signals, e.g. bulk_create in the CSV import.
+    """
+    sources = [
+        (Expense.objects.all(), EXPENSE_VALUES, _expense_document),
+        (Income.objects.all(), INCOME_VALUES, _income_document),
+        (PersonLedgerEntry.objects.all(), LEDGER_VALUES, _ledger_document),
+    ]
+    documents = SearchDocument.objects.all()
+    if user_id is not None:
+        documents = documents.filter(user_id=user_id)
+
+    created = 0
+    with transaction.atomic():
+        documents.delete()
+        for qs, fields, build in sources:
+            if user_id is not None:
+                qs = qs.filter(user_id=user_id)
+            rows = qs.order_by().values(*fields).iterator(chunk_size=2000)
+            created += len(SearchDocument.objects.bulk_create(
+                (build(row) for row in rows), batch_size=1000,
+            ))
+    return created
+
+
+# -------------------------------------------------
+# Searching
+# -------------------------------------------------
+
+def search_terms(query) -> list:
+    """Plain words only; they are matched as prefixes ("zom" finds "Zomato")."""
+    return re.findall(r"\w+", (query or "").lower())[:MAX_TERMS]
+
+
+@lru_cache(maxsize=None)
+def _has_fts_table() -> bool:
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+class _FtsMatches:
+    """
+    SQLite: ranked FTS5 matches for one user, shaped for Paginator
+    (count() + slicing), so only one page of documents is loaded.
+    CROSS JOIN keeps the MATCH as the outer loop; left to itself the
+    planner walks the user's documents and re-runs the MATCH for each.
+    """
+
+    def __init__(self, user, terms):
+        self.user_id = user.pk
+        self.match = " ".join(f'"{term}"*' for term in terms)
+
+    def count(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {FTS_TABLE} "
+                f"CROSS JOIN search_searchdocument d ON d.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND d.user_id = %s",
+                [self.match, self.user_id],
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, page):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.id FROM {FTS_TABLE} "
+                f"CROSS JOIN search_searchdocument d ON d.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND d.user_id = %s "
+                f"ORDER BY {FTS_TABLE}.rank, d.date DESC LIMIT %s OFFSET %s",
+                [self.match, self.user_id, page.stop - page.start, page.start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        documents = SearchDocument.objects.in_bulk(ids)
+        return [documents[pk] for pk in ids if pk in documents]
+
+
+def search_documents(user, query):
+    """
+    Ranked matches for a user's documents, for Paginator.
+
+    PostgreSQL uses the GIN expression index, SQLite the FTS5 table; any
+    other backend (or SQLite built without FTS5) falls back to icontains.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return SearchDocument.objects.none()
+
+    if connection.vendor == "postgresql":
+        vector = SearchVector("body", config=SEARCH_CONFIG)
+        tsquery = SearchQuery(
+            " & ".join(f"{term}:*" for term in terms),
+            config=SEARCH_CONFIG,
+            search_type="raw",
+        )
+        return (
+            SearchDocument.objects
+            .filter(user=user)
+            .alias(document=vector)
+            .filter(document=tsquery)
+            .annotate(rank=SearchRank(vector, tsquery))
+            .order_by("-rank", "-date", "-id")
+        )
+
+    if connection.vendor == "sqlite" and _has_fts_table():
+        return _FtsMatches(user, terms)
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(body__icontains=term)
+    return SearchDocument.objects.filter(condition, user=user).order_by("-date", "-id")
@@ -0,0 +1,48 @@
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.shortcuts import render
+from django.urls import reverse
+
+from accounts.utils import get_currency_symbol, get_profile
+from people.models import PersonLedgerEntry
+from .models import SearchDocument
+from .utils import search_documents
+
+
+@login_required
+def search(request):
+    """
+    One search box over expense / income descriptions and ledger notes,
+    best matches first, 20 per page.
+    """
+    query = (request.GET.get("q") or "").strip()
+
+    paginator = Paginator(search_documents(request.user, query), 20)
+    page_obj = paginator.get_page(request.GET.get("page", 1))
+    results = list(page_obj.object_list)
+
+    # Ledger rows link to their person; fetch those ids for this page only
+    ledger_ids = [doc.object_id for doc in results if doc.kind == SearchDocument.LEDGER]
+    people = dict(
+        PersonLedgerEntry.objects
+        .filter(user=request.user, pk__in=ledger_ids)
+        .values_list("pk", "person_id")
+    ) if ledger_ids else {}
+
+    for doc in results:
+        if doc.kind == SearchDocument.EXPENSE:
+            doc.url = reverse("edit-expense", args=[doc.object_id])
+        elif doc.kind == SearchDocument.INCOME:
+            doc.url = reverse("income-edit", args=[doc.object_id])
+        elif doc.object_id in people:
+            doc.url = reverse("person-detail", args=[people[doc.object_id]])
+        else:
+            doc.url = ""
+
+    context = {
+        "query": query,
+        "results": results,
+        "page_obj": page_obj,
+        "currency": get_currency_symbol(get_profile(request.user)),
+    }
+    return render(request, "search/search.html", context)